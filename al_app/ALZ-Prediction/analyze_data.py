@@ -2,15 +2,16 @@ import pandas as pd
 import joblib
 import pickle
 import os
+from backend.ml.dataset import CSV_PATH, load_dataset
 
 # Paths
-csv_path = r"c:\alz-app\ALZ-Prediction\alzheimers_disease_data.csv"
+csv_path = CSV_PATH
 pkl_path = r"c:\alz-app\alz_risk_model.pkl"
 joblib_path = r"c:\alz-app\alzheimers_prediction_model (1).joblib"
 
 print("--- CSV Analysis ---")
 try:
-    df = pd.read_csv(csv_path)
+    df = load_dataset(csv_path=csv_path)
     print("Columns:", df.columns.tolist())
     print("Shape:", df.shape)
     if 'Diagnosis' in df.columns:
@@ -0,0 +1,288 @@
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from fastapi.responses import JSONResponse
+from .metrics import Counter, FunctionMetric, Histogram
+
+# Admission control in front of the routers (see AdmissionMiddleware).
+# Requests are grouped into route classes by path prefix; each class has
+# its own in-flight limit, queue bound, priority and default deadline, and
+# all classes share ADMISSION_CAPACITY in-flight slots. Paths outside the
+# classes (/, /ready, /metrics, /docs) are never held back.
+# ADMISSION_CONTROL=0 turns it off.
+
+ENABLED = os.environ.get("ADMISSION_CONTROL", "1") != "0"
+CAPACITY = int(os.environ.get("ADMISSION_CAPACITY", "96"))
+# Client's time budget for the request in milliseconds, counted from
+# arrival; it can shorten the route class's deadline but not extend it
+DEADLINE_HEADER = b"x-deadline-ms"
+# Weight of the latest request in the moving average of service times
+SERVICE_TIME_ALPHA = 0.2
+
+
+class RouteClass:
+    # Lower priority numbers are admitted first when slots free up
+    def __init__(self, name, prefixes, priority, max_in_flight, max_queue, deadline_ms):
+        self.name = name
+        self.prefixes = tuple(prefixes)
+        self.priority = priority
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.deadline = deadline_ms / 1000.0
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.service_time = 0.0  # seconds, moving average
+        self.queue = deque()  # (arrival number, future) in arrival order
+
+    @classmethod
+    def from_env(cls, name, prefixes, priority, max_in_flight, max_queue, deadline_ms):
+        prefix = f"ADMISSION_{name.upper()}_"
+        return cls(
+            name, prefixes,
+            priority=int(os.environ.get(prefix + "PRIORITY", str(priority))),
+            max_in_flight=int(os.environ.get(prefix + "MAX_IN_FLIGHT", str(max_in_flight))),
+            max_queue=int(os.environ.get(prefix + "MAX_QUEUE", str(max_queue))),
+            deadline_ms=float(os.environ.get(prefix + "DEADLINE_MS", str(deadline_ms))),
+        )
+
+    def matches(self, path):
+        return any(path == prefix or path.startswith(prefix + "/") for prefix in self.prefixes)
+
+    def head(self):
+        # Oldest waiter still waiting; expired or cancelled ones are dropped
+        while self.queue and self.queue[0][1].done():
+            self.queue.popleft()
+        return self.queue[0] if self.queue else None
+
+
+# First match wins. /stats is a pre-serialized snapshot, so it goes ahead
+# of everything else; whole-batch routes keep the CPU for a long time each,
+# so only about one per core runs at once and they come last.
+ROUTE_CLASSES = [
+    RouteClass.from_env("stats", ["/stats"], priority=0, max_in_flight=16, max_queue=64, deadline_ms=500),
+    RouteClass.from_env(
+        "bulk",
+        ["/predict/batch", "/predict/array/batch", "/predict/general/batch",
+         "/predict/health-insights/batch", "/predict/health-insights/stream"],
+        priority=2, max_in_flight=os.cpu_count() or 1, max_queue=64, deadline_ms=5000,
+    ),
+    RouteClass.from_env("predict", ["/predict"], priority=1, max_in_flight=64, max_queue=256, deadline_ms=1000),
+    RouteClass.from_env("auth", ["/auth"], priority=1, max_in_flight=16, max_queue=64, deadline_ms=3000),
+]
+
+
+class Rejected(Exception):
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """In-flight limits and a priority queue for route classes.
+
+    A request starts right away when its class and the server both have a
+    free slot and nothing of the same or higher priority is waiting (and
+    its deadline has not already passed). Otherwise it queues, unless its
+    deadline cannot be met: the wait is estimated from the requests ahead
+    of it and the class's average service time, and a request that would
+    not finish in time is turned away immediately instead of adding to the
+    backlog. A queued request that
+    reaches the latest time it could still start is turned away then.
+    When a slot frees up it goes to the highest priority class with room,
+    oldest request first. Runs on the event loop only, so no locks.
+    """
+
+    def __init__(self, classes, capacity=CAPACITY):
+        self.classes = list(classes)
+        self.capacity = capacity
+        self.in_flight = 0
+        self._arrivals = 0
+
+    def classify(self, path):
+        for route_class in self.classes:
+            if route_class.matches(path):
+                return route_class
+        return None
+
+    def ahead_of(self, route_class):
+        return sum(other.waiting for other in self.classes if other.priority <= route_class.priority)
+
+    def estimated_wait(self, route_class):
+        # Seconds until a request arriving now would start: the class
+        # finishes about max_in_flight requests per service time
+        slots = max(1, min(self.capacity, route_class.max_in_flight))
+        return (self.ahead_of(route_class) + 1) * route_class.service_time / slots
+
+    def retry_after(self, route_class):
+        return max(1, math.ceil(self.estimated_wait(route_class)))
+
+    def _has_room(self, route_class):
+        return self.in_flight < self.capacity and route_class.in_flight < route_class.max_in_flight
+
+    def _start(self, route_class):
+        self.in_flight += 1
+        route_class.in_flight += 1
+        route_class.admitted += 1
+
+    async def acquire(self, route_class, deadline):
+        # Returns once the request may run; raises Rejected otherwise.
+        # `deadline` is a time.perf_counter() value.
+        if self._has_room(route_class) and not self.ahead_of(route_class):
+            # A free slot is always used; the service time may be an
+            # overestimate from a busier moment, and this refreshes it
+            if time.perf_counter() >= deadline:
+                raise Rejected("deadline", self.retry_after(route_class))
+            self._start(route_class)
+            return
+        latest_start = deadline - route_class.service_time
+        if route_class.waiting >= route_class.max_queue:
+            raise Rejected("queue_full", self.retry_after(route_class))
+        if time.perf_counter() + self.estimated_wait(route_class) > latest_start:
+            raise Rejected("deadline", self.retry_after(route_class))
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._arrivals += 1
+        route_class.queue.append((self._arrivals, future))
+        route_class.waiting += 1
+        timer = loop.call_at(
+            loop.time() + latest_start - time.perf_counter(), self._expire, route_class, future
+        )
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # The client went away
+            if future.cancelled():
+                route_class.waiting -= 1
+            elif future.exception() is None:
+                # Give back the slot granted in the meantime
+                self.release(route_class)
+            raise
+        finally:
+            timer.cancel()
+
+    def _expire(self, route_class, future):
+        if not future.done():
+            route_class.waiting -= 1
+            future.set_exception(Rejected("deadline", self.retry_after(route_class)))
+
+    def release(self, route_class, service_time=None):
+        self.in_flight -= 1
+        route_class.in_flight -= 1
+        if service_time is not None:
+            route_class.service_time += SERVICE_TIME_ALPHA * (service_time - route_class.service_time)
+        self._dispatch()
+
+    def _dispatch(self):
+        while self.in_flight < self.capacity:
+            best = None
+            for route_class in self.classes:
+                head = route_class.head()
+                if head is None or route_class.in_flight >= route_class.max_in_flight:
+                    continue
+                if best is None or (route_class.priority, head[0]) < (best[0].priority, best[1][0]):
+                    best = (route_class, head)
+            if best is None:
+                return
+            route_class, (_, future) = best
+            route_class.queue.popleft()
+            route_class.waiting -= 1
+            self._start(route_class)
+            future.set_result(None)
+
+    def stats(self):
+        return {
+            "capacity": self.capacity,
+            "in_flight": self.in_flight,
+            "classes": {
+                route_class.name: {
+                    "priority": route_class.priority,
+                    "in_flight": route_class.in_flight,
+                    "max_in_flight": route_class.max_in_flight,
+                    "waiting": route_class.waiting,
+                    "max_queue": route_class.max_queue,
+                    "default_deadline_ms": route_class.deadline * 1000,
+                    "service_time_ms": route_class.service_time * 1000,
+                    "estimated_wait_ms": self.estimated_wait(route_class) * 1000,
+                    "admitted": route_class.admitted,
+                }
+                for route_class in self.classes
+            },
+        }
+
+
+controller = AdmissionController(ROUTE_CLASSES)
+
+ADMISSION_QUEUE_SECONDS = Histogram(
+    "admission_queue_seconds", "Time requests waited for an admission slot", ["route_class"],
+)
+ADMISSION_REJECTED = Counter(
+    "admission_rejected_total", "Requests turned away with 503 by admission control",
+    ["route_class", "reason"],
+)
+FunctionMetric("admission_in_flight", "Requests running per route class",
+               lambda: {(c.name,): c.in_flight for c in controller.classes}, ["route_class"])
+FunctionMetric("admission_waiting", "Requests queued for a slot per route class",
+               lambda: {(c.name,): c.waiting for c in controller.classes}, ["route_class"])
+
+
+def request_deadline(scope, route_class, arrived):
+    # Deadline from the X-Deadline-Ms header, capped at the class default
+    for name, value in scope["headers"]:
+        if name == DEADLINE_HEADER:
+            try:
+                budget = float(value) / 1000.0
+            except ValueError:
+                break
+            if math.isfinite(budget):
+                return arrived + min(max(budget, 0.0), route_class.deadline)
+            break
+    return arrived + route_class.deadline
+
+
+class AdmissionMiddleware:
+    """Holds requests back until the AdmissionController admits them.
+
+    Turned-away requests get a 503 with Retry-After before their body is
+    read. Deadlines count from arrival (MetricsMiddleware's start time when
+    it is installed outside this one). Admitted requests get their admit
+    time in the request state ("request_admitted"), so handler timings
+    leave out the queue wait.
+    """
+
+    def __init__(self, app, controller=controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        route_class = self.controller.classify(scope["path"]) if scope["type"] == "http" and ENABLED else None
+        if route_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        now = time.perf_counter()
+        arrived = scope.get("state", {}).get("request_started", now)
+        try:
+            await self.controller.acquire(route_class, request_deadline(scope, route_class, arrived))
+        except Rejected as e:
+            ADMISSION_REJECTED.inc(route_class.name, e.reason)
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": f"Server busy ({route_class.name} requests), please retry"},
+                headers={"Retry-After": str(e.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        ADMISSION_QUEUE_SECONDS.observe_since(now, route_class.name)
+        started = time.perf_counter()
+        scope.setdefault("state", {})["request_admitted"] = started
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(route_class, time.perf_counter() - started)
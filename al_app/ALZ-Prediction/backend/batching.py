@@ -0,0 +1,241 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the histogram buckets (the last bucket catches everything above)
+SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+
+
+class SizeHistogram:
+    def __init__(self, buckets=SIZE_BUCKETS):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0
+        self.count = 0
+
+    def observe(self, value):
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.total += value
+        self.count += 1
+
+    def to_dict(self):
+        labels = [str(bucket) for bucket in self.buckets] + ["+Inf"]
+        return {
+            "buckets": dict(zip(labels, self.counts)),
+            "count": self.count,
+            "sum": self.total,
+        }
+
+
+class MicroBatcher:
+    """Collects single-row predictions into batches for one model call.
+
+    Rows submitted while a batch is being scored queue up and go out together
+    in the next batch. When the previous batch held more than one row (i.e.
+    requests are arriving concurrently) the worker also waits up to
+    `window_ms` for more rows before scoring, capped at `max_batch_size`.
+    An idle server therefore never delays a lone request.
+    """
+
+    def __init__(self, predict_fn, window_ms=2.0, max_batch_size=64):
+        self.predict_fn = predict_fn
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.batch_sizes = SizeHistogram()
+        self.queue_depths = SizeHistogram()
+        self._loop = None
+        self._queue = None
+        self._worker = None
+        self._last_batch_size = 0
+
+    def _ensure_worker(self):
+        # The worker is bound to the running event loop, so it is (re)started
+        # lazily from the first request served by a loop.
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+        return loop
+
+    async def submit(self, row):
+        loop = self._ensure_worker()
+        future = loop.create_future()
+        self._queue.put_nowait((row, future))
+        return await future
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+
+        if self.window > 0 and self._last_batch_size > 1:
+            deadline = self._loop.time() + self.window
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            self._last_batch_size = len(batch)
+            self.batch_sizes.observe(len(batch))
+            self.queue_depths.observe(len(batch) + self._queue.qsize())
+
+            rows = [row for row, _ in batch]
+            try:
+                results = await self._loop.run_in_executor(None, self.predict_fn, rows)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for index, (_, future) in enumerate(batch):
+                if not future.done():
+                    future.set_result(tuple(part[index] for part in results))
+
+    def stats(self):
+        return {
+            "window_ms": self.window * 1000.0,
+            "max_batch_size": self.max_batch_size,
+            "queue_depth": self.queue_depth,
+            "batch_size": self.batch_sizes.to_dict(),
+            "queue_depth_at_dispatch": self.queue_depths.to_dict(),
+        }
+
+
+_STOP = object()
+
+
+class WriteBehindQueue:
+    """Buffers records in memory and hands them to `write_fn` in batches.
+
+    `submit` only appends to a queue, so the caller never waits for the
+    database. A background task writes everything queued once
+    `max_batch_size` records are waiting or `flush_interval_ms` after the
+    first one arrived, whichever comes first, with one `await write_fn(rows)`
+    (one transaction) per batch. `flush` writes whatever is queued now and
+    `close` drains the queue before shutdown. Once `max_queue` records are
+    waiting, new ones are dropped (and counted) rather than slowing requests.
+    """
+
+    def __init__(self, write_fn, max_batch_size=256, flush_interval_ms=1000.0, max_queue=10000):
+        self.write_fn = write_fn
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_queue = max_queue
+        self.batch_sizes = SizeHistogram()
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._waiting = 0  # submitted and not yet written, including the batch being collected
+        self._loop = None
+        self._queue = None
+        self._worker = None
+
+    def _ensure_worker(self):
+        # Bound to the running event loop, like MicroBatcher's worker
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._waiting = 0
+            self._worker = loop.create_task(self._run())
+        return loop
+
+    def submit(self, record):
+        self._ensure_worker()
+        if self._waiting >= self.max_queue:
+            self.dropped += 1
+            return False
+        self._waiting += 1
+        self._queue.put_nowait(record)
+        return True
+
+    @property
+    def queue_depth(self):
+        return self._waiting
+
+    async def flush(self):
+        # Returns once everything submitted before the call is written
+        loop = self._ensure_worker()
+        done = loop.create_future()
+        self._queue.put_nowait(done)
+        await done
+
+    async def close(self):
+        if self._worker is None or self._worker.done() or self._loop is not asyncio.get_running_loop():
+            return
+        self._queue.put_nowait(_STOP)
+        await self._worker
+
+    async def _collect(self):
+        # Records for one batch. A flush future or the stop marker (_STOP)
+        # ends the batch early; everything queued before it is in the batch.
+        batch = []
+        deadline = None
+        while len(batch) < self.max_batch_size:
+            if not batch:
+                item = await self._queue.get()
+                deadline = self._loop.time() + self.flush_interval
+            elif not self._queue.empty():
+                item = self._queue.get_nowait()
+            else:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            if item is _STOP or isinstance(item, asyncio.Future):
+                return batch, item
+            batch.append(item)
+        return batch, None
+
+    async def _write(self, batch):
+        try:
+            await self.write_fn(batch)
+        except Exception:
+            self.failed += len(batch)
+            logger.exception("Failed to write %d queued records", len(batch))
+        else:
+            self.written += len(batch)
+        self._waiting -= len(batch)
+        self.batch_sizes.observe(len(batch))
+
+    async def _run(self):
+        while True:
+            batch, marker = await self._collect()
+            if batch:
+                await self._write(batch)
+            if marker is _STOP:
+                return
+            if marker is not None and not marker.done():
+                marker.set_result(None)
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "flush_interval_ms": self.flush_interval * 1000.0,
+            "queue_depth": self.queue_depth,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batch_size": self.batch_sizes.to_dict(),
+        }
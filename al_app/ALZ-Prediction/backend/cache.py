@@ -0,0 +1,82 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+
+class PredictionCache:
+    """Bounded LRU cache with a per-entry TTL for model outputs.
+
+    Keys are derived from the ordered feature values and the model version,
+    so a new model never serves results computed by the previous one.
+    Safe to use from the threadpool and the event loop at the same time.
+    """
+
+    def __init__(self, maxsize=4096, ttl=300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0
+
+    @staticmethod
+    def make_key(row, version):
+        # Canonical form: float64 values in feature order, so 55 and 55.0
+        # (and -0.0 and 0.0) hash the same.
+        values = np.asarray(row, dtype=np.float64) + 0.0
+        digest = hashlib.blake2b(values.tobytes(), digest_size=16)
+        digest.update(str(version).encode())
+        return digest.digest()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,138 @@
+import argparse
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from passlib.context import CryptContext
+
+# PBKDF2 iteration count for new hashes. Stored hashes with a different
+# count are rehashed on the next successful login.
+PBKDF2_ROUNDS = int(os.environ.get("AUTH_PBKDF2_ROUNDS", "29000"))
+# Processes doing the hashing (0 hashes on the default thread pool instead)
+HASH_WORKERS = int(os.environ.get("AUTH_HASH_WORKERS", str(os.cpu_count() or 1)))
+# Hash/verify calls allowed in flight (running or queued) before shedding
+HASH_MAX_PENDING = int(os.environ.get("AUTH_HASH_MAX_PENDING", str(max(HASH_WORKERS, 1) * 4)))
+
+_contexts = {}
+
+
+def get_context(rounds=PBKDF2_ROUNDS):
+    context = _contexts.get(rounds)
+    if context is None:
+        context = CryptContext(
+            schemes=["pbkdf2_sha256"],
+            deprecated="auto",
+            pbkdf2_sha256__default_rounds=rounds,
+            pbkdf2_sha256__min_rounds=rounds,
+            pbkdf2_sha256__max_rounds=rounds,
+        )
+        _contexts[rounds] = context
+    return context
+
+
+# These run inside the pool processes
+def _hash(password, rounds):
+    return get_context(rounds).hash(password)
+
+
+def _verify_and_update(password, hashed_password, rounds):
+    return get_context(rounds).verify_and_update(password, hashed_password)
+
+
+class HashingBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    """Runs password hashing off the event loop with bounded concurrency.
+
+    At most `max_pending` calls are admitted at once; further calls fail
+    fast with HashingBusy instead of queueing without limit.
+    """
+
+    def __init__(self, workers=HASH_WORKERS, max_pending=HASH_MAX_PENDING, rounds=PBKDF2_ROUNDS):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self.pending = 0
+        self.rejected = 0
+        self._executor = None
+
+    def _get_executor(self):
+        if self.workers > 0 and self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HashingBusy()
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password):
+        return await self._run(_hash, password, self.rounds)
+
+    async def verify_and_update(self, password, hashed_password):
+        # (valid, new_hash); new_hash is set when the stored hash is outdated
+        return await self._run(_verify_and_update, password, hashed_password, self.rounds)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "rounds": self.rounds,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+        }
+
+
+async def _measure(hasher, count, concurrency):
+    hashed = await hasher.hash("benchmark-password")
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def verify():
+        async with semaphore:
+            started = time.perf_counter()
+            await hasher.verify_and_update("benchmark-password", hashed)
+            return time.perf_counter() - started
+
+    started = time.perf_counter()
+    latencies = sorted(await asyncio.gather(*[verify() for _ in range(count)]))
+    elapsed = time.perf_counter() - started
+    return count / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)]
+
+
+def main():
+    # Verification throughput per rounds setting, to pick AUTH_PBKDF2_ROUNDS
+    # and AUTH_HASH_WORKERS from measurements, e.g.
+    #   python -m backend.hashing --rounds 10000 29000 100000 --count 400
+    parser = argparse.ArgumentParser(description="Measure password verification throughput")
+    parser.add_argument("--rounds", type=int, nargs="+", default=[PBKDF2_ROUNDS])
+    parser.add_argument("--workers", type=int, default=HASH_WORKERS)
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=None)
+    args = parser.parse_args()
+    concurrency = args.concurrency or max(args.workers, 1) * 2
+
+    print(f"{'rounds':>8} {'verify/s':>10} {'p50 ms':>8} {'p95 ms':>8}")
+    for rounds in args.rounds:
+        hasher = PasswordHasher(workers=args.workers, max_pending=concurrency, rounds=rounds)
+        try:
+            rate, p50, p95 = asyncio.run(_measure(hasher, args.count, concurrency))
+        finally:
+            hasher.shutdown()
+        print(f"{rounds:>8} {rate:>10.1f} {p50 * 1000:>8.2f} {p95 * 1000:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
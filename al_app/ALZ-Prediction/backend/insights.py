@@ -0,0 +1,170 @@
+import json
+from collections import deque
+import numpy as np
+
+# Health score checks shared by the single-reading route and the daily
+# series aggregates: (fields used, penalty, precaution, test). The tests
+# only use comparisons and |, so they work on scalars and NumPy arrays.
+CHECKS = [
+    (("heart_rate",), 10, "Abnormal heart rate detected. Consult a doctor.",
+     lambda r: (r["heart_rate"] > 100) | (r["heart_rate"] < 60)),
+    (("systolic_bp", "diastolic_bp"), 15, "High blood pressure. Reduce salt intake and monitor BP.",
+     lambda r: (r["systolic_bp"] > 130) | (r["diastolic_bp"] > 85)),
+    (("steps_count",), 10, "Low physical activity. Try to walk more.",
+     lambda r: r["steps_count"] < 5000),
+    (("hydration",), 5, "Low hydration. Drink more water.",
+     lambda r: r["hydration"] < 2.0),
+    (("sleep_hours",), 10, "Insufficient sleep. Aim for 7-8 hours.",
+     lambda r: r["sleep_hours"] < 7),
+]
+
+# Series readings: vitals are averaged per day, the rest are amounts since
+# the previous reading and are summed per day
+MEAN_FIELDS = ["heart_rate", "systolic_bp", "diastolic_bp"]
+SUM_FIELDS = ["steps_count", "hydration", "sleep_hours"]
+FIELDS = MEAN_FIELDS + SUM_FIELDS
+ROLLING_DAYS = 7
+
+
+def assess(values):
+    # (score, precautions) for one set of values; checks whose fields are
+    # missing (None) are skipped
+    score = 100
+    precautions = []
+    for fields, penalty, precaution, test in CHECKS:
+        if any(values.get(name) is None for name in fields):
+            continue
+        if test(values):
+            score -= penalty
+            precautions.append(precaution)
+    return score, precautions
+
+
+def parse_timestamps(values):
+    # Epoch seconds or ISO 8601 strings (UTC) -> datetime64[s]
+    values = list(values)
+    if values and all(isinstance(value, (int, float)) for value in values):
+        return np.floor(np.array(values, dtype=np.float64)).astype(np.int64).astype('datetime64[s]')
+    try:
+        return np.array([str(value).rstrip("Z") for value in values], dtype='datetime64[s]')
+    except ValueError as e:
+        raise ValueError(f"Invalid timestamp: {e}")
+
+
+def columns_from_readings(readings):
+    # List of reading dicts -> (timestamps, {field: float array, NaN when absent})
+    timestamps = parse_timestamps(reading["timestamp"] for reading in readings)
+    columns = {
+        name: np.array([reading.get(name) for reading in readings], dtype=np.float64)
+        for name in FIELDS
+    }
+    return timestamps, columns
+
+
+class DailyAggregator:
+    """Per-day health summaries over a time series of wearable readings.
+
+    Readings arrive in chunks (columns of equal length); each chunk is
+    grouped by UTC day with one np.unique and a bincount per field. Days
+    before the latest one in the chunk are complete and are returned right
+    away, so results can be streamed while the rest of the series is still
+    being read. Readings must not go back to a day that was already
+    returned. Rolling averages cover the last ROLLING_DAYS calendar days.
+    """
+
+    def __init__(self, rolling_days=ROLLING_DAYS):
+        self.rolling_days = rolling_days
+        self.pending = None  # (day, totals) of the newest, possibly incomplete day
+        self.last_reported = None
+        self.history = deque()  # (day, steps, sleep) of reported days
+
+    def add(self, timestamps, columns):
+        if not len(timestamps):
+            return []
+        days, index = np.unique(timestamps.astype('datetime64[D]'), return_inverse=True)
+        if self.last_reported is not None and days[0] <= self.last_reported:
+            raise ValueError(f"Readings for {days[0]} arrived after {self.last_reported} was reported")
+        if self.pending is not None and days[0] < self.pending[0]:
+            raise ValueError(f"Readings for {days[0]} arrived after readings for {self.pending[0]}")
+        n_days = len(days)
+
+        totals = {"readings": np.bincount(index, minlength=n_days)}
+        for name in FIELDS:
+            values = columns[name]
+            present = ~np.isnan(values)
+            totals[name + "_sum"] = np.bincount(index, weights=np.where(present, values, 0.0), minlength=n_days)
+            totals[name + "_n"] = np.bincount(index, weights=present, minlength=n_days)
+        heart_rate = columns["heart_rate"]
+        abnormal = (heart_rate > 100) | (heart_rate < 60)
+        totals["heart_rate_abnormal"] = np.bincount(index, weights=abnormal, minlength=n_days)
+
+        per_day = [{key: value[i].item() for key, value in totals.items()} for i in range(n_days)]
+        if self.pending is not None:
+            day, previous = self.pending
+            if day == days[0]:
+                per_day[0] = {key: previous[key] + per_day[0][key] for key in previous}
+            else:
+                # The pending day ended before this chunk started
+                per_day.insert(0, previous)
+                days = np.concatenate([[day], days])
+
+        self.pending = (days[-1], per_day[-1])
+        return [self._report(day, day_totals) for day, day_totals in zip(days[:-1], per_day[:-1])]
+
+    def finish(self):
+        if self.pending is None:
+            return []
+        day, day_totals = self.pending
+        self.pending = None
+        return [self._report(day, day_totals)]
+
+    def _report(self, day, totals):
+        def mean(name):
+            n = totals[name + "_n"]
+            return round(totals[name + "_sum"] / n, 2) if n else None
+
+        def total(name):
+            return round(totals[name + "_sum"], 2) if totals[name + "_n"] else None
+
+        values = {name: mean(name) for name in MEAN_FIELDS}
+        values.update({name: total(name) for name in SUM_FIELDS})
+        score, precautions = assess(values)
+
+        self.last_reported = day
+        self.history.append((day, values["steps_count"], values["sleep_hours"]))
+        window_start = day - np.timedelta64(self.rolling_days - 1, 'D')
+        while self.history[0][0] < window_start:
+            self.history.popleft()
+        steps = [steps for _, steps, _ in self.history if steps is not None]
+        sleep = [sleep for _, _, sleep in self.history if sleep is not None]
+
+        return {
+            "date": str(day),
+            "readings": int(totals["readings"]),
+            "heart_rate_avg": values["heart_rate"],
+            "abnormal_heart_rate_readings": int(totals["heart_rate_abnormal"]),
+            "systolic_bp_avg": values["systolic_bp"],
+            "diastolic_bp_avg": values["diastolic_bp"],
+            "steps": values["steps_count"],
+            "hydration": values["hydration"],
+            "sleep_hours": values["sleep_hours"],
+            f"steps_{self.rolling_days}d_avg": round(sum(steps) / len(steps), 1) if steps else None,
+            f"sleep_{self.rolling_days}d_avg": round(sum(sleep) / len(sleep), 2) if sleep else None,
+            "health_score": score,
+            "precautions": precautions,
+        }
+
+
+def parse_ndjson(block):
+    # Bytes holding complete NDJSON lines -> list of reading dicts
+    readings = []
+    for line in block.splitlines():
+        line = line.strip()
+        if line:
+            try:
+                readings.append(json.loads(line))
+            except ValueError as e:
+                raise ValueError(f"Invalid NDJSON line: {e}")
+    if any(not isinstance(reading, dict) or "timestamp" not in reading for reading in readings):
+        raise ValueError("Every reading needs a timestamp")
+    return readings
@@ -1,11 +1,51 @@
+import time
+IMPORT_STARTED = time.perf_counter()
+
+import logging
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from . import models, database
+from fastapi.responses import JSONResponse, Response
+from . import admission, metrics, models, database
 from .routers import auth, prediction, stats
 
-models.Base.metadata.create_all(bind=database.engine)
+IMPORT_SECONDS = time.perf_counter() - IMPORT_STARTED
+
+# "background": serve /auth, /stats and / immediately and load the model in
+# the background; /predict answers 503 until it is ready.
+# "eager": load the model before the server accepts requests.
+MODEL_LOADING = os.environ.get("PREDICT_MODEL_LOADING", "background")
+
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"), format="%(levelname)s:     %(name)s: %(message)s")
+logger = logging.getLogger("backend.startup")
+
+@asynccontextmanager
+async def lifespan(app):
+    logger.info("Imports took %.0f ms", IMPORT_SECONDS * 1000)
+
+    started = time.perf_counter()
+    async with database.async_engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+    logger.info("Database tables ready in %.0f ms", (time.perf_counter() - started) * 1000)
+
+    if MODEL_LOADING == "eager":
+        await run_in_threadpool(prediction.store.refresh)
+    # The watcher loads the first model itself, then picks up newly
+    # published versions without a restart
+    prediction.store.start_watching()
+    logger.info("Startup finished in %.0f ms after imports (model loading: %s)",
+                (time.perf_counter() - started) * 1000, MODEL_LOADING)
+    yield
+    # Write out predictions still queued for the history table
+    await prediction.history.close()
+    prediction.store.stop_watching()
 
-app = FastAPI(title="Alzheimer's Prediction API")
+app = FastAPI(title="Alzheimer's Prediction API", lifespan=lifespan)
+
+# Innermost, so 503s from admission control still get CORS headers
+app.add_middleware(admission.AdmissionMiddleware)
 
 # CORS setup
 origins = [
@@ -21,6 +61,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so request timings include the other middleware
+app.add_middleware(metrics.MetricsMiddleware)
+
 app.include_router(auth.router)
 app.include_router(prediction.router)
 app.include_router(stats.router)
@@ -28,3 +71,17 @@ app.include_router(stats.router)
 @app.get("/")
 def read_root():
     return {"message": "Welcome to Alzheimer's Prediction API"}
+
+@app.get("/ready")
+def readiness():
+    # 200 once the model has loaded, for load balancers and orchestrators
+    status = prediction.store.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+@app.get("/admission")
+def admission_stats():
+    return admission.controller.stats()
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
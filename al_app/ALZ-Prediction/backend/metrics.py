@@ -0,0 +1,223 @@
+import bisect
+import os
+import threading
+import time
+
+# Minimal Prometheus-style metrics: counters, histograms and callback
+# metrics, rendered in the text exposition format at GET /metrics.
+# Recording is a dict lookup, a bisect and a few additions under a lock,
+# so the timers stay on in production; METRICS_ENABLED=0 turns them off.
+# Each worker process keeps its own values.
+
+ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+
+# Seconds, from 50us to 10s
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+_metrics = []
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in pairs) + "}"
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield self.name + format_labels(self.labelnames, labels), value
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # labels -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    def time(self, *labels):
+        # with histogram.time("stage"): ...
+        return _Timer(self, labels) if ENABLED else NULL_TIMER
+
+    def observe_since(self, started, *labels):
+        # Time since a perf_counter() reading taken earlier (e.g. by a
+        # middleware); like time(), a no-op when metrics are off
+        if ENABLED and started is not None:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def samples(self):
+        with self._lock:
+            values = {labels: list(state) for labels, state in self._values.items()}
+        for labels, state in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state):
+                cumulative += count
+                yield self.name + "_bucket" + format_labels(
+                    self.labelnames, labels, ("le", format_value(float(bound)))
+                ), cumulative
+            yield self.name + "_sum" + format_labels(self.labelnames, labels), state[-1]
+            yield self.name + "_count" + format_labels(self.labelnames, labels), cumulative
+
+
+class FunctionMetric:
+    # Value read from `fn` at scrape time: a number, or {label values: number}
+    def __init__(self, name, help, fn, labelnames=(), kind="gauge"):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+        _metrics.append(self)
+
+    def samples(self):
+        try:
+            value = self.fn()
+        except Exception:
+            return
+        if not isinstance(value, dict):
+            value = {(): value}
+        for labels, number in sorted(value.items()):
+            yield self.name + format_labels(self.labelnames, labels), number
+
+
+def render():
+    lines = []
+    for metric in _metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, value in metric.samples():
+            lines.append(f"{name} {format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """Times every HTTP request by route template, method and status.
+
+    Also stores the arrival time in the request state ("request_started"),
+    so handlers can measure what happened before they were called (body
+    parsing and validation) from `request_started`.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        scope.setdefault("state", {})["request_started"] = started
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                scope["method"], getattr(route, "path", "unmatched"), str(status),
+            )
+
+
+def request_started(request):
+    # perf_counter() when MetricsMiddleware saw the request, or None without
+    # it. Requests that went through AdmissionMiddleware count from their
+    # admission instead: the queue wait is in admission_queue_seconds.
+    state = request.scope.get("state", {})
+    return state.get("request_admitted", state.get("request_started"))
+
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time to serve a request",
+    ["method", "route", "status"],
+)
+PREDICT_STAGE_SECONDS = Histogram(
+    "predict_stage_seconds",
+    "Time spent in each stage of a prediction (validation includes reading the body)",
+    ["stage"],
+)
+SIGNIN_STAGE_SECONDS = Histogram(
+    "signin_stage_seconds", "Time spent in each stage of a sign-in", ["stage"],
+)
@@ -0,0 +1,190 @@
+import argparse
+import json
+import os
+import numpy as np
+import pandas as pd
+
+# Paths
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CSV_PATH = os.path.join(os.path.dirname(os.path.dirname(BASE_DIR)), 'alzheimers_disease_data.csv')
+SCHEMA_FILE = "schema.json"
+# Suffix of the float64 copy of a float column, next to the float32 one
+EXACT_SUFFIX = ".f64"
+
+# Compact storage types. 0/1 flags and small codes fit int8, vitals and
+# scores keep plenty of precision in float32 for analysis. Training must
+# not use the float32 values (see EXACT_DTYPES); the columnar copy also
+# keeps the float columns at full precision for it.
+FLAG_COLUMNS = [
+    'Gender', 'Smoking', 'FamilyHistoryAlzheimers', 'CardiovascularDisease',
+    'Diabetes', 'Depression', 'HeadInjury', 'Hypertension', 'MemoryComplaints',
+    'BehavioralProblems', 'Confusion', 'Disorientation', 'PersonalityChanges',
+    'DifficultyCompletingTasks', 'Forgetfulness', 'Diagnosis',
+]
+FLOAT_COLUMNS = [
+    'BMI', 'AlcoholConsumption', 'PhysicalActivity', 'DietQuality', 'SleepQuality',
+    'CholesterolTotal', 'CholesterolLDL', 'CholesterolHDL',
+    'CholesterolTriglycerides', 'MMSE', 'FunctionalAssessment', 'ADL',
+]
+COLUMN_DTYPES = {
+    'PatientID': np.int32,
+    'Age': np.int16,
+    'Ethnicity': np.int8,
+    'EducationLevel': np.int8,
+    'SystolicBP': np.int16,
+    'DiastolicBP': np.int16,
+    **{name: np.int8 for name in FLAG_COLUMNS},
+    **{name: np.float32 for name in FLOAT_COLUMNS},
+}
+CATEGORY_COLUMNS = ['DoctorInCharge']
+CSV_DTYPES = {**COLUMN_DTYPES, **{name: "category" for name in CATEGORY_COLUMNS}}
+# For training: the float columns at the CSV's full precision. The API
+# scores float64 rows, and float32 rounding moves values by up to ~1e-6,
+# enough to put a row on the other side of a split threshold.
+EXACT_DTYPES = {**CSV_DTYPES, **{name: np.float64 for name in FLOAT_COLUMNS}}
+
+
+def columns_dir(csv_path=CSV_PATH):
+    # alzheimers_disease_data.csv -> alzheimers_disease_data_columns/
+    return os.path.splitext(csv_path)[0] + "_columns"
+
+
+def read_csv_compact(csv_path, columns=None, exact=False):
+    # Parses straight into the compact dtypes (EXACT_DTYPES with exact=True),
+    # reading only `columns`
+    return pd.read_csv(csv_path, usecols=columns, dtype=EXACT_DTYPES if exact else CSV_DTYPES)
+
+
+def convert(csv_path=CSV_PATH, out_dir=None):
+    # One .npy file per column plus a schema; string columns are stored as
+    # integer codes with their categories in the schema. Float columns get
+    # a second, float64 file (<name>.f64.npy) for exact loads.
+    out_dir = out_dir or columns_dir(csv_path)
+    df = read_csv_compact(csv_path, exact=True)
+    os.makedirs(out_dir, exist_ok=True)
+
+    schema = {"rows": len(df), "columns": {}}
+    for name in df.columns:
+        column = df[name]
+        entry = {}
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            values = column.cat.codes.to_numpy()
+            entry["categories"] = column.cat.categories.tolist()
+        else:
+            values = column.to_numpy()
+        if name in FLOAT_COLUMNS:
+            np.save(os.path.join(out_dir, name + EXACT_SUFFIX + ".npy"), np.ascontiguousarray(values))
+            entry["exact_dtype"] = values.dtype.str
+            values = values.astype(COLUMN_DTYPES[name])
+        np.save(os.path.join(out_dir, name + ".npy"), np.ascontiguousarray(values))
+        entry["dtype"] = values.dtype.str
+        schema["columns"][name] = entry
+
+    st = os.stat(csv_path)
+    schema["source"] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    with open(os.path.join(out_dir, SCHEMA_FILE), 'w') as f:
+        json.dump(schema, f, indent=4)
+    return schema
+
+
+def read_schema(csv_path=CSV_PATH):
+    # Schema of the converted dataset, or None if it is missing or older
+    # than the CSV it was built from.
+    path = os.path.join(columns_dir(csv_path), SCHEMA_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        schema = json.load(f)
+    if os.path.exists(csv_path):
+        st = os.stat(csv_path)
+        if schema["source"] != {"size": st.st_size, "mtime_ns": st.st_mtime_ns}:
+            print(f"{columns_dir(csv_path)} is out of date, reading {csv_path} instead. "
+                  "Re-run `python backend/ml/dataset.py convert` to refresh it.")
+            return None
+    return schema
+
+
+def load_columns(columns=None, csv_path=CSV_PATH, mmap_mode='r', exact=False):
+    # {name: array} memory-mapped straight from the columnar files, or None
+    # when the dataset has not been converted. Category columns are codes.
+    # exact=True maps the float64 copies of the float columns.
+    schema = read_schema(csv_path)
+    if schema is None:
+        return None
+    columns = columns or list(schema["columns"])
+    missing = [name for name in columns if name not in schema["columns"]]
+    if missing:
+        raise KeyError(f"Columns not in dataset: {', '.join(missing)}")
+    suffixes = {}
+    for name in columns:
+        suffixes[name] = ""
+        if exact and name in FLOAT_COLUMNS:
+            if "exact_dtype" not in schema["columns"][name]:
+                print(f"{columns_dir(csv_path)} has no float64 columns, reading {csv_path} instead. "
+                      "Re-run `python backend/ml/dataset.py convert` to refresh it.")
+                return None
+            suffixes[name] = EXACT_SUFFIX
+    directory = columns_dir(csv_path)
+    return {
+        name: np.load(os.path.join(directory, name + suffixes[name] + ".npy"), mmap_mode=mmap_mode)
+        for name in columns
+    }
+
+
+def load_dataset(columns=None, csv_path=CSV_PATH, exact=False):
+    """Load `columns` (default all) of the patient dataset as a DataFrame.
+
+    Reads the columnar copy when it is up to date and falls back to parsing
+    the CSV otherwise; both paths return the same compact dtypes. With
+    exact=True (for training) the float columns are float64 as in the CSV.
+    """
+    arrays = load_columns(columns, csv_path, exact=exact)
+    if arrays is None:
+        df = read_csv_compact(csv_path, columns, exact)
+        return df[columns] if columns else df
+
+    schema = read_schema(csv_path)
+    data = {}
+    for name, values in arrays.items():
+        categories = schema["columns"][name].get("categories")
+        if categories is not None:
+            data[name] = pd.Categorical.from_codes(values, categories)
+        else:
+            data[name] = values
+    return pd.DataFrame(data, copy=False)
+
+
+def iter_chunks(columns, chunk_size, csv_path=CSV_PATH, exact=False):
+    # Yields DataFrames of at most chunk_size rows: slices of the memory-mapped
+    # columns when converted, otherwise chunks parsed from the CSV. Only one
+    # chunk is materialised at a time. exact works as in load_dataset.
+    arrays = load_columns(columns, csv_path, exact=exact)
+    if arrays is None:
+        dtypes = EXACT_DTYPES if exact else CSV_DTYPES
+        for chunk in pd.read_csv(csv_path, usecols=columns, dtype=dtypes, chunksize=chunk_size):
+            yield chunk[columns]
+        return
+    rows = len(next(iter(arrays.values())))
+    for start in range(0, rows, chunk_size):
+        yield pd.DataFrame(
+            {name: np.asarray(values[start:start + chunk_size]) for name, values in arrays.items()}
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar copy of the patient dataset")
+    commands = parser.add_subparsers(dest="command", required=True)
+    convert_parser = commands.add_parser("convert", help="Write typed .npy columns from the CSV")
+    convert_parser.add_argument("csv", nargs="?", default=CSV_PATH)
+    args = parser.parse_args()
+
+    schema = convert(args.csv)
+    directory = columns_dir(args.csv)
+    size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)
+               if name.endswith(".npy"))
+    print(f"Wrote {schema['rows']} rows x {len(schema['columns'])} columns to {directory}")
+    print(f"{os.path.getsize(args.csv) / 1e6:.2f} MB of CSV -> {size / 1e6:.2f} MB of columns")
+
+
+if __name__ == "__main__":
+    main()
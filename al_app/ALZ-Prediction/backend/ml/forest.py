@@ -0,0 +1,376 @@
+import json
+import os
+import numpy as np
+
+# Arrays making up a compiled forest, one .npy file each
+# (children[:, 0] is the left child, children[:, 1] the right one)
+ARRAYS = ("feature", "threshold", "children", "value", "roots", "classes")
+# Compact exports keep one table of quantized class distributions instead
+# of `value`, and `distribution` points every node at its row
+COMPACT_ARRAYS = ("feature", "threshold", "children", "distribution", "distributions", "roots", "classes")
+META_FILE = "meta.json"
+
+
+def float32_floor(values):
+    # Largest float32 <= each value
+    values = np.asarray(values, dtype=np.float64)
+    below = values.astype(np.float32)
+    rounded_up = below.astype(np.float64) > values
+    below[rounded_up] = np.nextafter(below[rounded_up], np.float32(-np.inf))
+    return below
+
+
+def float32_cutoff(threshold):
+    # Largest float64 value v with float32(v) <= threshold, i.e. the split
+    # that sklearn effectively applies to inputs it casts to float32.
+    below = float32_floor(threshold)
+    above = np.nextafter(below, np.float32(np.inf))
+    midpoint = (below.astype(np.float64) + above.astype(np.float64)) / 2
+    # A value exactly at the midpoint rounds to the neighbour with an even
+    # mantissa, so the midpoint itself only belongs below when that is `below`
+    midpoint_rounds_up = (below.view(np.uint32) & 1) == 1
+    return np.where(midpoint_rounds_up, np.nextafter(midpoint, -np.inf), midpoint)
+
+
+def leaf_distributions(tree):
+    # Class distribution of every node of a fitted sklearn tree, exactly as
+    # DecisionTreeClassifier.predict_proba returns it. sklearn >= 1.4 stores
+    # class fractions and returns them unchanged (renormalising would move
+    # impure leaves by an ulp); older versions store class counts and
+    # normalise them.
+    value = tree.value[:, 0, :].astype(np.float64)
+    normalizer = value.sum(axis=1, keepdims=True)
+    if np.allclose(normalizer, 1.0):
+        return value
+    normalizer[normalizer == 0.0] = 1.0
+    return value / normalizer
+
+
+def flatten_forest(model, scaler=None):
+    # Concatenate the nodes of every tree into shared arrays. Children are
+    # stored as global node ids, and leaves point at themselves so that a
+    # fixed number of traversal steps leaves every row parked on its leaf.
+    #
+    # With a fitted StandardScaler the scaling is folded into the split
+    # thresholds: (x - mean) / scale <= t  <=>  x <= t * scale + mean, as
+    # scale is always positive. The fused forest then takes raw feature rows.
+    # Thresholds are widened to the float32 rounding boundary first so the
+    # fused forest branches like sklearn does on float32-cast scaled input.
+    features, thresholds, children, values, roots = [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        node_ids = np.arange(tree.node_count) + offset
+        is_leaf = tree.children_left == -1
+
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+        children.append(np.stack([
+            np.where(is_leaf, node_ids, tree.children_left + offset),
+            np.where(is_leaf, node_ids, tree.children_right + offset),
+        ], axis=1))
+
+        values.append(leaf_distributions(tree))
+
+        roots.append(offset)
+        offset += tree.node_count
+        max_depth = max(max_depth, tree.max_depth)
+
+    feature = np.concatenate(features).astype(np.int32)
+    threshold = np.concatenate(thresholds).astype(np.float64)
+    if scaler is not None:
+        n_features = model.n_features_in_
+        mean = scaler.mean_ if scaler.mean_ is not None else np.zeros(n_features)
+        scale = scaler.scale_ if scaler.scale_ is not None else np.ones(n_features)
+        threshold = float32_cutoff(threshold) * scale[feature] + mean[feature]
+
+    arrays = {
+        "feature": feature,
+        "threshold": threshold,
+        "children": np.concatenate(children).astype(np.int32),
+        "value": np.concatenate(values),
+        "roots": np.array(roots, dtype=np.int32),
+        "classes": np.asarray(model.classes_),
+    }
+    meta = {
+        "n_features": int(model.n_features_in_),
+        "n_trees": len(model.estimators_),
+        "n_nodes": int(offset),
+        "max_depth": int(max_depth),
+        "fused_scaler": scaler is not None,
+    }
+    return arrays, meta
+
+
+def quantize_distributions(value, bits):
+    # Class distributions -> integers summing to 2**bits - 1 per row. Each
+    # row is rounded down and the shortfall goes to the classes with the
+    # largest remainders, so no row loses or gains probability mass.
+    scale = (1 << bits) - 1
+    scaled = np.asarray(value, dtype=np.float64) * scale
+    quantized = np.floor(scaled).astype(np.int64)
+    shortfall = np.clip(scale - quantized.sum(axis=1), 0, None)
+    order = np.argsort(quantized - scaled, axis=1, kind="stable")
+    rank = np.empty_like(order)
+    np.put_along_axis(rank, order, np.arange(order.shape[1])[None, :].repeat(len(order), axis=0), axis=1)
+    quantized += rank < shortfall[:, None]
+    return quantized, scale
+
+
+def compact_forest(arrays, meta, bits=8, prune_tolerance=0.0):
+    """Smaller, approximate version of a flattened forest.
+
+    - Class distributions are quantized to `bits` (8 or 16) and stored once
+      in a table that nodes index into.
+    - Thresholds are stored as float32, rounded down, so a float32 input
+      (the unfused forest) branches exactly as before; raw float64 inputs
+      (fused) can only differ when they fall between the two roundings.
+    - Splits between two leaves that predict the same quantized
+      distribution are pruned, bottom-up, so collapsed subtrees can
+      collapse their parents. With `prune_tolerance` > 0, leaves whose
+      probabilities differ by at most that much are collapsed too, into
+      the parent's own distribution (what a shallower tree would predict).
+    - Leaves with the same distribution are merged into one node shared by
+      every tree; the trees become a DAG that the walk handles unchanged.
+    """
+    feature = np.asarray(arrays["feature"])
+    children = np.asarray(arrays["children"])
+    roots = np.asarray(arrays["roots"])
+    n_nodes = len(feature)
+    node_ids = np.arange(n_nodes)
+    left, right = children[:, 0], children[:, 1]
+    is_leaf = left == node_ids
+    # Nodes are numbered depth first, so children come after their parent
+    if np.any(children[~is_leaf] <= node_ids[~is_leaf, None]):
+        raise ValueError("Expected every child to be numbered after its parent")
+
+    quantized, scale = quantize_distributions(arrays["value"], bits)
+    tolerance = prune_tolerance * scale
+    for node in range(n_nodes - 1, -1, -1):
+        if is_leaf[node]:
+            continue
+        l, r = left[node], right[node]
+        if not (is_leaf[l] and is_leaf[r]):
+            continue
+        difference = np.abs(quantized[l] - quantized[r]).max()
+        if difference == 0:
+            is_leaf[node] = True
+            quantized[node] = quantized[l]
+        elif difference <= tolerance:
+            is_leaf[node] = True
+
+    reachable = np.zeros(n_nodes, dtype=bool)
+    reachable[roots] = True
+    for node in range(n_nodes):
+        if reachable[node] and not is_leaf[node]:
+            reachable[left[node]] = reachable[right[node]] = True
+    internal = np.flatnonzero(reachable & ~is_leaf)
+    leaves = np.flatnonzero(reachable & is_leaf)
+
+    # Internal nodes keep their order, then one node per distinct leaf
+    leaf_rows, leaf_slot = np.unique(quantized[leaves], axis=0, return_inverse=True)
+    n_internal, n_compact = len(internal), len(internal) + len(leaf_rows)
+    new_id = np.full(n_nodes, -1, dtype=np.int64)
+    new_id[internal] = np.arange(n_internal)
+    new_id[leaves] = n_internal + leaf_slot.ravel()
+
+    distributions, distribution = np.unique(
+        np.concatenate([quantized[internal], leaf_rows]), axis=0, return_inverse=True
+    )
+    shared_leaves = np.arange(n_internal, n_compact)
+    compact_children = np.concatenate([
+        np.stack([new_id[left[internal]], new_id[right[internal]]], axis=1),
+        np.stack([shared_leaves, shared_leaves], axis=1),
+    ])
+
+    compact = {
+        "feature": np.concatenate([feature[internal], np.zeros(len(leaf_rows), dtype=feature.dtype)])
+        .astype(np.min_scalar_type(max(meta["n_features"] - 1, 0))),
+        "threshold": np.concatenate([
+            float32_floor(np.asarray(arrays["threshold"])[internal]), np.zeros(len(leaf_rows), dtype=np.float32)
+        ]),
+        "children": compact_children.astype(np.min_scalar_type(n_compact - 1)),
+        "distribution": distribution.ravel().astype(np.min_scalar_type(len(distributions) - 1)),
+        "distributions": distributions.astype(np.uint8 if bits <= 8 else np.uint16),
+        "roots": new_id[roots].astype(np.int32),
+        "classes": np.asarray(arrays["classes"]),
+    }
+    compact_meta = dict(
+        meta, format="compact", bits=bits, scale=scale, n_nodes=int(n_compact),
+        source_nodes=int(n_nodes), pruned_nodes=int(n_nodes - reachable.sum()),
+        n_distributions=int(len(distributions)), prune_tolerance=prune_tolerance,
+    )
+    return compact, compact_meta
+
+
+def save_forest(path, arrays, meta):
+    names = COMPACT_ARRAYS if meta.get("format") == "compact" else ARRAYS
+    os.makedirs(path, exist_ok=True)
+    for name in names:
+        np.save(os.path.join(path, name + ".npy"), np.ascontiguousarray(arrays[name]))
+    with open(os.path.join(path, META_FILE), 'w') as f:
+        json.dump(meta, f, indent=4)
+    return meta
+
+
+def export_forest(model, path, scaler=None):
+    return save_forest(path, *flatten_forest(model, scaler))
+
+
+def export_compact_forest(model, path, scaler=None, bits=8, prune_tolerance=0.0):
+    arrays, meta = compact_forest(*flatten_forest(model, scaler), bits=bits, prune_tolerance=prune_tolerance)
+    return save_forest(path, arrays, meta)
+
+
+class ForestEngine:
+    """Pure-NumPy random forest evaluation over flattened node arrays.
+
+    Mirrors the parts of RandomForestClassifier that serving needs
+    (`classes_`, `predict_proba`, `predict`) and returns the same
+    probabilities. Loaded arrays are memory-mapped read-only, so worker
+    processes share the pages through the OS page cache.
+
+    A forest exported with a scaler (`fused_scaler`) expects raw, unscaled
+    feature rows.
+    """
+
+    def __init__(self, arrays, meta):
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.children = arrays["children"]
+        self.value = arrays.get("value")  # None in compact exports
+        self.roots = arrays["roots"]
+        self.classes_ = np.asarray(arrays["classes"])
+        self.n_features_in_ = meta["n_features"]
+        self.n_trees = meta["n_trees"]
+        self.max_depth = meta["max_depth"]
+        self.fused_scaler = meta.get("fused_scaler", False)
+        # sklearn compares float32 inputs against float64 thresholds, so the
+        # scaled input is cast the same way to take identical branches. Fused
+        # thresholds live in raw feature space, where rounding the input to
+        # float32 would move it relative to the folded threshold.
+        self.input_dtype = np.float64 if self.fused_scaler else np.float32
+
+    @classmethod
+    def from_model(cls, model, scaler=None):
+        return cls(*flatten_forest(model, scaler))
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        # Full or compact export, whichever `path` holds
+        with open(os.path.join(path, META_FILE), 'r') as f:
+            meta = json.load(f)
+        compact = meta.get("format") == "compact"
+        arrays = {
+            name: np.load(os.path.join(path, name + ".npy"), mmap_mode=mmap_mode)
+            for name in (COMPACT_ARRAYS if compact else ARRAYS)
+        }
+        return CompactForestEngine(arrays, meta) if compact else cls(arrays, meta)
+
+    def apply(self, X):
+        # Leaf id reached in every tree, shape (n_samples, n_trees)
+        return self._walk(X)
+
+    def _walk(self, X, contributions=None):
+        # Traversal behind apply(). With a (n_samples * n_features, n_classes)
+        # `contributions` array, every step also adds the change in class
+        # distribution it causes to the split feature of its sample.
+        X = np.ascontiguousarray(X, dtype=self.input_dtype)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(
+                f"Expected input with {self.n_features_in_} features, got shape {X.shape}"
+            )
+        n_samples, n_features = X.shape
+        flat_X = X.ravel()
+        children = self.children.ravel()
+
+        # One slot per (sample, tree) pair, walked level by level. Slots whose
+        # node stopped moving have reached their leaf and are dropped from
+        # the active set every few levels.
+        node = np.tile(self.roots, n_samples)
+        row_offset = np.repeat(np.arange(n_samples, dtype=np.int64) * n_features, self.n_trees)
+        active = np.arange(node.size)
+        for depth in range(self.max_depth):
+            current = node[active]
+            go_right = ~(flat_X[row_offset[active] + self.feature[current]] <= self.threshold[current])
+            following = children[2 * current + go_right]
+            node[active] = following
+            if contributions is not None:
+                # Leaves point at themselves, so parked slots add zero
+                delta = self._node_values(following) - self._node_values(current)
+                index = (active // self.n_trees) * n_features + self.feature[current]
+                for k in range(delta.shape[1]):
+                    contributions[:, k] += np.bincount(
+                        index, weights=delta[:, k], minlength=len(contributions)
+                    )
+            if depth % 4 == 3:
+                active = active[following != current]
+                if not active.size:
+                    break
+        return node.reshape(n_samples, self.n_trees)
+
+    def _node_values(self, nodes):
+        # Class distribution of each node
+        return self.value[nodes]
+
+    def _tree_sum(self, leaves):
+        # Class distributions of (n_samples, n_trees) nodes summed per sample
+        return self.value[leaves].sum(axis=1)
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        return self._tree_sum(leaves) / self.n_trees
+
+    @property
+    def bias(self):
+        # Class distribution at the roots, averaged over the trees: the
+        # prediction before any feature has been looked at
+        return self._tree_sum(self.roots[None, :])[0] / self.n_trees
+
+    def evaluate(self, X, explain=False):
+        """Classes, probabilities and, with `explain`, feature contributions.
+
+        Everything comes from one walk over the trees. Contributions use the
+        tree-path decomposition: each split moves the class distribution
+        from the parent's to the child's, and that change is credited to the
+        split feature. They have shape (n_samples, n_features, n_classes) and
+        `bias + contributions.sum(axis=1)` equals the probabilities up to
+        rounding. Without `explain` the third value is None.
+        """
+        n_samples = len(X)
+        contributions = None
+        if explain:
+            contributions = np.zeros((n_samples * self.n_features_in_, len(self.classes_)))
+        leaves = self._walk(X, contributions)
+        probabilities = self._tree_sum(leaves) / self.n_trees
+        classes = self.classes_[probabilities.argmax(axis=1)]
+        if explain:
+            contributions = contributions.reshape(n_samples, self.n_features_in_, -1) / self.n_trees
+        return classes, probabilities, contributions
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+class CompactForestEngine(ForestEngine):
+    """ForestEngine over a compact export (see compact_forest).
+
+    Probabilities are the quantized leaf distributions averaged over the
+    trees, within 1/scale of the full forest's when both reach the same
+    leaves. Explanations work as before, from quantized node distributions.
+    """
+
+    def __init__(self, arrays, meta):
+        super().__init__(arrays, meta)
+        self.meta = meta
+        self.distribution = arrays["distribution"]
+        self.distributions = arrays["distributions"]
+        self.scale = meta["scale"]
+
+    def _node_values(self, nodes):
+        return self.distributions[self.distribution[nodes]] / self.scale
+
+    def _tree_sum(self, leaves):
+        # Integer sums are exact; a single division per class at the end
+        return self.distributions[self.distribution[leaves]].sum(axis=1, dtype=np.int64) / self.scale
@@ -0,0 +1,180 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+
+# Layout:
+#   model_registry/CURRENT                      name of the version being served
+#   model_registry/versions/<version>/          copied artifacts + manifest.json
+# Version directories are never modified after publishing. CURRENT is
+# replaced atomically, so readers see either the old or the new version.
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REGISTRY_DIR = os.environ.get("MODEL_REGISTRY_DIR", os.path.join(BASE_DIR, 'model_registry'))
+MANIFEST_FILE = "manifest.json"
+
+# Everything the API can serve from; whichever exist are published
+ARTIFACTS = [
+    'model_multiclass.pkl',
+    'scaler_multiclass.pkl',
+    'forest_multiclass',
+    'forest_multiclass_fused',
+    'forest_multiclass_compact',
+]
+
+
+class RegistryError(Exception):
+    pass
+
+
+def versions_dir(registry_dir=REGISTRY_DIR):
+    return os.path.join(registry_dir, 'versions')
+
+
+def version_dir(version, registry_dir=REGISTRY_DIR):
+    return os.path.join(versions_dir(registry_dir), version)
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def list_files(root):
+    # Relative paths of every file under root, in a stable order
+    files = []
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.relpath(os.path.join(directory, name), root)
+            if path != MANIFEST_FILE:
+                files.append(path.replace(os.sep, '/'))
+    return sorted(files)
+
+
+def checksums(root):
+    return {path: file_digest(os.path.join(root, path)) for path in list_files(root)}
+
+
+def publish(source_dir=BASE_DIR, registry_dir=REGISTRY_DIR, activate=True):
+    present = [name for name in ARTIFACTS if os.path.exists(os.path.join(source_dir, name))]
+    if not present:
+        raise RegistryError(f"No model artifacts found in {source_dir}")
+
+    # Stage in a temporary directory, then rename into place
+    os.makedirs(versions_dir(registry_dir), exist_ok=True)
+    staging = os.path.join(versions_dir(registry_dir), f".staging-{os.getpid()}-{time.time_ns()}")
+    os.makedirs(staging)
+    try:
+        for name in present:
+            source = os.path.join(source_dir, name)
+            if os.path.isdir(source):
+                shutil.copytree(source, os.path.join(staging, name))
+            else:
+                shutil.copy2(source, os.path.join(staging, name))
+        files = checksums(staging)
+        content = hashlib.sha256(json.dumps(files, sort_keys=True).encode()).hexdigest()
+        version = time.strftime("%Y%m%d-%H%M%S") + "-" + content[:8]
+        manifest = {
+            "version": version,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "artifacts": present,
+            "files": files,
+        }
+        with open(os.path.join(staging, MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, indent=4)
+        os.replace(staging, version_dir(version, registry_dir))
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    if activate:
+        set_current(version, registry_dir)
+    return version
+
+
+def read_manifest(version, registry_dir=REGISTRY_DIR):
+    path = os.path.join(version_dir(version, registry_dir), MANIFEST_FILE)
+    if not os.path.exists(path):
+        raise RegistryError(f"Unknown model version: {version}")
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def verify(version, registry_dir=REGISTRY_DIR):
+    # Manifest of `version` after checking every file against its checksum
+    manifest = read_manifest(version, registry_dir)
+    root = version_dir(version, registry_dir)
+    actual = checksums(root)
+    if actual != manifest["files"]:
+        bad = sorted({path for path, _ in set(actual.items()) ^ set(manifest["files"].items())})
+        raise RegistryError(f"Checksum mismatch in {version}: {', '.join(bad)}")
+    return manifest
+
+
+def current_version(registry_dir=REGISTRY_DIR):
+    try:
+        with open(os.path.join(registry_dir, 'CURRENT'), 'r') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def set_current(version, registry_dir=REGISTRY_DIR):
+    verify(version, registry_dir)
+    pointer = os.path.join(registry_dir, 'CURRENT')
+    tmp_path = f"{pointer}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(version + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, pointer)
+
+
+def list_versions(registry_dir=REGISTRY_DIR):
+    if not os.path.isdir(versions_dir(registry_dir)):
+        return []
+    return sorted(name for name in os.listdir(versions_dir(registry_dir)) if not name.startswith('.'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Versioned model registry")
+    commands = parser.add_subparsers(dest="command", required=True)
+    publish_parser = commands.add_parser("publish", help="Publish the trained artifacts as a new version")
+    publish_parser.add_argument("--source", default=BASE_DIR)
+    publish_parser.add_argument("--no-activate", action="store_true")
+    commands.add_parser("list", help="List versions")
+    activate_parser = commands.add_parser("activate", help="Point CURRENT at a version (e.g. roll back)")
+    activate_parser.add_argument("version")
+    verify_parser = commands.add_parser("verify", help="Check a version's checksums")
+    verify_parser.add_argument("version", nargs="?")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "publish":
+            version = publish(args.source, activate=not args.no_activate)
+            print(f"Published {version}" + ("" if args.no_activate else " (current)"))
+        elif args.command == "list":
+            current = current_version()
+            for version in list_versions():
+                print(("* " if version == current else "  ") + version)
+        elif args.command == "activate":
+            set_current(args.version)
+            print(f"Current version is now {args.version}")
+        elif args.command == "verify":
+            version = args.version or current_version()
+            if version is None:
+                raise RegistryError("No current version")
+            verify(version)
+            print(f"{version}: OK")
+    except RegistryError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import itertools
+import math
+import time
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import f1_score
+from sklearn.model_selection import train_test_split
+
+from backend.ml.forest import ForestEngine, flatten_forest
+
+# Hyperparameter search for the stage forest (train_multiclass.py --search).
+#
+# Candidates are sampled from SEARCH_SPACE and fitted in parallel, one
+# forest per core. Successive halving scores every candidate on a small
+# share of the training rows first and only promotes the better ones to
+# larger shares, so most of the fitting time goes to the configurations
+# worth it. The survivors of the last round are trained on all the rows
+# and timed the way the API serves them, and the most accurate one within
+# the latency budget is exported.
+
+SEARCH_SPACE = {
+    "n_estimators": [10, 20, 30, 50, 100, 200],
+    "max_depth": [6, 8, 10, 12, 16, None],
+    "min_samples_leaf": [1, 2, 4],
+    "max_features": ["sqrt", 0.5],
+}
+
+# (key, 1 to maximize or -1 to minimize) for the Pareto report
+OBJECTIVES = [("macro_f1", 1), ("single_ms", -1), ("size_kb", -1)]
+
+
+def sample_candidates(n_candidates, random_state):
+    grid = [dict(zip(SEARCH_SPACE, values)) for values in itertools.product(*SEARCH_SPACE.values())]
+    if n_candidates >= len(grid):
+        return grid
+    rng = np.random.default_rng(random_state)
+    return [grid[i] for i in sorted(rng.choice(len(grid), n_candidates, replace=False).tolist())]
+
+
+def fit_and_score(params, X_fit, y_fit, X_val, y_val, random_state, keep_model=False):
+    # Runs in a worker process; only the final round sends the forest back
+    model = RandomForestClassifier(**params, random_state=random_state, n_jobs=1)
+    started = time.perf_counter()
+    model.fit(X_fit, y_fit)
+    result = {
+        "params": params,
+        "macro_f1": float(f1_score(y_val, model.predict(X_val), average="macro")),
+        "n_nodes": int(sum(tree.tree_.node_count for tree in model.estimators_)),
+        "fit_seconds": time.perf_counter() - started,
+    }
+    if keep_model:
+        model.set_params(n_jobs=None)
+        result["model"] = model
+    return result
+
+
+def dominates(a, b, objectives=OBJECTIVES):
+    return (all(sign * a[key] >= sign * b[key] for key, sign in objectives)
+            and any(sign * a[key] > sign * b[key] for key, sign in objectives))
+
+
+def pareto_front(results, objectives=OBJECTIVES):
+    return [a for a in results if not any(dominates(b, a, objectives) for b in results)]
+
+
+def halving_fractions(eta, min_fraction):
+    # Shares of the training rows per round, e.g. 1/9, 1/3, 1 for eta=3
+    n_rounds = max(1, math.ceil(math.log(1 / min_fraction, eta) - 1e-9) + 1)
+    return [min(1.0, min_fraction * eta ** i) for i in range(n_rounds)]
+
+
+def successive_halving(candidates, X_fit, y_fit, X_val, y_val, eta=3, min_fraction=1 / 9,
+                       n_jobs=-1, random_state=42):
+    # Returns the last round's results, with the fitted forests. Each round
+    # keeps the best 1/eta by macro-F1, plus every candidate on the
+    # (macro-F1, node count) front, so small forests that are nearly as
+    # accurate are not dropped before their serving cost is measured.
+    survivors = list(candidates)
+    fractions = halving_fractions(eta, min_fraction)
+    with Parallel(n_jobs=n_jobs) as parallel:
+        for round_number, fraction in enumerate(fractions, 1):
+            last = round_number == len(fractions)
+            if fraction < 1.0:
+                X_round, _, y_round, _ = train_test_split(
+                    X_fit, y_fit, train_size=fraction, stratify=y_fit, random_state=random_state
+                )
+            else:
+                X_round, y_round = X_fit, y_fit
+
+            started = time.perf_counter()
+            results = parallel(
+                delayed(fit_and_score)(params, X_round, y_round, X_val, y_val, random_state, keep_model=last)
+                for params in survivors
+            )
+            print(f"Round {round_number}: {len(results)} candidates on {len(X_round)} rows "
+                  f"in {time.perf_counter() - started:.1f}s, best macro-F1 "
+                  f"{max(result['macro_f1'] for result in results):.4f}")
+            if last:
+                return results
+
+            ranked = sorted(results, key=lambda result: -result["macro_f1"])
+            kept = ranked[:max(1, math.ceil(len(ranked) / eta))]
+            kept += [result for result in pareto_front(results, [("macro_f1", 1), ("n_nodes", -1)])
+                     if result not in kept]
+            survivors = [result["params"] for result in kept]
+
+
+def measure_serving(model, scaler, X_raw, single_repeats=200, batch_size=1000, batch_repeats=5):
+    # Cost as the API serves the model: the fused forest on raw rows
+    arrays, meta = flatten_forest(model, scaler)
+    engine = ForestEngine(arrays, meta)
+    X_raw = np.asarray(X_raw, dtype=np.float64)
+    engine.predict_proba(X_raw[:1])
+
+    single = []
+    for i in range(single_repeats):
+        row = X_raw[i % len(X_raw)][None, :]
+        started = time.perf_counter()
+        engine.predict_proba(row)
+        single.append(time.perf_counter() - started)
+
+    batch_rows = np.resize(X_raw, (batch_size, X_raw.shape[1]))
+    batch = []
+    for _ in range(batch_repeats):
+        started = time.perf_counter()
+        engine.predict_proba(batch_rows)
+        batch.append(time.perf_counter() - started)
+
+    return {
+        "single_ms": float(np.median(single) * 1000),
+        "single_p95_ms": float(np.percentile(single, 95) * 1000),
+        "batch_us_per_row": float(np.median(batch) / batch_size * 1e6),
+        "size_kb": sum(np.asarray(array).nbytes for array in arrays.values()) / 1024,
+        "n_nodes": meta["n_nodes"],
+        "max_depth": meta["max_depth"],
+    }
+
+
+def choose(results, latency_budget_ms):
+    # Most accurate candidate whose single-row latency fits the budget;
+    # ties go to the smaller forest
+    fitting = [result for result in results if result["single_ms"] <= latency_budget_ms]
+    if not fitting:
+        return None
+    return max(fitting, key=lambda result: (result["macro_f1"], -result["size_kb"]))
+
+
+def format_params(params):
+    return ", ".join(f"{name}={value}" for name, value in params.items())
+
+
+def print_report(results, selected, latency_budget_ms):
+    front = pareto_front(results)
+    print(f"\nSearch results (* = Pareto front on macro-F1, single-row latency and size; "
+          f"> = selected, budget {latency_budget_ms:g} ms):")
+    print(f"    {'macro-F1':>8} {'1 row ms':>9} {'p95 ms':>8} {'us/row':>8} {'nodes':>8} {'KB':>8}  params")
+    for result in sorted(results, key=lambda result: (-result["macro_f1"], result["single_ms"])):
+        mark = (">" if result is selected else " ") + ("*" if result in front else " ")
+        print(f"{mark}  {result['macro_f1']:>8.4f} {result['single_ms']:>9.3f} {result['single_p95_ms']:>8.3f} "
+              f"{result['batch_us_per_row']:>8.2f} {result['n_nodes']:>8} {result['size_kb']:>8.0f}  "
+              f"{format_params(result['params'])}")
@@ -0,0 +1,194 @@
+import argparse
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+import sys
+
+# Paths
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CSV_PATH = os.path.join(os.path.dirname(os.path.dirname(BASE_DIR)), 'alzheimers_disease_data.csv')
+STATS_PATH = os.path.join(BASE_DIR, 'stats.json')
+STATE_PATH = os.path.join(BASE_DIR, 'stats_state.json')
+
+# Allow `from backend.ml ...` when run as a script
+sys.path.append(os.path.dirname(os.path.dirname(BASE_DIR)))
+from backend.ml.dataset import load_columns
+
+COLUMNS = ['Age', 'Diagnosis']
+CHUNK_SIZE = 100_000
+
+
+class StatsAggregate:
+    """Mergeable running totals behind the landing page stats.
+
+    Holds only counts, sums and an age histogram, so a new patient record
+    updates it in O(1) and two aggregates (e.g. from separate batches or
+    workers) combine with `merge`.
+    """
+
+    def __init__(self, total=0, diagnosed=0, age_sum=0, age_counts=None, batches=None):
+        self.total = total
+        self.diagnosed = diagnosed
+        self.age_sum = age_sum
+        self.age_counts = dict(age_counts or {})
+        self.batches = list(batches or [])  # digests of ingested batch files
+
+    def add(self, age, diagnosis):
+        age = int(age)
+        self.total += 1
+        self.diagnosed += int(diagnosis)
+        self.age_sum += age
+        self.age_counts[age] = self.age_counts.get(age, 0) + 1
+
+    def add_frame(self, df):
+        # Vectorized form of add() for a chunk of rows
+        ages = df['Age'].to_numpy(dtype=np.int64)
+        self.total += len(ages)
+        self.diagnosed += int(df['Diagnosis'].sum())
+        self.age_sum += int(ages.sum())
+        values, counts = np.unique(ages, return_counts=True)
+        for age, count in zip(values.tolist(), counts.tolist()):
+            self.age_counts[age] = self.age_counts.get(age, 0) + count
+
+    def merge(self, other):
+        self.total += other.total
+        self.diagnosed += other.diagnosed
+        self.age_sum += other.age_sum
+        for age, count in other.age_counts.items():
+            self.age_counts[age] = self.age_counts.get(age, 0) + count
+        self.batches.extend(b for b in other.batches if b not in self.batches)
+        return self
+
+    def to_stats(self):
+        # Same shape train_model.py has always written to stats.json
+        total = self.total
+        return {
+            "total_patients": total,
+            "diagnosed_count": self.diagnosed,
+            "not_diagnosed_count": total - self.diagnosed,
+            "average_age": self.age_sum / total if total else 0.0,
+            "age_distribution": {age: self.age_counts[age] for age in sorted(self.age_counts)},
+            "diagnosis_rate": self.diagnosed / total if total else 0.0,
+        }
+
+    def to_dict(self):
+        return {
+            "total": self.total,
+            "diagnosed": self.diagnosed,
+            "age_sum": self.age_sum,
+            "age_counts": {str(age): count for age, count in self.age_counts.items()},
+            "batches": self.batches,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            total=data["total"],
+            diagnosed=data["diagnosed"],
+            age_sum=data["age_sum"],
+            age_counts={int(age): count for age, count in data["age_counts"].items()},
+            batches=data.get("batches"),
+        )
+
+    @classmethod
+    def load(cls, path=STATE_PATH):
+        with open(path, 'r') as f:
+            return cls.from_dict(json.load(f))
+
+    def save(self, state_path=STATE_PATH, stats_path=STATS_PATH):
+        write_json_atomic(state_path, self.to_dict())
+        write_json_atomic(stats_path, self.to_stats())
+
+
+def write_json_atomic(path, data):
+    # Readers (the /stats route) never see a half-written file
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=4)
+    os.replace(tmp_path, path)
+
+
+def aggregate_csv(path, chunk_size=CHUNK_SIZE):
+    # Uses the columnar copy when there is one, otherwise streams the file,
+    # so memory stays flat however many rows it has
+    aggregate = StatsAggregate()
+    arrays = load_columns(COLUMNS, path)
+    if arrays is not None:
+        aggregate.add_frame(pd.DataFrame(arrays, copy=False))
+        return aggregate
+    for chunk in pd.read_csv(path, usecols=COLUMNS, chunksize=chunk_size):
+        aggregate.add_frame(chunk)
+    return aggregate
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def save_rebuilt(aggregate, force=False):
+    # Replaces the saved aggregate with one recomputed from the dataset.
+    # Batches ingested into the saved one are not in the dataset, so it is
+    # kept (and False returned) unless force is set.
+    if os.path.exists(STATE_PATH) and not force:
+        ingested = StatsAggregate.load(STATE_PATH).batches
+        if ingested:
+            print(f"Warning: {STATE_PATH} includes {len(ingested)} ingested batch(es) that are not "
+                  f"in the dataset; leaving it and {STATS_PATH} unchanged. Re-run "
+                  "`python backend/ml/stats_aggregate.py rebuild --force` to drop them.")
+            return False
+    aggregate.save(STATE_PATH, STATS_PATH)
+    return True
+
+
+def rebuild(csv_path=CSV_PATH, force=False):
+    print(f"Aggregating {csv_path}...")
+    aggregate = aggregate_csv(csv_path)
+    if save_rebuilt(aggregate, force):
+        print(f"{aggregate.total} patients aggregated into {STATS_PATH}")
+
+
+def ingest(batch_path):
+    # Append-only: each batch file is counted once, even if ingested again
+    if os.path.exists(STATE_PATH):
+        aggregate = StatsAggregate.load(STATE_PATH)
+    else:
+        print("No aggregate state yet, rebuilding from the full dataset first...")
+        aggregate = aggregate_csv(CSV_PATH)
+
+    digest = file_digest(batch_path)
+    if digest in aggregate.batches:
+        print(f"{batch_path} was already ingested, skipping.")
+        return
+
+    batch = aggregate_csv(batch_path)
+    batch.batches.append(digest)
+    aggregate.merge(batch)
+    aggregate.save(STATE_PATH, STATS_PATH)
+    print(f"Ingested {batch.total} new patients ({aggregate.total} in total)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the landing page statistics")
+    commands = parser.add_subparsers(dest="command", required=True)
+    rebuild_parser = commands.add_parser("rebuild", help="Recompute from the full dataset")
+    rebuild_parser.add_argument("csv", nargs="?", default=CSV_PATH)
+    rebuild_parser.add_argument("--force", action="store_true",
+                                help="Also drop rows added by earlier ingest runs")
+    ingest_parser = commands.add_parser("ingest", help="Add a CSV batch of new patient rows")
+    ingest_parser.add_argument("csv")
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        rebuild(args.csv, args.force)
+    else:
+        ingest(args.csv)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,15 +5,19 @@ from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score, classification_report
 import joblib
-import json
 import os
+import sys
 
 # Define paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_PATH = os.path.join(BASE_DIR, '../../alzheimers_disease_data.csv')
 MODEL_PATH = os.path.join(BASE_DIR, 'model.pkl')
 SCALER_PATH = os.path.join(BASE_DIR, 'scaler.pkl')
-STATS_PATH = os.path.join(BASE_DIR, 'stats.json')
+
+# Allow `from backend.ml ...` when run as a script
+sys.path.append(os.path.dirname(os.path.dirname(BASE_DIR)))
+from backend.ml.dataset import load_dataset
+from backend.ml.stats_aggregate import StatsAggregate, save_rebuilt
 
 def train_model():
     print("Loading data...")
@@ -21,11 +25,10 @@ def train_model():
         print(f"Error: Data file not found at {DATA_PATH}")
         return
 
-    df = pd.read_csv(DATA_PATH)
-
     # --- Data Preprocessing ---
-    # Drop PatientID and DoctorInCharge as they are not predictive
-    df = df.drop(['PatientID', 'DoctorInCharge'], axis=1)
+    # Skip PatientID and DoctorInCharge as they are not predictive
+    columns = pd.read_csv(DATA_PATH, nrows=0).columns
+    df = load_dataset([c for c in columns if c not in ('PatientID', 'DoctorInCharge')], DATA_PATH, exact=True)
 
     # Handle categorical variables if any (Diagnosis is the target)
     # Looking at the CSV, most features seem numerical or already encoded.
@@ -64,18 +67,13 @@ def train_model():
     joblib.dump(scaler, SCALER_PATH)
 
     # --- Generate Statistics for Landing Page ---
+    # Also saves the running aggregate, so new patient batches can be added
+    # later with `python backend/ml/stats_aggregate.py ingest <csv>`. An
+    # aggregate that already has ingested batches is kept.
     print("Generating statistics...")
-    stats = {
-        "total_patients": len(df),
-        "diagnosed_count": int(df['Diagnosis'].sum()),
-        "not_diagnosed_count": int(len(df) - df['Diagnosis'].sum()),
-        "average_age": float(df['Age'].mean()),
-        "age_distribution": df['Age'].value_counts().sort_index().to_dict(), # For charts
-        "diagnosis_rate": float(df['Diagnosis'].mean())
-    }
-
-    with open(STATS_PATH, 'w') as f:
-        json.dump(stats, f, indent=4)
+    stats = StatsAggregate()
+    stats.add_frame(df)
+    save_rebuilt(stats)
 
     print("Done!")
 
@@ -3,19 +3,36 @@ import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import classification_report, confusion_matrix
+from sklearn.metrics import accuracy_score, classification_report, confusion_matrix, f1_score
 from imblearn.over_sampling import SMOTE
+import argparse
+import hashlib
+import inspect
 import joblib
+import json
 import os
+import shutil
+import subprocess
+import sys
+import time
 
 # Paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 CSV_PATH = os.path.join(os.path.dirname(os.path.dirname(BASE_DIR)), 'alzheimers_disease_data.csv')
 MODEL_PATH = os.path.join(BASE_DIR, 'model_multiclass.pkl')
 SCALER_PATH = os.path.join(BASE_DIR, 'scaler_multiclass.pkl')
+FOREST_PATH = os.path.join(BASE_DIR, 'forest_multiclass')
+FUSED_FOREST_PATH = os.path.join(BASE_DIR, 'forest_multiclass_fused')
+COMPACT_FOREST_PATH = os.path.join(BASE_DIR, 'forest_multiclass_compact')
+SEARCH_REPORT_PATH = os.path.join(BASE_DIR, 'search_report.json')
+CACHE_DIR = os.path.join(BASE_DIR, '.pipeline_cache')
 
-print(f"Loading data from {CSV_PATH}...")
-df = pd.read_csv(CSV_PATH)
+# Allow `from backend.ml ...` when run as a script
+sys.path.append(os.path.dirname(os.path.dirname(BASE_DIR)))
+from backend.ml import dataset
+from backend.ml.dataset import load_dataset
+from backend.ml.forest import ForestEngine, export_compact_forest, export_forest
+from backend.ml import registry, search
 
 # Feature Selection (excluding ID, Doctor, Diagnosis)
 # We also exclude MMSE from features because we use it to define the target, 
@@ -38,7 +55,6 @@ features = [
     'Forgetfulness'
 ]
 
-X = df[features]
 
 # Create Target Variable 'Stage'
 # 0: No Alzheimer's
@@ -46,52 +62,395 @@ X = df[features]
 # 2: Mild (Diagnosis=1, 10 <= MMSE < 21)
 # 3: High Stage (Diagnosis=1, MMSE < 10)
 
-def categorize_stage(row):
-    if row['Diagnosis'] == 0:
-        return 0
-    else:
-        mmse = row['MMSE']
-        if mmse >= 21:
-            return 1 # Low Level
-        elif mmse >= 10:
-            return 2 # Mild
+def categorize_stages(diagnosis, mmse):
+    diagnosis = np.asarray(diagnosis)
+    mmse = np.asarray(mmse)
+    stage = np.select([mmse >= 21, mmse >= 10], [1, 2], default=3)
+    return np.where(diagnosis == 0, 0, stage)
+
+
+class Pipeline:
+    """Runs training stages with on-disk caching of their outputs.
+
+    Every stage output is stored under a key hashed from the stage name,
+    the source code of the stage, its parameters and the key of the stage
+    that fed it (the first key is the digest of the CSV). Re-running with
+    unchanged inputs and code loads the stored output instead of
+    recomputing it.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, use_cache=True):
+        self.cache_dir = cache_dir
+        self.use_cache = use_cache
+        self.timings = []
+
+    @staticmethod
+    def make_key(name, *parts):
+        # Functions and modules among the parts contribute their source, so
+        # editing a stage (or a helper passed along with it) re-runs it
+        # instead of reusing output the old code produced
+        digest = hashlib.sha256(name.encode())
+        for part in parts:
+            if inspect.isfunction(part) or inspect.ismodule(part):
+                part = inspect.getsource(part)
+            digest.update(json.dumps(part, sort_keys=True, default=str).encode())
+        return digest.hexdigest()[:16]
+
+    def run(self, name, fn, key, cache=True):
+        path = os.path.join(self.cache_dir, f"{name}-{key}.joblib")
+        started = time.perf_counter()
+        cached = cache and self.use_cache and os.path.exists(path)
+        if cached:
+            result = joblib.load(path)
         else:
-            return 3 # High Stage
+            result = fn()
+            if cache:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                joblib.dump(result, path)
+        elapsed = time.perf_counter() - started
+        self.timings.append((name, elapsed, cached))
+        print(f"[{name}] {elapsed:.2f}s{' (cached)' if cached else ''}")
+        return result
+
+    def report(self):
+        print("\nStage timings:")
+        for name, elapsed, cached in self.timings:
+            print(f"  {name:<10} {elapsed:>8.2f}s{'  cached' if cached else ''}")
+        print(f"  {'total':<10} {sum(t for _, t, _ in self.timings):>8.2f}s")
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_stage(csv_path):
+    print(f"Loading data from {csv_path}...")
+    # Full-precision vitals (see dataset.EXACT_DTYPES)
+    return load_dataset(features + ['Diagnosis'], csv_path, exact=True)
+
+
+def label_stage(df):
+    y = pd.Series(categorize_stages(df['Diagnosis'], df['MMSE']), index=df.index)
+    print("Target distribution:")
+    print(y.value_counts().sort_index())
+    # The integer columns keep their compact dtypes until here; the API
+    # scales float64 rows
+    return df[features].astype(np.float64), y
+
+
+def split_scale_stage(X, y, test_size, random_state):
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=test_size, random_state=random_state
+    )
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train)
+    X_test_scaled = scaler.transform(X_test)
+    return {
+        "scaler": scaler,
+        "X_train_scaled": X_train_scaled,
+        "X_test": X_test,
+        "X_test_scaled": X_test_scaled,
+        "y_train": y_train,
+        "y_test": y_test,
+    }
+
+
+def resample_stage(X_train_scaled, y_train, random_state):
+    # Handle Imbalance
+    smote = SMOTE(random_state=random_state)
+    X_train_resampled, y_train_resampled = smote.fit_resample(X_train_scaled, y_train)
+    print("Resampled target distribution:")
+    print(pd.Series(y_train_resampled).value_counts().sort_index())
+    return X_train_resampled, y_train_resampled
+
+
+def fit_stage(X_train, y_train, params, n_jobs):
+    print("Training Random Forest Classifier...")
+    model = RandomForestClassifier(**params, n_jobs=n_jobs)
+    model.fit(X_train, y_train)
+    # Serving scores one small batch at a time, where thread fan-out only
+    # adds overhead; training parallelism is not needed after this point.
+    model.set_params(n_jobs=None)
+    return model
+
+
+def evaluate_stage(model, X_test_scaled, y_test):
+    y_pred = model.predict(X_test_scaled)
+    return classification_report(y_test, y_pred)
+
+
+# Run in a fresh interpreter per artifact, so load time and memory are
+# what a serving worker would see: argv is kind, path, project dir
+FOOTPRINT_SCRIPT = """
+import json, sys, time
+sys.path.insert(0, sys.argv[3])
+import numpy as np
+
+def rss_kb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+
+if sys.argv[1] == 'pickle':
+    import joblib
+else:
+    from backend.ml.forest import ForestEngine
+before = rss_kb()
+started = time.perf_counter()
+if sys.argv[1] == 'pickle':
+    model = joblib.load(sys.argv[2])
+else:
+    model = ForestEngine.load(sys.argv[2])
+    # Page in every memory-mapped array, as serving eventually does
+    for value in vars(model).values():
+        if isinstance(value, np.ndarray):
+            value.sum()
+load_ms = (time.perf_counter() - started) * 1000
+after = rss_kb()
+print(json.dumps({'load_ms': load_ms, 'rss_mb': (after - before) / 1024 if before else None}))
+"""
+
+
+def artifact_size(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path)
+
+
+def footprint(kind, path):
+    output = subprocess.run(
+        [sys.executable, "-c", FOOTPRINT_SCRIPT, kind, path, os.path.dirname(os.path.dirname(BASE_DIR))],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def compact_report(model, X_test, y_test):
+    # Full forest vs the compact export on the held-out split, plus what
+    # each serving artifact costs to store and load. Returns how many
+    # predicted stages the compact forest changes.
+    fused = ForestEngine.load(FUSED_FOREST_PATH).predict_proba(X_test)
+    compact = ForestEngine.load(COMPACT_FOREST_PATH).predict_proba(X_test)
+    with open(os.path.join(COMPACT_FOREST_PATH, "meta.json"), 'r') as f:
+        meta = json.load(f)
+    print(f"Compact forest: {meta['bits']}-bit distributions, {meta['source_nodes']} -> {meta['n_nodes']} nodes "
+          f"({meta['pruned_nodes']} pruned, leaves shared), {meta['n_distributions']} distinct distributions")
+
+    predictions = {
+        "fused": model.classes_[fused.argmax(axis=1)],
+        "compact": model.classes_[compact.argmax(axis=1)],
+    }
+    print(f"  {'artifact':<10} {'size KB':>9} {'load ms':>9} {'RSS MB':>8} {'accuracy':>9} {'macro-F1':>9}")
+    for kind, path in (("pickle", MODEL_PATH), ("fused", FUSED_FOREST_PATH), ("compact", COMPACT_FOREST_PATH)):
+        cost = footprint(kind, path)
+        # The pickle and the fused forest give identical predictions
+        y_pred = predictions["compact" if kind == "compact" else "fused"]
+        rss = f"{cost['rss_mb']:>8.1f}" if cost["rss_mb"] is not None else f"{'n/a':>8}"
+        print(f"  {kind:<10} {artifact_size(path) / 1024:>9.0f} {cost['load_ms']:>9.1f} {rss} "
+              f"{accuracy_score(y_test, y_pred):>9.4f} {f1_score(y_test, y_pred, average='macro'):>9.4f}")
+    changed = int((predictions["compact"] != predictions["fused"]).sum())
+    print(f"  Compact vs full: {changed} of {len(X_test)} predicted stages changed, "
+          f"largest probability difference {np.abs(compact - fused).max():.2e}")
+    return changed
+
+
+def save_model(model, scaler):
+    print(f"Saving model to {MODEL_PATH}...")
+    joblib.dump(model, MODEL_PATH)
+    print(f"Saving scaler to {SCALER_PATH}...")
+    joblib.dump(scaler, SCALER_PATH)
+
+
+def remove_stale_forests(*keep):
+    # The API's "auto" serving mode prefers any compiled forest over the
+    # pickle, so one left over from an earlier model would be served instead
+    for path in (FOREST_PATH, FUSED_FOREST_PATH, COMPACT_FOREST_PATH):
+        if path not in keep and os.path.isdir(path):
+            print(f"Removing stale {path}...")
+            shutil.rmtree(path)
+
+
+def export_stage(model, scaler, X_test, X_test_scaled, y_test=None, compact=None):
+    save_model(model, scaler)
+
+    # Compiled array form loaded by the API (see backend/ml/forest.py)
+    print(f"Exporting compiled forest to {FOREST_PATH}...")
+    meta = export_forest(model, FOREST_PATH)
+    print(f"{meta['n_trees']} trees, {meta['n_nodes']} nodes, max depth {meta['max_depth']}")
+    engine = ForestEngine.load(FOREST_PATH)
+    if not np.array_equal(engine.predict_proba(X_test_scaled), model.predict_proba(X_test_scaled)):
+        raise RuntimeError("Compiled forest does not reproduce predict_proba")
+
+    # Same forest with the scaler folded into its thresholds; takes raw rows
+    print(f"Exporting fused scaler + forest to {FUSED_FOREST_PATH}...")
+    export_forest(model, FUSED_FOREST_PATH, scaler=scaler)
+    fused = ForestEngine.load(FUSED_FOREST_PATH)
+    if not np.array_equal(fused.predict_proba(X_test), model.predict_proba(X_test_scaled)):
+        raise RuntimeError("Fused forest does not reproduce predict_proba")
+
+    # Optional quantized and pruned copy of the fused forest:
+    # {"bits", "prune_tolerance", "max_changed"}. It is only kept when at
+    # most max_changed (default 0) held-out predictions differ from the
+    # full forest's; the count is recorded in its meta.json.
+    if compact is not None:
+        options = dict(compact)
+        max_changed = options.pop("max_changed", 0)
+        print(f"Exporting compact forest to {COMPACT_FOREST_PATH}...")
+        shutil.rmtree(COMPACT_FOREST_PATH, ignore_errors=True)
+        meta = export_compact_forest(model, COMPACT_FOREST_PATH, scaler=scaler, **options)
+        changed = compact_report(model, np.asarray(X_test), np.asarray(y_test))
+        if changed > max_changed:
+            shutil.rmtree(COMPACT_FOREST_PATH)
+            raise RuntimeError(
+                f"Compact forest changes {changed} of {len(X_test)} held-out predictions "
+                f"(allowed: {max_changed}), so it was not exported. Use a lower --prune-tolerance, "
+                f"--compact 16, or --max-changed-predictions to accept the changes"
+            )
+        meta.update(checked_rows=len(X_test), changed_predictions=changed)
+        with open(os.path.join(COMPACT_FOREST_PATH, "meta.json"), 'w') as f:
+            json.dump(meta, f, indent=4)
+    else:
+        remove_stale_forests(FOREST_PATH, FUSED_FOREST_PATH)
+
+
+class NothingWithinBudget(ValueError):
+    pass
+
+
+def search_stage(split, n_candidates, latency_budget_ms, n_jobs, random_state):
+    # Candidates are compared on rows held out of the training split (before
+    # SMOTE, so no synthetic rows are scored); the test split is only used
+    # for the final report and for timing
+    X_fit, X_val, y_fit, y_val = train_test_split(
+        split["X_train_scaled"], split["y_train"], test_size=0.25,
+        stratify=split["y_train"], random_state=random_state,
+    )
+    X_fit, y_fit = resample_stage(X_fit, y_fit, random_state)
+    candidates = search.sample_candidates(n_candidates, random_state)
+    print(f"Searching {len(candidates)} configurations...")
+    results = search.successive_halving(
+        candidates, X_fit, y_fit, X_val, y_val, n_jobs=n_jobs, random_state=random_state
+    )
+
+    # Timed one at a time, after the parallel fitting is over
+    X_raw = split["X_test"].to_numpy()
+    for result in results:
+        result.update(search.measure_serving(result.pop("model"), split["scaler"], X_raw))
+
+    selected = search.choose(results, latency_budget_ms)
+    search.print_report(results, selected, latency_budget_ms)
+    with open(SEARCH_REPORT_PATH, 'w') as f:
+        json.dump({
+            "latency_budget_ms": latency_budget_ms,
+            "selected": selected["params"] if selected is not None else None,
+            "candidates": results,
+            "pareto_front": [result["params"] for result in search.pareto_front(results)],
+        }, f, indent=4)
+    print(f"Search report saved to {SEARCH_REPORT_PATH}")
+    if selected is None:
+        fastest = min(result["single_ms"] for result in results)
+        raise NothingWithinBudget(f"No configuration fits the {latency_budget_ms:g} ms budget "
+                                  f"(fastest: {fastest:.3f} ms); nothing exported")
+    return selected["params"]
+
+
+def train(csv_path=CSV_PATH, n_jobs=-1, use_cache=True, test_size=0.2, random_state=42,
+          model_params=None, search_candidates=None, latency_budget_ms=1.0, compact=None):
+    # search_candidates: pick model_params with the hyperparameter search
+    # compact: also export a compact forest, {"bits", "prune_tolerance", "max_changed"}
+    pipeline = Pipeline(use_cache=use_cache)
+
+    # The digest of the CSV keys every stage below
+    data_key = Pipeline.make_key("data", load_stage, dataset, features, file_digest(csv_path))
+    df = pipeline.run("load", lambda: load_stage(csv_path), data_key)
+
+    label_key = Pipeline.make_key("label", label_stage, categorize_stages, data_key)
+    X, y = pipeline.run("label", lambda: label_stage(df), label_key)
+
+    split_key = Pipeline.make_key("split", split_scale_stage, label_key, test_size, random_state)
+    split = pipeline.run("split", lambda: split_scale_stage(X, y, test_size, random_state), split_key)
 
-y = df.apply(categorize_stage, axis=1)
+    resample_key = Pipeline.make_key("resample", resample_stage, split_key, random_state)
+    X_resampled, y_resampled = pipeline.run(
+        "resample", lambda: resample_stage(split["X_train_scaled"], split["y_train"], random_state),
+        resample_key,
+    )
 
-print("Target distribution:")
-print(y.value_counts().sort_index())
+    if search_candidates:
+        model_params = pipeline.run(
+            "search",
+            lambda: search_stage(split, search_candidates, latency_budget_ms, n_jobs, random_state),
+            None, cache=False,
+        )
+        print(f"Selected {search.format_params(model_params)}")
+    model_params = dict(model_params or {"n_estimators": 100}, random_state=random_state)
 
-# Split Data
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    fit_key = Pipeline.make_key("fit", fit_stage, resample_key, model_params)
+    model = pipeline.run("fit", lambda: fit_stage(X_resampled, y_resampled, model_params, n_jobs), fit_key)
 
-# Scale Data
-scaler = StandardScaler()
-X_train_scaled = scaler.fit_transform(X_train)
-X_test_scaled = scaler.transform(X_test)
+    evaluate_key = Pipeline.make_key("evaluate", evaluate_stage, fit_key)
+    report = pipeline.run(
+        "evaluate", lambda: evaluate_stage(model, split["X_test_scaled"], split["y_test"]), evaluate_key
+    )
+    print("\nClassification Report:")
+    print(report)
 
-# Handle Imbalance
-smote = SMOTE(random_state=42)
-X_train_resampled, y_train_resampled = smote.fit_resample(X_train_scaled, y_train)
+    # Always runs, so the artifacts on disk match the model just produced
+    pipeline.run(
+        "export",
+        lambda: export_stage(
+            model, split["scaler"], split["X_test"], split["X_test_scaled"], split["y_test"], compact
+        ),
+        None, cache=False,
+    )
+    pipeline.report()
+    return model, split["scaler"]
 
-print("Resampled target distribution:")
-print(pd.Series(y_train_resampled).value_counts().sort_index())
 
-# Train Model
-print("Training Random Forest Classifier...")
-model = RandomForestClassifier(n_estimators=100, random_state=42)
-model.fit(X_train_resampled, y_train_resampled)
+def main():
+    parser = argparse.ArgumentParser(description="Train the multiclass stage model")
+    parser.add_argument("--csv", default=CSV_PATH)
+    parser.add_argument("--n-jobs", type=int, default=-1, help="Cores for fitting (-1 = all)")
+    parser.add_argument("--no-cache", action="store_true", help="Recompute every stage")
+    parser.add_argument("--publish", action="store_true",
+                        help="Publish the artifacts to the model registry and make them current")
+    parser.add_argument("--search", type=int, nargs="?", const=48, default=None, metavar="CANDIDATES",
+                        help="Choose the forest's hyperparameters with a search over this many "
+                             "configurations (default 48) and export the best one within the budget")
+    parser.add_argument("--latency-budget-ms", type=float, default=1.0,
+                        help="Highest median single-row latency a searched model may have")
+    parser.add_argument("--compact", type=int, nargs="?", const=8, default=None, choices=[8, 16], metavar="BITS",
+                        help="Also export a quantized, pruned forest with 8-bit (default) or 16-bit "
+                             "class distributions and report what it costs in accuracy")
+    parser.add_argument("--prune-tolerance", type=float, default=0.0,
+                        help="With --compact, also collapse splits whose leaves' probabilities differ "
+                             "by at most this much (0 = only identical leaves)")
+    parser.add_argument("--max-changed-predictions", type=int, default=0, metavar="N",
+                        help="With --compact, still export the compact forest when it changes up to N "
+                             "predicted stages on the test split (default 0: refuse any change)")
+    args = parser.parse_args()
 
-# Evaluate
-y_pred = model.predict(X_test_scaled)
-print("\nClassification Report:")
-print(classification_report(y_test, y_pred))
+    try:
+        train(csv_path=args.csv, n_jobs=args.n_jobs, use_cache=not args.no_cache,
+              search_candidates=args.search, latency_budget_ms=args.latency_budget_ms,
+              compact={"bits": args.compact, "prune_tolerance": args.prune_tolerance,
+                       "max_changed": args.max_changed_predictions}
+              if args.compact is not None else None)
+    except NothingWithinBudget as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    if args.publish:
+        print(f"Published model version {registry.publish()}")
+    print("Done.")
 
-# Save Artifacts
-print(f"Saving model to {MODEL_PATH}...")
-joblib.dump(model, MODEL_PATH)
-print(f"Saving scaler to {SCALER_PATH}...")
-joblib.dump(scaler, SCALER_PATH)
 
-print("Done.")
+if __name__ == "__main__":
+    main()
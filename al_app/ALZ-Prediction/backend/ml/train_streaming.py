@@ -0,0 +1,227 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import SGDClassifier
+from sklearn.preprocessing import StandardScaler
+
+# Allow `from backend.ml ...` when run as a script
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(os.path.dirname(BASE_DIR)))
+from backend.ml.dataset import iter_chunks
+from backend.ml.train_multiclass import (
+    CSV_PATH, categorize_stages, export_stage, features, remove_stale_forests, save_model,
+)
+
+# Out-of-core variant of train_multiclass.py. The data is read in chunks
+# several times, and only a single chunk plus a bounded per-class sample
+# is in memory at any point:
+#   1. fit the scaler with partial_fit, count classes, and fill a
+#      per-class reservoir sample
+#   2. rebalance each chunk and train on it (SGD partial_fit, or a few
+#      new trees per chunk for the forest)
+#   3. evaluate on the held-out rows
+# SMOTE needs neighbours from the whole training set, so rebalancing
+# here oversamples minority classes from the chunk itself plus the
+# reservoir instead.
+
+STAGE_NAMES = ["No Alzheimer's", "Low Level", "Mild", "High Stage"]
+
+
+def iter_labeled_chunks(csv_path, chunk_size, test_size, holdout):
+    # (X, y) for the training rows (holdout=False) or held-out rows of every
+    # chunk. Rows are assigned by a hash of their position, so every pass
+    # agrees on the split without remembering it.
+    start = 0
+    for chunk in iter_chunks(features + ['Diagnosis'], chunk_size, csv_path, exact=True):
+        index = np.arange(start, start + len(chunk), dtype=np.uint64)
+        start += len(chunk)
+        in_test = ((index * np.uint64(2654435761)) % np.uint64(1 << 32)) < test_size * (1 << 32)
+        mask = in_test if holdout else ~in_test
+        if not mask.any():
+            continue
+        X = chunk[features].to_numpy(dtype=np.float64)[mask]
+        y = categorize_stages(chunk['Diagnosis'].to_numpy(), chunk['MMSE'].to_numpy())[mask]
+        yield X, y
+
+
+class ClassReservoir:
+    # Uniform sample of at most `capacity` rows per class (algorithm R)
+    def __init__(self, capacity, n_features, rng):
+        self.capacity = capacity
+        self.n_features = n_features
+        self.rng = rng
+        self.rows = {}
+        self.seen = {}
+
+    def add(self, X, y):
+        for label in np.unique(y).tolist():
+            incoming = X[y == label]
+            rows = self.rows.setdefault(label, np.empty((0, self.n_features)))
+            seen = self.seen.get(label, 0)
+
+            fill = max(0, min(self.capacity - len(rows), len(incoming)))
+            rows = np.vstack([rows, incoming[:fill]])
+            rest = incoming[fill:]
+            if len(rest):
+                # Row k (1-based, over all rows seen) replaces a random slot
+                # with probability capacity / k; later rows win on collisions
+                # just as they would sequentially.
+                k = seen + fill + np.arange(1, len(rest) + 1)
+                slots = (self.rng.random(len(rest)) * k).astype(np.int64)
+                keep = slots < self.capacity
+                rows[slots[keep]] = rest[keep]
+            self.rows[label] = rows
+            self.seen[label] = seen + len(incoming)
+
+
+def rebalance(X, y, classes, reservoir, rng):
+    # Oversample every class up to the chunk's largest class. Extra rows
+    # are drawn from the chunk's own rows of that class plus the reservoir,
+    # so classes missing from this chunk are still represented.
+    counts = {label: int((y == label).sum()) for label in classes}
+    target = max(counts.values())
+    parts_X, parts_y = [X], [y]
+    for label in classes:
+        missing = target - counts[label]
+        if missing <= 0:
+            continue
+        pool = np.vstack([X[y == label], reservoir[label]])
+        picks = rng.integers(0, len(pool), size=missing)
+        parts_X.append(pool[picks])
+        parts_y.append(np.full(missing, label))
+    return np.vstack(parts_X), np.concatenate(parts_y)
+
+
+def split_trees(n_estimators, n_chunks):
+    # Trees to add on each chunk, n_estimators in total: the first
+    # n_estimators % n_chunks chunks get one extra, and chunks beyond the
+    # n_estimators-th get none when there are more chunks than trees
+    base, extra = divmod(n_estimators, n_chunks)
+    return [base + (i < extra) for i in range(n_chunks)]
+
+
+def print_report(confusion, classes):
+    print("\nClassification Report:")
+    print(f"{'':>16} {'precision':>9} {'recall':>9} {'f1-score':>9} {'support':>9}")
+    f1_scores = []
+    for i, label in enumerate(classes):
+        true_positive = confusion[i, i]
+        precision = true_positive / confusion[:, i].sum() if confusion[:, i].sum() else 0.0
+        recall = true_positive / confusion[i].sum() if confusion[i].sum() else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        f1_scores.append(f1)
+        name = STAGE_NAMES[label] if label < len(STAGE_NAMES) else str(label)
+        print(f"{name:>16} {precision:>9.2f} {recall:>9.2f} {f1:>9.2f} {confusion[i].sum():>9}")
+    total = confusion.sum()
+    accuracy = np.trace(confusion) / total if total else 0.0
+    print(f"\n{'accuracy':>16} {accuracy:>29.2f} {total:>9}")
+    print(f"{'macro f1':>16} {np.mean(f1_scores):>29.2f}")
+
+
+def peak_memory_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def train_streaming(csv_path=CSV_PATH, chunk_size=50_000, model_type="forest",
+                    n_estimators=100, reservoir_size=500, test_size=0.2,
+                    n_jobs=-1, random_state=42):
+    rng = np.random.default_rng(random_state)
+    started = time.perf_counter()
+
+    # Pass 1: scaler statistics, class counts and the reservoir
+    scaler = StandardScaler()
+    reservoir = ClassReservoir(reservoir_size, len(features), rng)
+    class_counts = {}
+    n_chunks = 0
+    for X, y in iter_labeled_chunks(csv_path, chunk_size, test_size, holdout=False):
+        scaler.partial_fit(X)
+        reservoir.add(X, y)
+        for label, count in zip(*np.unique(y, return_counts=True)):
+            class_counts[int(label)] = class_counts.get(int(label), 0) + int(count)
+        n_chunks += 1
+    if not n_chunks:
+        raise ValueError(f"No training rows in {csv_path}")
+    classes = sorted(class_counts)
+    print(f"Pass 1: {sum(class_counts.values())} training rows in {n_chunks} chunks, "
+          f"class counts {class_counts} ({time.perf_counter() - started:.1f}s)")
+    scaled_reservoir = {label: scaler.transform(rows) for label, rows in reservoir.rows.items()}
+
+    # Pass 2: train on rebalanced chunks
+    if model_type == "forest":
+        # warm_start adds new trees on each fit call and keeps the old ones
+        if n_estimators < 1:
+            raise ValueError("n_estimators must be at least 1")
+        trees_per_chunk = split_trees(n_estimators, n_chunks)
+        model = RandomForestClassifier(
+            n_estimators=0, warm_start=True, random_state=random_state, n_jobs=n_jobs
+        )
+    elif model_type == "sgd":
+        model = SGDClassifier(loss="log_loss", random_state=random_state)
+    else:
+        raise ValueError(f"Unknown model type: {model_type}")
+
+    for i, (X, y) in enumerate(iter_labeled_chunks(csv_path, chunk_size, test_size, holdout=False)):
+        if model_type == "forest" and not trees_per_chunk[i]:
+            continue
+        X_balanced, y_balanced = rebalance(scaler.transform(X), y, classes, scaled_reservoir, rng)
+        if model_type == "forest":
+            model.set_params(n_estimators=model.n_estimators + trees_per_chunk[i])
+            model.fit(X_balanced, y_balanced)
+        else:
+            model.partial_fit(X_balanced, y_balanced, classes=classes)
+    if model_type == "forest":
+        model.set_params(n_jobs=None, warm_start=False)
+        print(f"Pass 2: {len(model.estimators_)} trees ({time.perf_counter() - started:.1f}s)")
+    else:
+        print(f"Pass 2: SGD over {n_chunks} chunks ({time.perf_counter() - started:.1f}s)")
+
+    # Pass 3: confusion matrix over the held-out rows
+    confusion = np.zeros((len(classes), len(classes)), dtype=np.int64)
+    position = {label: i for i, label in enumerate(classes)}
+    for X, y in iter_labeled_chunks(csv_path, chunk_size, test_size, holdout=True):
+        y_pred = model.predict(scaler.transform(X))
+        for true_label, predicted in zip(y.tolist(), y_pred.tolist()):
+            if true_label in position:
+                confusion[position[true_label], position[predicted]] += 1
+    print_report(confusion, classes)
+
+    # Export
+    if model_type == "forest":
+        check = np.vstack(list(reservoir.rows.values()))
+        export_stage(model, scaler, check, scaler.transform(check))
+    else:
+        save_model(model, scaler)
+        remove_stale_forests()
+
+    peak = peak_memory_mb()
+    print(f"\nFinished in {time.perf_counter() - started:.1f}s"
+          + (f", peak RSS {peak:.0f} MB" if peak is not None else ""))
+    return model, scaler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the multiclass stage model out of core")
+    parser.add_argument("--csv", default=CSV_PATH)
+    parser.add_argument("--chunk-size", type=int, default=50_000, help="Rows per chunk")
+    parser.add_argument("--model", choices=["forest", "sgd"], default="forest")
+    parser.add_argument("--n-estimators", type=int, default=100, help="Total trees (forest)")
+    parser.add_argument("--reservoir", type=int, default=500, help="Sampled rows kept per class")
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    args = parser.parse_args()
+
+    train_streaming(
+        csv_path=args.csv, chunk_size=args.chunk_size, model_type=args.model,
+        n_estimators=args.n_estimators, reservoir_size=args.reservoir, n_jobs=args.n_jobs,
+    )
+    print("Done.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+import numpy as np
+from .metrics import PREDICT_STAGE_SECONDS
+from .ml import registry
+from .ml.forest import ForestEngine
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ML_DIR = os.path.join(BASE_DIR, 'ml')
+
+MODEL_FILE = 'model_multiclass.pkl'
+SCALER_FILE = 'scaler_multiclass.pkl'
+FOREST_DIR = 'forest_multiclass'
+FUSED_FOREST_DIR = 'forest_multiclass_fused'
+COMPACT_FOREST_DIR = 'forest_multiclass_compact'
+
+logger = logging.getLogger(__name__)
+
+# "fused": compiled forest with the scaler folded into its thresholds
+# "compact": the fused forest quantized and pruned (train_multiclass.py
+#            --compact); smaller, with probabilities within 1/255 (8-bit)
+#            unless pruned with a tolerance. Approximate, so loading it
+#            logs a warning.
+# "compiled": compiled forest behind scaler_multiclass.pkl
+# "pickle": model_multiclass.pkl behind scaler_multiclass.pkl
+# "auto" picks the first of these whose artifacts exist.
+MODE_ARTIFACTS = {
+    "fused": [FUSED_FOREST_DIR],
+    "compact": [COMPACT_FOREST_DIR],
+    "compiled": [FOREST_DIR, SCALER_FILE],
+    "pickle": [MODEL_FILE, SCALER_FILE],
+}
+
+
+def resolve_mode(mode, root):
+    if mode != "auto":
+        return mode
+    if os.path.isdir(os.path.join(root, FUSED_FOREST_DIR)):
+        return "fused"
+    if os.path.isdir(os.path.join(root, COMPACT_FOREST_DIR)):
+        return "compact"
+    if os.path.isdir(os.path.join(root, FOREST_DIR)):
+        return "compiled"
+    return "pickle"
+
+
+def artifact_files(mode, root):
+    if mode not in MODE_ARTIFACTS:
+        raise ValueError(f"Unknown serving mode: {mode}")
+    files = []
+    for name in MODE_ARTIFACTS[mode]:
+        path = os.path.join(root, name)
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, entry) for entry in sorted(os.listdir(path)))
+        else:
+            files.append(path)
+    return files
+
+
+def artifact_signature(files):
+    # Cheap change detection: (path, mtime, size) of every artifact file
+    signature = []
+    for path in files:
+        st = os.stat(path)
+        signature.append((path, st.st_mtime_ns, st.st_size))
+    return tuple(signature)
+
+
+def artifact_version(files):
+    digest = hashlib.sha256()
+    for path in files:
+        digest.update(os.path.basename(path).encode())
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+class LoadedModel:
+    # Model, scaler and version are swapped together as one object, so a
+    # request never pairs a model with another model's scaler.
+    def __init__(self, mode, root=ML_DIR, version=None):
+        self.mode = resolve_mode(mode, root)
+        self.root = root
+        files = artifact_files(self.mode, root)
+        self.signature = artifact_signature(files)
+        # joblib (and sklearn, when unpickling) are only imported when a
+        # pickle is actually loaded; the fused and compact modes need neither
+        if self.mode not in ("fused", "compact"):
+            import joblib
+        if self.mode in ("fused", "compact"):
+            # Compiled arrays are memory-mapped instead of unpickled
+            self.model = ForestEngine.load(os.path.join(root, MODE_ARTIFACTS[self.mode][0]))
+            self.scaler = None
+        elif self.mode == "compiled":
+            self.model = ForestEngine.load(os.path.join(root, FOREST_DIR))
+            self.scaler = joblib.load(os.path.join(root, SCALER_FILE))
+        else:
+            self.model = joblib.load(os.path.join(root, MODEL_FILE))
+            self.scaler = joblib.load(os.path.join(root, SCALER_FILE))
+        self.version = version or artifact_version(files)
+        self._explainer = None
+
+    @property
+    def n_features(self):
+        return self.model.n_features_in_
+
+    def predict_proba(self, X):
+        if self.scaler is not None:
+            with PREDICT_STAGE_SECONDS.time("transform"):
+                X = self.scaler.transform(X)
+        with PREDICT_STAGE_SECONDS.time("predict_proba"):
+            return self.model.predict_proba(X)
+
+    def evaluate(self, X, explain=False):
+        # (classes, probabilities, contributions) from ForestEngine.evaluate.
+        # A pickled forest is compiled once on first use for this.
+        engine = self.model
+        if not isinstance(engine, ForestEngine):
+            if self._explainer is None:
+                if not hasattr(engine, "estimators_"):
+                    raise ValueError("Explanations need a random forest model")
+                self._explainer = ForestEngine.from_model(engine)
+            engine = self._explainer
+        if self.scaler is not None:
+            with PREDICT_STAGE_SECONDS.time("transform"):
+                X = self.scaler.transform(X)
+        with PREDICT_STAGE_SECONDS.time("evaluate"):
+            return engine.evaluate(X, explain=explain)
+
+    def warm_up(self):
+        # Touch every code path (and page in memory-mapped arrays) before the
+        # model takes traffic; fails loudly on a broken artifact. Calls the
+        # scaler and model directly so the stage timings only count requests.
+        X = np.zeros((8, self.n_features))
+        if self.scaler is not None:
+            X = self.scaler.transform(X)
+        probabilities = self.model.predict_proba(X)
+        if probabilities.shape != (8, len(self.model.classes_)):
+            raise ValueError(f"Unexpected warm-up output shape {probabilities.shape}")
+
+
+class ModelStore:
+    """Holds the model being served and swaps in new ones in the background.
+
+    When the registry has a CURRENT version, that version is served;
+    otherwise the artifacts written by the training scripts to backend/ml
+    are. A watcher thread polls for a new CURRENT pointer (or artifact
+    files that changed and then stayed unchanged for a whole poll) and
+    loads, verifies and warms up the new model before replacing `current`
+    in a single assignment. Requests take one reference
+    to `current` and use it throughout, so none ever sees a half-loaded
+    model.
+    """
+
+    def __init__(self, mode="auto", check_interval=2.0, on_swap=None,
+                 registry_dir=registry.REGISTRY_DIR, root=ML_DIR):
+        self.mode = mode
+        self.check_interval = check_interval
+        self.on_swap = on_swap
+        self.registry_dir = registry_dir
+        self.root = root
+        self.current = None
+        self.last_error = None
+        self.load_seconds = None
+        # Set once the first model is in place
+        self.ready = threading.Event()
+        self._token = None
+        self._pending = None  # changed artifact files seen on the last poll
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+
+    def _source_token(self):
+        # Identifies what would be loaded right now, without loading it
+        version = registry.current_version(self.registry_dir)
+        if version is not None:
+            return ("registry", version)
+        try:
+            root_mode = resolve_mode(self.mode, self.root)
+            return ("files", artifact_signature(artifact_files(root_mode, self.root)))
+        except (OSError, ValueError):
+            return ("files", None)
+
+    def _load(self, token):
+        kind, value = token
+        if kind == "registry":
+            registry.verify(value, self.registry_dir)
+            return LoadedModel(self.mode, registry.version_dir(value, self.registry_dir), version=value)
+        return LoadedModel(self.mode, self.root)
+
+    def refresh(self):
+        # Load whatever is current if it differs from what is being served.
+        # Returns True when a new model was swapped in.
+        with self._lock:
+            token = self._source_token()
+            if token == self._token:
+                return False
+            if token[0] == "files" and self._token is not None and token != self._pending:
+                # The training scripts write the artifact files one at a
+                # time, so a changed signature may be a half-written model.
+                # Load it only if nothing changes again before the next poll.
+                self._pending = token
+                return False
+            self._pending = None
+            started = time.perf_counter()
+            try:
+                loaded = self._load(token)
+                loaded_at = time.perf_counter()
+                loaded.warm_up()
+            except Exception as e:
+                self.last_error = str(e)
+                # Remember the token so a broken artifact is not retried in a
+                # loop; the next publish changes it again.
+                self._token = token
+                logger.error("Error loading model/scaler: %s", e)
+                return False
+            finished = time.perf_counter()
+
+            self._token = token
+            self.last_error = None
+            if self.current is not None and loaded.version == self.current.version:
+                return False
+            previous, self.current = self.current, loaded
+            self.load_seconds = finished - started
+            logger.info(
+                "Model %s (%s) loaded in %.0f ms, warm-up %.0f ms",
+                loaded.version, loaded.mode,
+                (loaded_at - started) * 1000, (finished - loaded_at) * 1000,
+            )
+            if previous is not None:
+                logger.info("Model %s replaced by %s", previous.version, loaded.version)
+            if loaded.mode == "compact":
+                meta = loaded.model.meta
+                logger.warning(
+                    "Serving the compact forest %s: approximate probabilities (%d-bit, prune tolerance %g); "
+                    "%s of %s held-out predictions differ from the full forest",
+                    loaded.version, meta["bits"], meta["prune_tolerance"],
+                    meta.get("changed_predictions", "unknown"), meta.get("checked_rows", "unknown"),
+                )
+            self.ready.set()
+            if self.on_swap is not None:
+                self.on_swap(loaded)
+            return True
+
+    def _watch(self):
+        # Loads the first model right away if nothing is loaded yet, then polls
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error("Model watcher error: %s", e)
+            if self._stop.wait(self.check_interval):
+                break
+
+    def start_watching(self):
+        if self._watcher is None or not self._watcher.is_alive():
+            self._stop.clear()
+            self._watcher = threading.Thread(target=self._watch, name="model-watcher", daemon=True)
+            self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=self.check_interval + 1)
+            self._watcher = None
+
+    def status(self):
+        current = self.current
+        return {
+            "version": current.version if current is not None else None,
+            "mode": current.mode if current is not None else None,
+            "source": self._token[0] if self._token is not None else None,
+            "ready": current is not None,
+            "load_ms": round(self.load_seconds * 1000, 1) if self.load_seconds is not None else None,
+            "last_error": self.last_error,
+        }
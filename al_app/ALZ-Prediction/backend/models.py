@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, String
+from sqlalchemy import JSON, Boolean, Column, DateTime, Float, Index, Integer, String
 from .database import Base
 
 class User(Base):
@@ -8,3 +8,19 @@ class User(Base):
     username = Column(String, unique=True, index=True)
     hashed_password = Column(String)
     is_active = Column(Boolean, default=True)
+
+class Prediction(Base):
+    # One row per /predict/ call, written in batches by the history queue
+    # (see backend/routers/prediction.py)
+    __tablename__ = "predictions"
+    # History is read newest first per user, paging on id
+    __table_args__ = (Index("ix_predictions_username_id", "username", "id"),)
+
+    id = Column(Integer, primary_key=True)
+    username = Column(String, nullable=True)
+    inputs = Column(JSON)
+    stage = Column(Integer)
+    probability = Column(Float)
+    probabilities = Column(JSON)
+    model_version = Column(String)
+    created_at = Column(DateTime(timezone=True))
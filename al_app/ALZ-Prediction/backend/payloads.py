@@ -0,0 +1,88 @@
+import json
+import numpy as np
+from fastapi.responses import JSONResponse
+
+# Compact request bodies for machine clients of /predict/array: the
+# features in model order, without field names, in one of
+#   application/octet-stream         packed little-endian float32, n_rows x n_features
+#   application/json                 an array of numbers, or an array of such arrays
+#   application/msgpack (or x-)      the same arrays as JSON, when msgpack is installed
+# Rows are checked all at once with NumPy instead of field by field.
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+PACKED_DTYPE = np.dtype("<f4")
+BINARY_TYPE = "application/octet-stream"
+JSON_TYPE = "application/json"
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+def supported_types():
+    return [BINARY_TYPE, JSON_TYPE] + (list(MSGPACK_TYPES) if msgpack is not None else [])
+
+
+def media_type(content_type):
+    # "application/json; charset=utf-8" -> "application/json"
+    return (content_type or "").split(";")[0].strip().lower()
+
+
+def decode_rows(body, content_type, n_features):
+    # Body -> (n_rows, n_features) array. Packed float32 is a read-only view
+    # of the body, not a copy. Raises ValueError for a malformed body;
+    # callers check the content type against supported_types() first.
+    kind = media_type(content_type)
+    if kind == BINARY_TYPE:
+        row_bytes = n_features * PACKED_DTYPE.itemsize
+        if len(body) % row_bytes:
+            raise ValueError(f"Body of {len(body)} bytes is not a whole number of "
+                             f"{n_features}-feature float32 rows ({row_bytes} bytes each)")
+        return np.frombuffer(body, dtype=PACKED_DTYPE).reshape(-1, n_features)
+
+    try:
+        if kind == JSON_TYPE:
+            values = orjson.loads(body) if orjson is not None else json.loads(body)
+        else:
+            values = msgpack.unpackb(body)
+        # Without a dtype, NumPy keeps strings and nulls as they are instead
+        # of converting "1.5" to a number, so they can be refused below
+        rows = np.array(values)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid {kind} body: {e}")
+    if rows.dtype.kind not in "iuf":
+        raise ValueError(f"Invalid {kind} body: every value must be a number")
+    rows = rows.astype(np.float64, copy=False)
+    if rows.ndim == 1:
+        rows = rows.reshape(-1, n_features) if rows.size == 0 else rows[None, :]
+    if rows.ndim != 2 or rows.shape[1] != n_features:
+        raise ValueError(f"Expected rows of {n_features} values, got shape {rows.shape}")
+    return rows
+
+
+def check_rows(rows, names, lower, upper, integer):
+    # Every value finite, within [lower, upper] for its feature and whole
+    # where the feature is an integer; lower, upper and integer are arrays in
+    # feature order. Reports the first offending row and feature.
+    bad = ~np.isfinite(rows) | (rows < lower) | (rows > upper) | (integer & (rows != np.round(rows)))
+    if bad.any():
+        row, column = np.argwhere(bad)[0].tolist()
+        low, high = lower[column].item(), upper[column].item()
+        kind = "a whole number " if integer[column] else ""
+        raise ValueError(f"Row {row}: {names[column]} must be {kind}between {low:g} and {high:g}, "
+                         f"got {rows[row, column].item()!r}")
+
+
+class FastJSONResponse(JSONResponse):
+    # Rendered by orjson when it is installed. Routes return it directly so
+    # FastAPI skips jsonable_encoder; content must be plain JSON types.
+    def render(self, content):
+        if orjson is not None:
+            return orjson.dumps(content)
+        return super().render(content)
@@ -1,15 +1,23 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from .. import models, database
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import models, database, tokens
+from ..hashing import HashingBusy, PasswordHasher
+from ..metrics import SIGNIN_STAGE_SECONDS, FunctionMetric
 from pydantic import BaseModel
-from passlib.context import CryptContext
 
 router = APIRouter(
     prefix="/auth",
     tags=["auth"],
 )
 
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+# pbkdf2_sha256 in a bounded process pool (see backend/hashing.py)
+hasher = PasswordHasher()
+FunctionMetric("auth_hashing_pending", "Password hashes queued or running", lambda: hasher.pending)
+FunctionMetric("auth_hashing_rejected_total", "Requests turned away with 503 because hashing was saturated",
+               lambda: hasher.rejected, kind="counter")
 
 class UserCreate(BaseModel):
     username: str
@@ -19,27 +27,84 @@ class UserLogin(BaseModel):
     username: str
     password: str
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+def hashing_busy():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many concurrent sign-in requests, please retry",
+        headers={"Retry-After": "1"},
+    )
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+bearer = HTTPBearer(auto_error=False)
+
+def not_authenticated(detail):
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def optional_user(credentials: HTTPAuthorizationCredentials = Depends(bearer)):
+    # The signed-in username, or None. A forged or expired token counts as
+    # no token, so a stale one left in the browser never blocks predictions.
+    if credentials is None:
+        return None
+    return tokens.verify(credentials.credentials)
+
+def current_user(credentials: HTTPAuthorizationCredentials = Depends(bearer)):
+    if credentials is None:
+        raise not_authenticated("Not authenticated")
+    username = tokens.verify(credentials.credentials)
+    if username is None:
+        raise not_authenticated("Invalid or expired token")
+    return username
+
+async def get_user(db, username):
+    result = await db.execute(select(models.User).where(models.User.username == username))
+    return result.scalars().first()
 
 @router.post("/signup", status_code=status.HTTP_201_CREATED)
-def signup(user: UserCreate, db: Session = Depends(database.get_db)):
-    db_user = db.query(models.User).filter(models.User.username == user.username).first()
-    if db_user:
+async def signup(user: UserCreate, db: AsyncSession = Depends(database.get_async_db)):
+    if await get_user(db, user.username):
         raise HTTPException(status_code=400, detail="Username already registered")
-    hashed_password = get_password_hash(user.password)
+    try:
+        hashed_password = await hasher.hash(user.password)
+    except HashingBusy:
+        raise hashing_busy()
     new_user = models.User(username=user.username, hashed_password=hashed_password)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Lost a race with a concurrent signup for the same name
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Username already registered")
     return {"message": "User created successfully"}
 
 @router.post("/signin")
-def signin(user: UserLogin, db: Session = Depends(database.get_db)):
-    db_user = db.query(models.User).filter(models.User.username == user.username).first()
-    if not db_user or not verify_password(user.password, db_user.hashed_password):
+async def signin(user: UserLogin, db: AsyncSession = Depends(database.get_async_db)):
+    with SIGNIN_STAGE_SECONDS.time("db_query"):
+        db_user = await get_user(db, user.username)
+    if not db_user:
+        raise HTTPException(status_code=400, detail="Incorrect username or password")
+    try:
+        with SIGNIN_STAGE_SECONDS.time("hash_verify"):
+            valid, new_hash = await hasher.verify_and_update(user.password, db_user.hashed_password)
+    except HashingBusy:
+        raise hashing_busy()
+    if not valid:
         raise HTTPException(status_code=400, detail="Incorrect username or password")
-    return {"message": "Login successful", "username": db_user.username}
+    if new_hash:
+        # Stored with different rounds than AUTH_PBKDF2_ROUNDS
+        db_user.hashed_password = new_hash
+        with SIGNIN_STAGE_SECONDS.time("db_commit"):
+            await db.commit()
+    return {
+        "message": "Login successful",
+        "username": db_user.username,
+        "access_token": tokens.issue(db_user.username),
+        "token_type": "bearer",
+    }
+
+@router.get("/hashing")
+def hashing_stats():
+    return hasher.stats()
@@ -1,26 +1,65 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-import joblib
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timezone
+from typing import List, Optional, Union
 import numpy as np
+import io
+import json
 import os
+from .. import database, insights, models, payloads
+from ..batching import MicroBatcher, WriteBehindQueue
+from ..cache import PredictionCache
+from ..metrics import PREDICT_STAGE_SECONDS, Counter, FunctionMetric, request_started
+from ..model_store import ModelStore
+from ..rules import RuleSet
+from .auth import current_user, optional_user
 
 router = APIRouter(
     prefix="/predict",
     tags=["predict"],
 )
 
-# Load model and scaler
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-MODEL_PATH = os.path.join(BASE_DIR, 'ml', 'model_multiclass.pkl')
-SCALER_PATH = os.path.join(BASE_DIR, 'ml', 'scaler_multiclass.pkl')
+# Serving mode: "auto", "fused", "compiled" or "pickle" (see backend/model_store.py)
+SERVING_MODE = os.environ.get("PREDICT_SERVING_MODE", "auto")
+# Seconds between checks of the model registry for a new version
+MODEL_CHECK_INTERVAL = float(os.environ.get("PREDICT_MODEL_CHECK_INTERVAL", "2"))
+# Request bytes gathered before a block of streamed readings is aggregated
+STREAM_BLOCK_BYTES = int(os.environ.get("INSIGHTS_STREAM_BLOCK_BYTES", str(256 * 1024)))
+# Seconds a prediction waits for the model while it is still loading at
+# startup before getting a 503 (0 answers 503 straight away)
+READY_TIMEOUT = float(os.environ.get("PREDICT_READY_TIMEOUT", "0"))
 
-try:
-    model = joblib.load(MODEL_PATH)
-    scaler = joblib.load(SCALER_PATH)
-except Exception as e:
-    print(f"Error loading model/scaler: {e}")
-    model = None
-    scaler = None
+# Results of /predict/ keyed on the feature values and model version.
+# PREDICT_CACHE_SIZE=0 disables caching.
+cache = PredictionCache(
+    maxsize=int(os.environ.get("PREDICT_CACHE_SIZE", "4096")),
+    ttl=float(os.environ.get("PREDICT_CACHE_TTL", "300")),
+)
+
+# Swapping the model drops every cached prediction made by the old one.
+# The model itself is loaded by the app lifespan (see backend/main.py).
+store = ModelStore(SERVING_MODE, MODEL_CHECK_INTERVAL, on_swap=lambda loaded: cache.invalidate())
+
+def get_model():
+    loaded = store.current
+    if loaded is None:
+        if store.last_error is not None:
+            raise HTTPException(status_code=500, detail="Model not loaded")
+        raise HTTPException(
+            status_code=503, detail="Model is loading", headers={"Retry-After": "1"}
+        )
+    return loaded
+
+async def model_ready():
+    # Dependency of the model routes: holds requests that arrive during
+    # startup for up to READY_TIMEOUT seconds, then get_model() answers 503
+    if store.current is None and READY_TIMEOUT > 0:
+        await run_in_threadpool(store.ready.wait, READY_TIMEOUT)
+    get_model()
 
 class SymptomInput(BaseModel):
     # Add all features required by the model
@@ -66,93 +105,457 @@ class HealthInsightsInput(BaseModel):
     hydration: float # liters
     sleep_hours: float
 
-@router.post("/")
-def predict_alzheimers(data: SymptomInput):
-    if model is None or scaler is None:
-        raise HTTPException(status_code=500, detail="Model not loaded")
-    
-    # Convert input to array
-    input_data = np.array([[
-        data.Age, data.Gender, data.Ethnicity, data.EducationLevel, data.BMI,
-        data.Smoking, data.AlcoholConsumption, data.PhysicalActivity, data.DietQuality,
-        data.SleepQuality, data.FamilyHistoryAlzheimers, data.CardiovascularDisease,
-        data.Diabetes, data.Depression, data.HeadInjury, data.Hypertension,
-        data.SystolicBP, data.DiastolicBP, data.CholesterolTotal, data.CholesterolLDL,
-        data.CholesterolHDL, data.CholesterolTriglycerides, data.MMSE,
-        data.FunctionalAssessment, data.MemoryComplaints, data.BehavioralProblems,
-        data.ADL, data.Confusion, data.Disorientation, data.PersonalityChanges,
-        data.DifficultyCompletingTasks, data.Forgetfulness
-    ]])
-
-    # Scale input
-    input_scaled = scaler.transform(input_data)
-
-    # Predict
-    prediction = model.predict(input_scaled)[0]
-    probability = model.predict_proba(input_scaled)[0]
-    
-    # Map prediction to result
-    stage_map = {
-        0: "No Alzheimer's",
-        1: "Low Level Alzheimer's",
-        2: "Mild Alzheimer's",
-        3: "High Stage Alzheimer's"
-    }
-    
-    result = stage_map.get(prediction, "Unknown")
-    confidence = float(probability[prediction])
-    
-    suggestions = []
-    if prediction == 0:
-        suggestions.append("Keep up the healthy lifestyle!")
-        suggestions.append("Regular checkups are recommended.")
-    elif prediction == 1:
-        suggestions.append("Early signs detected. Consult a doctor for preventive measures.")
-        suggestions.append("Focus on cognitive exercises and diet.")
-    elif prediction == 2:
-        suggestions.append("Mild symptoms detected. Medical intervention is recommended.")
-        suggestions.append("Ensure safety in daily activities.")
-    elif prediction == 3:
-        suggestions.append("High stage detected. Immediate specialist consultation required.")
-        suggestions.append("Full-time care or supervision may be needed.")
+# Feature order expected by the scaler and model (see ml/train_multiclass.py)
+FEATURES = list(SymptomInput.model_fields)
+
+# Accepted (lower, upper) per feature for the array forms of /predict/:
+# 0/1 flags, category codes and score scales, and wide physiological
+# limits for the measurements. The JSON form takes whatever the web form
+# sends, as before.
+FEATURE_BOUNDS = {
+    "Age": (0, 130), "Gender": (0, 1), "Ethnicity": (0, 3), "EducationLevel": (0, 3),
+    "BMI": (5, 100), "Smoking": (0, 1), "AlcoholConsumption": (0, 168),
+    "PhysicalActivity": (0, 168), "DietQuality": (0, 10), "SleepQuality": (0, 10),
+    "FamilyHistoryAlzheimers": (0, 1), "CardiovascularDisease": (0, 1), "Diabetes": (0, 1),
+    "Depression": (0, 1), "HeadInjury": (0, 1), "Hypertension": (0, 1),
+    "SystolicBP": (40, 300), "DiastolicBP": (20, 200),
+    "CholesterolTotal": (0, 1000), "CholesterolLDL": (0, 1000), "CholesterolHDL": (0, 1000),
+    "CholesterolTriglycerides": (0, 5000), "MMSE": (0, 30), "FunctionalAssessment": (0, 10),
+    "MemoryComplaints": (0, 1), "BehavioralProblems": (0, 1), "ADL": (0, 10),
+    "Confusion": (0, 1), "Disorientation": (0, 1), "PersonalityChanges": (0, 1),
+    "DifficultyCompletingTasks": (0, 1), "Forgetfulness": (0, 1),
+}
+FEATURE_LOWER = np.array([FEATURE_BOUNDS[name][0] for name in FEATURES], dtype=np.float64)
+FEATURE_UPPER = np.array([FEATURE_BOUNDS[name][1] for name in FEATURES], dtype=np.float64)
+INTEGER_FEATURES = np.array([SymptomInput.model_fields[name].annotation is int for name in FEATURES])
+
+STAGE_MAP = {
+    0: "No Alzheimer's",
+    1: "Low Level Alzheimer's",
+    2: "Mild Alzheimer's",
+    3: "High Stage Alzheimer's"
+}
+
+SUGGESTIONS = {
+    0: ["Keep up the healthy lifestyle!",
+        "Regular checkups are recommended."],
+    1: ["Early signs detected. Consult a doctor for preventive measures.",
+        "Focus on cognitive exercises and diet."],
+    2: ["Mild symptoms detected. Medical intervention is recommended.",
+        "Ensure safety in daily activities."],
+    3: ["High stage detected. Immediate specialist consultation required.",
+        "Full-time care or supervision may be needed."],
+}
 
+def predict_matrix(X):
+    # One transform and one predict_proba for the whole matrix; the class is
+    # the argmax of the probabilities, so the forest is only walked once.
+    # Also returns the model that produced the result.
+    loaded = get_model()
+    probabilities = loaded.predict_proba(X)
+    best = probabilities.argmax(axis=1)
+    stages = loaded.model.classes_[best]
+    confidences = probabilities[np.arange(len(best)), best]
+    return stages, confidences, probabilities, loaded
+
+def stage_probabilities(classes, probabilities):
+    # {stage name: probability} for each row
+    names = [STAGE_MAP.get(code, str(code)) for code in classes.tolist()]
+    return [dict(zip(names, row)) for row in probabilities.tolist()]
+
+def predict_rows(rows):
+    # predict_matrix with per-row outputs, for the micro-batcher's fan-out
+    with PREDICT_STAGE_SECONDS.time("build_array"):
+        X = np.array(rows, dtype=np.float64)
+    stages, confidences, probabilities, loaded = predict_matrix(X)
+    return (
+        stages, confidences, [loaded.version] * len(stages),
+        stage_probabilities(loaded.model.classes_, probabilities),
+    )
+
+def format_prediction(stage, confidence, version):
     return {
-        "prediction": result,
+        "prediction": STAGE_MAP.get(stage, "Unknown"),
         "probability": confidence,
-        "suggestions": suggestions,
-        "stage_code": int(prediction) # Helpful for frontend logic
+        "suggestions": list(SUGGESTIONS.get(stage, [])),
+        "stage_code": stage, # Helpful for frontend logic
+        "model_version": version,
+    }
+
+def format_predictions(stages, confidences, version):
+    return [
+        format_prediction(stage, confidence, version)
+        for stage, confidence in zip(stages.tolist(), confidences.tolist())
+    ]
+
+def explain_matrix(X):
+    # Predictions plus the per-stage probabilities and the features that
+    # drove the predicted stage, all from a single walk over the trees
+    loaded = get_model()
+    try:
+        stages, probabilities, contributions = loaded.evaluate(X, explain=True)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    classes = loaded.model.classes_.tolist()
+    results = []
+    named_probabilities = stage_probabilities(loaded.model.classes_, probabilities)
+    for row, stage, row_probabilities, row_named, row_contributions in zip(
+        X.tolist(), stages.tolist(), probabilities, named_probabilities, contributions
+    ):
+        best = classes.index(stage)
+        result = format_prediction(stage, float(row_probabilities[best]), loaded.version)
+        result["probabilities"] = row_named
+        # Probability of the predicted stage before any feature is considered;
+        # it plus every contribution adds up to "probability"
+        base = row_probabilities[best] - row_contributions[:, best].sum()
+        order = np.argsort(-np.abs(row_contributions[:, best]), kind="stable")
+        result["explanation"] = {
+            "base_probability": float(base),
+            "contributions": [
+                {
+                    "feature": FEATURES[i],
+                    "value": row[i],
+                    "contribution": float(row_contributions[i, best]),
+                }
+                for i in order.tolist()
+            ],
+        }
+        results.append(result)
+    return results, loaded.version
+
+# Concurrent single-row requests are coalesced into one model call
+# (see backend/batching.py). A window of 0 only batches rows that queue up
+# while the previous batch is being scored.
+batcher = MicroBatcher(
+    predict_rows,
+    window_ms=float(os.environ.get("PREDICT_BATCH_WINDOW_MS", "2")),
+    max_batch_size=int(os.environ.get("PREDICT_MAX_BATCH_SIZE", "64")),
+)
+
+# Every /predict/ call is kept in the predictions table. Rows are queued and
+# inserted in batches by a background task (see backend/batching.py), so a
+# prediction never waits for a database commit; the app drains the queue on
+# shutdown. PREDICTION_HISTORY=0 turns this off.
+HISTORY_ENABLED = os.environ.get("PREDICTION_HISTORY", "1") != "0"
+
+async def insert_predictions(rows):
+    async with database.async_engine.begin() as conn:
+        await conn.execute(insert(models.Prediction), rows)
+
+history = WriteBehindQueue(
+    insert_predictions,
+    max_batch_size=int(os.environ.get("HISTORY_FLUSH_ROWS", "256")),
+    flush_interval_ms=float(os.environ.get("HISTORY_FLUSH_MS", "1000")),
+    max_queue=int(os.environ.get("HISTORY_MAX_QUEUE", "10000")),
+)
+
+def record_prediction(username, inputs, prediction, probabilities):
+    if not HISTORY_ENABLED:
+        return
+    history.submit({
+        "username": username,
+        "inputs": inputs,
+        "stage": prediction["stage_code"],
+        "probability": prediction["probability"],
+        "probabilities": probabilities,
+        "model_version": prediction["model_version"],
+        "created_at": datetime.now(timezone.utc),
+    })
+
+PREDICTED_ROWS = Counter("predicted_rows_total", "Rows scored by the stage model", ["source"])
+for counter in ("hits", "misses", "evictions", "expirations", "invalidations"):
+    FunctionMetric(
+        f"prediction_cache_{counter}_total", f"Prediction cache {counter}",
+        lambda counter=counter: getattr(cache, counter), kind="counter",
+    )
+FunctionMetric("prediction_cache_size", "Entries in the prediction cache", lambda: cache.stats()["size"])
+FunctionMetric("predict_batcher_queue_depth", "Rows waiting for the model", lambda: batcher.queue_depth)
+FunctionMetric("prediction_history_queue_depth", "Predictions waiting to be written",
+               lambda: history.queue_depth)
+FunctionMetric("prediction_history_records_total", "Predictions handled by the history queue",
+               lambda: {(outcome,): getattr(history, outcome) for outcome in ("written", "dropped", "failed")},
+               ["outcome"], kind="counter")
+FunctionMetric("model_ready", "1 once a model is loaded", lambda: int(store.current is not None))
+
+@router.post("/", dependencies=[Depends(model_ready)])
+async def predict_alzheimers(
+    data: SymptomInput, request: Request, explain: bool = False,
+    username: Optional[str] = Depends(optional_user),
+):
+    # A bearer token from /auth/signin files the prediction under that
+    # user's history; without one the prediction is kept anonymously
+    PREDICT_STAGE_SECONDS.observe_since(request_started(request), "validation")
+    row = [getattr(data, name) for name in FEATURES]
+    PREDICTED_ROWS.inc("single")
+    return await predict_row(row, data.model_dump(), explain, username)
+
+async def predict_row(row, inputs, explain, username):
+    # Shared by the JSON and array forms of /predict/
+    loaded = get_model()
+    if explain:
+        # Explanations are neither cached nor batched
+        results, _ = await run_in_threadpool(explain_matrix, np.array([row], dtype=np.float64))
+        record_prediction(username, inputs, results[0], results[0]["probabilities"])
+        return results[0]
+
+    with PREDICT_STAGE_SECONDS.time("cache_lookup"):
+        key = PredictionCache.make_key(row, loaded.version) if cache.enabled else None
+        result = cache.get(key) if key is not None else None
+    if result is None:
+        # Queueing plus scoring; the scoring stages are also timed on their own
+        with PREDICT_STAGE_SECONDS.time("batcher"):
+            stage, confidence, version, probabilities = await batcher.submit(row)
+        result = (int(stage), float(confidence), version, probabilities)
+        if key is not None:
+            if version != loaded.version:
+                # The model was swapped while this row was queued
+                key = PredictionCache.make_key(row, version)
+            cache.put(key, result)
+    stage, confidence, version, probabilities = result
+    prediction = format_prediction(stage, confidence, version)
+    record_prediction(username, inputs, prediction, probabilities)
+    return prediction
+
+def format_history(record):
+    created_at = record.created_at
+    if created_at is not None and created_at.tzinfo is None:
+        # SQLite drops the time zone; values are written in UTC
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return {
+        "id": record.id,
+        "prediction": STAGE_MAP.get(record.stage, "Unknown"),
+        "stage_code": record.stage,
+        "probability": record.probability,
+        "probabilities": record.probabilities,
+        "model_version": record.model_version,
+        "inputs": record.inputs,
+        "created_at": created_at.isoformat() if created_at is not None else None,
+    }
+
+@router.get("/history")
+async def prediction_history(
+    username: str = Depends(current_user),
+    limit: int = Query(20, ge=1, le=200),
+    before_id: Optional[int] = None,
+    db: AsyncSession = Depends(database.get_async_db),
+):
+    # The signed-in user's predictions, newest first. Pass next_before_id
+    # back as before_id for the next page; paging on the (username, id)
+    # index keeps deep pages as cheap as the first one.
+    if HISTORY_ENABLED:
+        # Include predictions still waiting in the queue
+        await history.flush()
+    query = select(models.Prediction).where(models.Prediction.username == username)
+    if before_id is not None:
+        query = query.where(models.Prediction.id < before_id)
+    query = query.order_by(models.Prediction.id.desc()).limit(limit + 1)
+    records = (await db.execute(query)).scalars().all()
+    return {
+        "items": [format_history(record) for record in records[:limit]],
+        "next_before_id": records[limit - 1].id if len(records) > limit else None,
     }
 
+@router.get("/history/queue")
+def history_stats():
+    return history.stats()
+
+@router.get("/batcher")
+def batcher_stats():
+    return batcher.stats()
+
+@router.get("/cache")
+def cache_stats():
+    stats = cache.stats()
+    stats["model_version"] = store.current.version if store.current is not None else None
+    return stats
+
+@router.get("/model")
+def model_status():
+    return store.status()
+
+def empty_batch_response():
+    # Same shape as batch_response, for a batch without rows
+    return {"count": 0, "model_version": get_model().version, "results": []}
+
+def batch_response(input_data, explain):
+    if explain:
+        results, version = explain_matrix(input_data)
+    else:
+        stages, confidences, _, loaded = predict_matrix(input_data)
+        version = loaded.version
+        results = format_predictions(stages, confidences, version)
+    return {
+        "count": len(input_data),
+        "model_version": version,
+        "results": results,
+    }
+
+@router.post("/batch", dependencies=[Depends(model_ready)])
+def predict_alzheimers_batch(rows: List[SymptomInput], explain: bool = False):
+    if not rows:
+        return empty_batch_response()
+    with PREDICT_STAGE_SECONDS.time("build_array"):
+        input_data = np.array(
+            [[getattr(row, name) for name in FEATURES] for row in rows], dtype=np.float64
+        )
+    PREDICTED_ROWS.inc("batch", amount=len(input_data))
+    return batch_response(input_data, explain)
+
+@router.post("/batch/csv", dependencies=[Depends(model_ready)])
+async def predict_alzheimers_batch_csv(file: UploadFile = File(...), explain: bool = False):
+    content = await file.read()
+    text = content.decode("utf-8-sig")
+    header, _, body = text.partition("\n")
+    columns = [column.strip() for column in header.strip().split(",")]
+    missing = [name for name in FEATURES if name not in columns]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"CSV is missing columns: {', '.join(missing)}")
+    if not body.strip():
+        return empty_batch_response()
+
+    # Parse only the feature columns, in model order, straight into a float matrix
+    try:
+        with PREDICT_STAGE_SECONDS.time("build_array"):
+            input_data = np.loadtxt(
+                io.StringIO(body), delimiter=",", ndmin=2,
+                usecols=[columns.index(name) for name in FEATURES],
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid CSV: {e}")
+    PREDICTED_ROWS.inc("csv", amount=len(input_data))
+    return batch_response(input_data, explain)
+
+# Array forms of /predict/ and /predict/batch for machine clients: the
+# features in FEATURES order as packed float32, a JSON array or msgpack
+# (see backend/payloads.py), checked against FEATURE_BOUNDS in one pass.
+# Responses are the same as the JSON routes'.
+
+def content_kind(request):
+    kind = payloads.media_type(request.headers.get("content-type"))
+    if kind not in payloads.supported_types():
+        raise HTTPException(
+            status_code=415,
+            detail=f"Unsupported content type {kind or '(none)'}; "
+                   f"use one of {', '.join(payloads.supported_types())}",
+        )
+    return kind
+
+def decode_rows(body, kind):
+    try:
+        with PREDICT_STAGE_SECONDS.time("build_array"):
+            rows = payloads.decode_rows(body, kind, len(FEATURES))
+            payloads.check_rows(rows, FEATURES, FEATURE_LOWER, FEATURE_UPPER, INTEGER_FEATURES)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return rows
+
+def row_inputs(row):
+    # Feature values by name for the prediction history, like the JSON form
+    return {name: int(value) if integer else value
+            for name, value, integer in zip(FEATURES, row, INTEGER_FEATURES.tolist())}
+
+@router.post("/array", dependencies=[Depends(model_ready)])
+async def predict_alzheimers_array(
+    request: Request, explain: bool = False, username: Optional[str] = Depends(optional_user),
+):
+    kind = content_kind(request)
+    rows = decode_rows(await request.body(), kind)
+    if len(rows) != 1:
+        raise HTTPException(status_code=400, detail=f"Expected one row, got {len(rows)}; "
+                                                    "use /predict/array/batch for several")
+    row = rows[0].tolist()
+    PREDICTED_ROWS.inc("array")
+    return payloads.FastJSONResponse(await predict_row(row, row_inputs(row), explain, username))
+
+def array_batch_response(body, kind, explain):
+    input_data = decode_rows(body, kind)
+    if not len(input_data):
+        return empty_batch_response()
+    PREDICTED_ROWS.inc("array_batch", amount=len(input_data))
+    return batch_response(input_data, explain)
+
+@router.post("/array/batch", dependencies=[Depends(model_ready)])
+async def predict_alzheimers_array_batch(request: Request, explain: bool = False):
+    kind = content_kind(request)
+    body = await request.body()
+    return payloads.FastJSONResponse(await run_in_threadpool(array_batch_response, body, kind, explain))
+
 @router.post("/health-insights")
 def health_insights(data: HealthInsightsInput):
-    score = 100
-    precautions = []
-
-    if data.heart_rate > 100 or data.heart_rate < 60:
-        score -= 10
-        precautions.append("Abnormal heart rate detected. Consult a doctor.")
-    
-    if data.systolic_bp > 130 or data.diastolic_bp > 85:
-        score -= 15
-        precautions.append("High blood pressure. Reduce salt intake and monitor BP.")
-    
-    if data.steps_count < 5000:
-        score -= 10
-        precautions.append("Low physical activity. Try to walk more.")
-    
-    if data.hydration < 2.0:
-        score -= 5
-        precautions.append("Low hydration. Drink more water.")
-    
-    if data.sleep_hours < 7:
-        score -= 10
-        precautions.append("Insufficient sleep. Aim for 7-8 hours.")
-
+    score, precautions = insights.assess(data.model_dump())
     return {
         "health_score": score,
         "precautions": precautions
     }
 
+class HealthSeriesInput(BaseModel):
+    # Columns of equal length, one entry per reading. Timestamps are epoch
+    # seconds or ISO 8601 (UTC); null or omitted values count as missing.
+    # steps_count, hydration and sleep_hours are amounts since the previous
+    # reading.
+    timestamp: List[Union[float, str]]
+    heart_rate: Optional[List[Optional[float]]] = None
+    systolic_bp: Optional[List[Optional[float]]] = None
+    diastolic_bp: Optional[List[Optional[float]]] = None
+    steps_count: Optional[List[Optional[float]]] = None
+    hydration: Optional[List[Optional[float]]] = None
+    sleep_hours: Optional[List[Optional[float]]] = None
+
+@router.post("/health-insights/batch")
+def health_insights_batch(data: HealthSeriesInput):
+    n = len(data.timestamp)
+    columns = {}
+    for name in insights.FIELDS:
+        values = getattr(data, name)
+        if values is None:
+            columns[name] = np.full(n, np.nan)
+        elif len(values) != n:
+            raise HTTPException(status_code=400, detail=f"{name} has {len(values)} values for {n} timestamps")
+        else:
+            columns[name] = np.array(values, dtype=np.float64)
+    try:
+        timestamps = insights.parse_timestamps(data.timestamp)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # The whole series is here, so it need not arrive in order
+    order = np.argsort(timestamps, kind="stable")
+    aggregator = insights.DailyAggregator()
+    days = aggregator.add(timestamps[order], {name: values[order] for name, values in columns.items()})
+    return {"days": days + aggregator.finish()}
+
+def aggregate_ndjson(aggregator, block):
+    readings = insights.parse_ndjson(block)
+    if not readings:
+        return []
+    return aggregator.add(*insights.columns_from_readings(readings))
+
+@router.post("/health-insights/stream")
+async def health_insights_stream(request: Request):
+    # NDJSON in, one reading per line in time order; NDJSON out, one day
+    # record per line, the same objects as /health-insights/batch's "days".
+    # The whole body is checked before the response starts: each block is
+    # folded into the daily totals as it arrives, so only the day records
+    # are held, and a problem anywhere in the input is a 400 with
+    # {"detail": ...}. A 200 stream never contains error lines.
+    aggregator = insights.DailyAggregator()
+    days = []
+    buffer = bytearray()
+    try:
+        async for chunk in request.stream():
+            buffer += chunk
+            if len(buffer) < STREAM_BLOCK_BYTES:
+                continue
+            block, _, rest = bytes(buffer).rpartition(b"\n")
+            buffer = bytearray(rest)
+            days += await run_in_threadpool(aggregate_ndjson, aggregator, block)
+        days += await run_in_threadpool(aggregate_ndjson, aggregator, bytes(buffer))
+        days += aggregator.finish()
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return StreamingResponse((json.dumps(day) + "\n" for day in days), media_type="application/x-ndjson")
+
 class GeneralSymptomInput(BaseModel):
     fever: bool = False
     cough: bool = False
@@ -167,47 +570,21 @@ class GeneralSymptomInput(BaseModel):
     fatigue: bool = False
     sore_throat: bool = False
 
+# Rules live in backend/general_rules.json (GENERAL_RULES_PATH), compiled
+# to bitmasks over the symptoms above (see backend/rules.py)
+GENERAL_SYMPTOMS = list(GeneralSymptomInput.model_fields)
+general_rules = RuleSet.load(GENERAL_SYMPTOMS)
+
+def symptom_flags(rows):
+    return [[getattr(row, name) for name in GENERAL_SYMPTOMS] for row in rows]
+
 @router.post("/general")
 def predict_general_disease(data: GeneralSymptomInput):
-    # Simple rule-based logic
-    predictions = []
-    
-    # Common Cold
-    if data.sneeze and data.runny_nose and data.cough:
-        predictions.append({"disease": "Common Cold", "probability": 0.85, "advice": "Rest, hydration, and over-the-counter cold meds."})
-    
-    # Flu (Influenza)
-    if data.fever and data.cough and data.muscle_pain and data.fatigue:
-        predictions.append({"disease": "Flu (Influenza)", "probability": 0.90, "advice": "Antiviral drugs, rest, fluids. See a doctor if severe."})
-        
-    # Migraine
-    if data.headache and data.nausea and not data.fever:
-        predictions.append({"disease": "Migraine", "probability": 0.80, "advice": "Rest in a dark room, pain relievers, hydration."})
-        
-    # Malaria
-    if data.fever and data.chills and data.headache:
-        predictions.append({"disease": "Malaria", "probability": 0.75, "advice": "Immediate blood test and medical attention required."})
-        
-    # Dengue
-    if data.fever and data.joint_pain and data.rash and data.headache:
-        predictions.append({"disease": "Dengue", "probability": 0.85, "advice": "Hydration, pain relief (avoid aspirin), monitor platelets."})
-
-    # COVID-19 (Generic symptoms overlap)
-    if data.fever and data.cough and data.fatigue and data.sore_throat:
-        predictions.append({"disease": "COVID-19", "probability": 0.70, "advice": "Isolate, get tested, monitor oxygen levels."})
-
-    if not predictions:
-        return {
-            "prediction": "Uncertain",
-            "details": "Symptoms do not match a specific pattern clearly. Please consult a doctor.",
-            "matches": []
-        }
-    
-    # Sort by probability
-    predictions.sort(key=lambda x: x['probability'], reverse=True)
-    
-    return {
-        "prediction": predictions[0]['disease'],
-        "details": predictions[0]['advice'],
-        "matches": predictions
-    }
+    return general_rules.evaluate(general_rules.encode(symptom_flags([data])))[0]
+
+@router.post("/general/batch")
+def predict_general_disease_batch(rows: List[GeneralSymptomInput]):
+    if not rows:
+        return {"count": 0, "results": []}
+    results = general_rules.evaluate(general_rules.encode(symptom_flags(rows)))
+    return {"count": len(results), "results": results}
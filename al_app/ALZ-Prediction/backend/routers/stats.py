@@ -1,6 +1,10 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request, Response
+from fastapi.concurrency import run_in_threadpool
+import hashlib
 import json
 import os
+import threading
+import time
 
 router = APIRouter(
     prefix="/stats",
@@ -10,11 +14,64 @@ router = APIRouter(
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 STATS_PATH = os.path.join(BASE_DIR, 'ml', 'stats.json')
 
+# Seconds between mtime checks of stats.json, and how long clients may reuse it
+STATS_CHECK_INTERVAL = float(os.environ.get("STATS_CHECK_INTERVAL", "1"))
+STATS_MAX_AGE = int(os.environ.get("STATS_MAX_AGE", "60"))
+CACHE_CONTROL = f"public, max-age={STATS_MAX_AGE}"
+
+class StatsSnapshot:
+    def __init__(self, signature, stats):
+        self.signature = signature
+        self.body = json.dumps(stats, separators=(",", ":")).encode()
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest()[:16] + '"'
+        self.headers = {"ETag": self.etag, "Cache-Control": CACHE_CONTROL}
+
+_snapshot = None
+_next_check = 0.0
+_refresh_lock = threading.Lock()
+
+def snapshot_is_current():
+    return time.monotonic() < _next_check
+
+def get_snapshot():
+    # stats.json is parsed and serialized once; afterwards it is only
+    # re-read when its mtime or size changes. Does file IO, so the route
+    # calls it in the threadpool.
+    global _snapshot, _next_check
+    with _refresh_lock:
+        now = time.monotonic()
+        if now < _next_check:
+            return _snapshot
+        _next_check = now + STATS_CHECK_INTERVAL
+
+        try:
+            st = os.stat(STATS_PATH)
+        except FileNotFoundError:
+            _snapshot = None
+            return None
+        signature = (st.st_mtime_ns, st.st_size)
+        if _snapshot is None or _snapshot.signature != signature:
+            try:
+                with open(STATS_PATH, 'r') as f:
+                    _snapshot = StatsSnapshot(signature, json.load(f))
+            except (OSError, ValueError) as e:
+                # Keep serving the previous snapshot while the file is rewritten
+                print(f"Error reading stats: {e}")
+        return _snapshot
+
+def etag_matches(if_none_match, etag):
+    if if_none_match is None:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
 @router.get("/")
-def get_stats():
-    if not os.path.exists(STATS_PATH):
+async def get_stats(request: Request):
+    # Between checks the cached snapshot is served straight from the event
+    # loop; the stat (and any re-read) happens off it
+    snapshot = _snapshot if snapshot_is_current() else await run_in_threadpool(get_snapshot)
+    if snapshot is None:
         return {"error": "Stats not found"}
-    
-    with open(STATS_PATH, 'r') as f:
-        stats = json.load(f)
-    return stats
+    if etag_matches(request.headers.get("if-none-match"), snapshot.etag):
+        return Response(status_code=304, headers=snapshot.headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=snapshot.headers)
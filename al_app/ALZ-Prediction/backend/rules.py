@@ -0,0 +1,99 @@
+import json
+import os
+import threading
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RULES_PATH = os.environ.get("GENERAL_RULES_PATH", os.path.join(BASE_DIR, 'general_rules.json'))
+
+UNCERTAIN = {
+    "prediction": "Uncertain",
+    "details": "Symptoms do not match a specific pattern clearly. Please consult a doctor.",
+    "matches": [],
+}
+
+
+class RuleSet:
+    """Symptom rules compiled to bitmasks.
+
+    Each patient's symptoms are packed into an integer, one bit per symptom
+    in `symptoms` order. A rule matches when all of its required bits are set
+    and none of its forbidden ones are, which is checked for every rule (and
+    every patient in a batch) with a few array operations. Rules are sorted
+    by probability once at load time (stably, so ties keep file order), so
+    matches come out ranked.
+    """
+
+    def __init__(self, symptoms, rules):
+        if len(symptoms) > 63:
+            raise ValueError("At most 63 symptoms fit in a mask")
+        self.symptoms = list(symptoms)
+        self.bits = {name: 1 << i for i, name in enumerate(self.symptoms)}
+
+        required, forbidden, probability = [], [], []
+        for rule in rules:
+            requires = self.mask_of(rule.get("requires", []), rule["disease"])
+            forbids = self.mask_of(rule.get("forbids", []), rule["disease"])
+            if requires & forbids:
+                raise ValueError(f"Rule {rule['disease']!r} requires and forbids the same symptom")
+            required.append(requires)
+            forbidden.append(forbids)
+            probability.append(float(rule["probability"]))
+
+        order = np.argsort(-np.array(probability, dtype=np.float64), kind="stable")
+        self.required = np.array(required, dtype=np.int64)[order]
+        self.forbidden = np.array(forbidden, dtype=np.int64)[order]
+        self.matches = [
+            {"disease": rules[i]["disease"], "probability": probability[i], "advice": rules[i]["advice"]}
+            for i in order.tolist()
+        ]
+        # Formatted response per distinct mask; there are at most 2**len(symptoms)
+        self._responses = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, symptoms, path=RULES_PATH):
+        with open(path, 'r') as f:
+            return cls(symptoms, json.load(f)["rules"])
+
+    def mask_of(self, names, disease=None):
+        mask = 0
+        for name in names:
+            if name not in self.bits:
+                raise ValueError(f"Unknown symptom {name!r}" + (f" in rule {disease!r}" if disease else ""))
+            mask |= self.bits[name]
+        return mask
+
+    def encode(self, flags):
+        # (n_patients, n_symptoms) booleans -> one mask per patient
+        flags = np.asarray(flags, dtype=np.int64).reshape(-1, len(self.symptoms))
+        return flags @ (np.int64(1) << np.arange(len(self.symptoms), dtype=np.int64))
+
+    def match(self, masks):
+        # (n_patients, n_rules) booleans, columns in ranked order
+        masks = np.asarray(masks, dtype=np.int64)[:, None]
+        return ((masks & self.required) == self.required) & ((masks & self.forbidden) == 0)
+
+    def _response(self, matched_rules):
+        if not len(matched_rules):
+            return UNCERTAIN
+        matches = [self.matches[i] for i in matched_rules]
+        return {
+            "prediction": matches[0]["disease"],
+            "details": matches[0]["advice"],
+            "matches": matches,
+        }
+
+    def evaluate(self, masks):
+        # Responses for a batch of masks; masks seen before are served from
+        # the memo, the rest are matched together. The returned dicts are
+        # shared between requests and must not be modified.
+        masks = [int(mask) for mask in masks]
+        with self._lock:
+            missing = sorted({mask for mask in masks if mask not in self._responses})
+        if missing:
+            matched = self.match(missing)
+            computed = {mask: self._response(np.flatnonzero(row)) for mask, row in zip(missing, matched)}
+            with self._lock:
+                self._responses.update(computed)
+        return [self._responses[mask] for mask in masks]
@@ -0,0 +1,199 @@
+import argparse
+import gc
+import logging
+import os
+import signal
+import subprocess
+import sys
+import time
+
+# Production launcher: `python -m backend.serve --workers 4` from the
+# ALZ-Prediction directory (run_server.bat does this and also starts the
+# frontend; run_app.bat stays the auto-reloading development setup).
+#
+# On Linux/macOS the parent process imports the app and loads the model
+# once, then forks the workers. They all accept connections on one shared
+# listening socket and share the model's memory pages copy-on-write
+# instead of each unpickling a copy. Compiled forests are memory-mapped,
+# so their pages are shared through the page cache on every platform; on
+# Windows (no fork) the workers are started by uvicorn and rely on that.
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = "backend.main:app"
+
+logger = logging.getLogger("backend.serve")
+
+
+def memory_usage(pid):
+    # {"rss": kB, "pss": kB, "shared": kB} from /proc, or None off Linux.
+    # Pss splits each shared page between the processes mapping it, so the
+    # sum of Pss over the workers is what they really cost together.
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", 'r') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return None
+    fields = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        parts = value.split()
+        if parts and parts[-1] == "kB":
+            fields[name] = int(parts[0])
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+    }
+
+
+def report_memory(pids):
+    rows = [(pid, memory_usage(pid)) for pid in pids]
+    rows = [(pid, usage) for pid, usage in rows if usage is not None]
+    if not rows:
+        logger.info("Per-worker memory is only reported on Linux")
+        return
+    logger.info("%8s %10s %10s %10s", "pid", "RSS MB", "PSS MB", "shared MB")
+    for pid, usage in rows:
+        logger.info("%8d %10.1f %10.1f %10.1f", pid,
+                    usage["rss"] / 1024, usage["pss"] / 1024, usage["shared"] / 1024)
+    rss = sum(usage["rss"] for _, usage in rows)
+    pss = sum(usage["pss"] for _, usage in rows)
+    logger.info("Total RSS %.1f MB, actual (PSS) %.1f MB, %.1f MB saved by sharing",
+                rss / 1024, pss / 1024, (rss - pss) / 1024)
+
+
+def preload():
+    # Everything the workers inherit: the app, its tables and the model
+    from backend import database, models
+    from backend.main import app
+    from backend.routers import prediction
+
+    started = time.perf_counter()
+    models.Base.metadata.create_all(bind=database.engine)
+    # Pooled connections must not be shared between processes
+    database.engine.dispose()
+    prediction.store.refresh()
+    if prediction.store.current is None:
+        logger.warning("No model loaded in the parent; workers will load their own")
+    else:
+        logger.info("Preloaded model %s in %.0f ms",
+                    prediction.store.current.version, (time.perf_counter() - started) * 1000)
+    return app
+
+
+def run_worker(config, sock):
+    import uvicorn
+
+    # Drop the parent's supervisor handlers; uvicorn installs its own
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    try:
+        uvicorn.Server(config).run(sockets=[sock])
+    finally:
+        os._exit(0)
+
+
+def serve_forked(args):
+    import uvicorn
+
+    app = preload()
+    config = uvicorn.Config(app, host=args.host, port=args.port, log_level=args.log_level)
+    sock = config.bind_socket()
+
+    # Objects allocated so far are never freed, so keep the collector from
+    # touching them in the workers; otherwise every collection writes to the
+    # shared pages and makes the workers copy them.
+    gc.collect()
+    gc.freeze()
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            run_worker(config, sock)
+        return pid
+
+    workers = [spawn() for _ in range(args.workers)]
+    logger.info("Started %d workers on http://%s:%d: %s", len(workers), args.host, args.port,
+                ", ".join(map(str, workers)))
+
+    stopping = []
+
+    def stop(signum, frame):
+        stopping.append(signum)
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: report_memory(workers))
+
+    report_at = time.monotonic() + args.memory_report if args.memory_report > 0 else None
+    while workers:
+        if report_at is not None and time.monotonic() >= report_at:
+            report_at = None
+            report_memory(workers)
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        if pid == 0:
+            time.sleep(0.2)
+            continue
+        if pid not in workers:
+            continue
+        workers.remove(pid)
+        if not stopping:
+            # Crashed worker: replace it so capacity stays constant
+            logger.warning("Worker %d exited with status %d, restarting", pid, status)
+            workers.append(spawn())
+    sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API with several worker processes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--memory-report", type=float, default=10.0,
+                        help="Seconds after startup to log per-worker memory (0 = never; "
+                             "SIGUSR1 logs it on demand)")
+    parser.add_argument("--reload", action="store_true", help="Single auto-reloading worker (development)")
+    parser.add_argument("--frontend", action="store_true", help="Also start the frontend dev server")
+    args = parser.parse_args()
+
+    os.chdir(PROJECT_DIR)
+    sys.path.insert(0, PROJECT_DIR)
+    # Split the cores between the API workers and their password hashing pools
+    os.environ.setdefault("AUTH_HASH_WORKERS", str(max(1, (os.cpu_count() or 1) // args.workers)))
+    # The parent has already loaded the model when the workers start
+    os.environ.setdefault("PREDICT_MODEL_LOADING", "eager")
+    logging.basicConfig(level=args.log_level.upper(), format="%(levelname)s:     %(name)s: %(message)s")
+
+    frontend = None
+    if args.frontend:
+        frontend = subprocess.Popen("npm run dev", cwd=os.path.join(PROJECT_DIR, "frontend"), shell=True)
+        logger.info("Frontend dev server starting on http://localhost:5173")
+
+    try:
+        if args.reload or args.workers <= 1 or not hasattr(os, "fork"):
+            import uvicorn
+            if not hasattr(os, "fork") and args.workers > 1:
+                logger.info("fork() is not available; workers share the memory-mapped forest only")
+            uvicorn.run(APP, host=args.host, port=args.port, log_level=args.log_level,
+                        reload=args.reload, workers=None if args.reload else args.workers)
+        else:
+            serve_forked(args)
+    finally:
+        if frontend is not None:
+            frontend.terminate()
+
+
+if __name__ == "__main__":
+    main()
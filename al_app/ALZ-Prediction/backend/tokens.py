@@ -0,0 +1,79 @@
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import time
+
+# Signed bearer tokens issued at sign-in: "<username>.<expiry>.<signature>",
+# the username base64url-encoded, the expiry in epoch seconds and the
+# signature an HMAC-SHA256 of both under the secret key. Verifying one
+# needs no database lookup.
+#
+# The key is AUTH_SECRET_KEY, or else a random key generated once and kept
+# in AUTH_SECRET_FILE, so tokens survive restarts and --reload and every
+# worker process signs with the same key.
+
+logger = logging.getLogger(__name__)
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SECRET_FILE = os.environ.get("AUTH_SECRET_FILE", os.path.join(PROJECT_DIR, "auth_secret.key"))
+
+
+def load_secret_key(path=SECRET_FILE):
+    # The key stored at path, created on first use. Workers starting at the
+    # same time race to create it; the losers read the winner's key.
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        for _ in range(50):
+            with open(path, 'rb') as f:
+                key = f.read().strip()
+            if key:
+                return key
+            # Created but not written yet
+            time.sleep(0.01)
+        raise RuntimeError(f"{path} is empty; delete it or set AUTH_SECRET_KEY")
+    key = secrets.token_hex(32).encode()
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key)
+    logger.warning("AUTH_SECRET_KEY is not set; generated a sign-in key in %s", path)
+    return key
+
+
+SECRET_KEY = os.environ.get("AUTH_SECRET_KEY", "").encode() or load_secret_key()
+# Seconds a token stays valid
+TOKEN_TTL = int(os.environ.get("AUTH_TOKEN_TTL_SECONDS", str(12 * 3600)))
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _signature(payload, key):
+    return _b64encode(hmac.new(key, payload.encode(), hashlib.sha256).digest())
+
+
+def issue(username, ttl=TOKEN_TTL, key=None, now=None):
+    expires = int((time.time() if now is None else now) + ttl)
+    payload = f"{_b64encode(username.encode())}.{expires}"
+    return f"{payload}.{_signature(payload, key or SECRET_KEY)}"
+
+
+def verify(token, key=None, now=None):
+    # The token's username, or None when it is malformed, forged or expired
+    try:
+        encoded_username, expires, signature = token.split(".")
+        payload = f"{encoded_username}.{expires}"
+        if not hmac.compare_digest(signature, _signature(payload, key or SECRET_KEY)):
+            return None
+        if int(expires) <= (time.time() if now is None else now):
+            return None
+        return _b64decode(encoded_username).decode()
+    except (ValueError, UnicodeError):
+        return None
@@ -0,0 +1,300 @@
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+# Latency/throughput benchmark for the API endpoints.
+#
+#   python benchmark.py                          # app in-process, all endpoints
+#   python benchmark.py --url http://localhost:8000 --concurrency 32
+#   python benchmark.py --endpoints predict batch --requests 500
+#
+# Every run is saved to benchmarks/results/. The run fails (exit code 1)
+# when an endpoint's p95 latency or requests/sec is worse than the baseline
+# by more than --tolerance. The baseline is benchmarks/baseline.json if it
+# exists (write it with --update-baseline), otherwise the median of the
+# previous runs with the same settings.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# The in-process app gets a throwaway database, so benchmarking never writes
+# to sql_app.db. Set before backend is imported, which reads it.
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="alz-bench-"), "bench.db")
+os.environ.setdefault("PREDICT_MODEL_LOADING", "eager")
+sys.path.insert(0, BASE_DIR)
+from backend.routers.prediction import (
+    FEATURE_LOWER, FEATURE_UPPER, FEATURES, GENERAL_SYMPTOMS as SYMPTOMS, INTEGER_FEATURES,
+)
+
+RESULTS_DIR = os.path.join(BASE_DIR, 'benchmarks', 'results')
+BASELINE_PATH = os.path.join(BASE_DIR, 'benchmarks', 'baseline.json')
+CSV_PATH = os.path.join(BASE_DIR, 'alzheimers_disease_data.csv')
+
+BENCH_USER = {"username": "benchmark_user", "password": "benchmark-password"}
+BATCH_SIZE = 32
+
+# Feature names and types come from the API's own input model, so the
+# benchmark always sends what /predict/ expects
+INT_FEATURES = {name for name, is_int in zip(FEATURES, INTEGER_FEATURES) if is_int}
+
+
+def patient_rows(count=1000, seed=0):
+    # Real patients from the dataset when it is there, random ones otherwise
+    if os.path.exists(CSV_PATH):
+        import pandas as pd
+        df = pd.read_csv(CSV_PATH, usecols=FEATURES, nrows=count)[FEATURES]
+        return [
+            {name: int(value) if name in INT_FEATURES else float(value) for name, value in row.items()}
+            for row in df.to_dict("records")
+        ]
+    rng = np.random.default_rng(seed)
+    bounds = list(zip(FEATURES, FEATURE_LOWER, FEATURE_UPPER))
+    return [
+        {name: int(rng.integers(low, high + 1)) if name in INT_FEATURES else float(rng.uniform(low, high))
+         for name, low, high in bounds}
+        for _ in range(count)
+    ]
+
+
+def build_scenarios(seed=0):
+    # name -> (method, path, fn(i) returning request kwargs)
+    rng = np.random.default_rng(seed)
+    rows = patient_rows(seed=seed)
+    symptoms = [
+        {name: bool(flag) for name, flag in zip(SYMPTOMS, rng.integers(0, 2, len(SYMPTOMS)))}
+        for _ in range(256)
+    ]
+    vitals = [
+        {
+            "heart_rate": int(rng.integers(50, 120)),
+            "systolic_bp": int(rng.integers(100, 160)),
+            "diastolic_bp": int(rng.integers(60, 100)),
+            "steps_count": int(rng.integers(1000, 12000)),
+            "hydration": float(rng.uniform(0.5, 3.5)),
+            "sleep_hours": float(rng.uniform(4, 9)),
+        }
+        for _ in range(256)
+    ]
+    return {
+        "predict": ("POST", "/predict/", lambda i: {"json": rows[i % len(rows)]}),
+        "batch": ("POST", "/predict/batch", lambda i: {
+            "json": [rows[(i * BATCH_SIZE + j) % len(rows)] for j in range(BATCH_SIZE)]
+        }),
+        "general": ("POST", "/predict/general", lambda i: {"json": symptoms[i % len(symptoms)]}),
+        "health_insights": ("POST", "/predict/health-insights", lambda i: {"json": vitals[i % len(vitals)]}),
+        "signin": ("POST", "/auth/signin", lambda i: {"json": BENCH_USER}),
+        "stats": ("GET", "/stats/", lambda i: {}),
+    }
+
+
+def summarize(latencies, statuses, elapsed):
+    # rps counts successful responses only
+    latencies = np.array(latencies) * 1000
+    errors = sum(count for status, count in statuses.items() if status >= 400)
+    ok = len(latencies) - errors
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": {str(status): statuses[status] for status in sorted(statuses)},
+        "rps": round(ok / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(float(latencies.mean()), 3) if len(latencies) else None,
+        **{
+            f"p{q}_ms": round(float(np.percentile(latencies, q)), 3) if len(latencies) else None
+            for q in (50, 95, 99)
+        },
+    }
+
+
+async def run_scenario(client, scenario, requests, concurrency, warmup):
+    method, path, make = scenario
+    for i in range(warmup):
+        await client.request(method, path, **make(i))
+
+    latencies = []
+    statuses = {}
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            kwargs = make(warmup + i)
+            started = time.perf_counter()
+            response = await client.request(method, path, **kwargs)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, statuses, time.perf_counter() - started)
+
+
+async def run_all(client, names, args):
+    scenarios = build_scenarios(args.seed)
+    if "signin" in names:
+        # 400 when the user is left over from an earlier run
+        await client.post("/auth/signup", json=BENCH_USER)
+    results = {}
+    for name in names:
+        results[name] = await run_scenario(
+            client, scenarios[name], args.requests, args.concurrency, args.warmup
+        )
+        print_result(name, results[name])
+    return results
+
+
+async def run_in_process(names, args):
+    import httpx
+    from backend.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            return await run_all(client, names, args)
+
+
+async def run_remote(names, args):
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=30) as client:
+        return await run_all(client, names, args)
+
+
+def print_result(name, result):
+    print(f"{name:>16} {result['requests']:>7} {result['errors']:>6} {result['rps']:>9.1f} "
+          f"{result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def settings_of(run):
+    return (run["target"], run["concurrency"], run["requests"])
+
+
+def previous_runs(run, history):
+    # The latest `history` saved runs made with the same settings
+    if not os.path.isdir(RESULTS_DIR):
+        return []
+    runs = []
+    for name in sorted(os.listdir(RESULTS_DIR), reverse=True):
+        if not name.endswith(".json"):
+            continue
+        with open(os.path.join(RESULTS_DIR, name), 'r') as f:
+            previous = json.load(f)
+        if settings_of(previous) == settings_of(run):
+            runs.append(previous)
+        if len(runs) == history:
+            break
+    return runs
+
+
+def median_baseline(runs):
+    baseline = {}
+    for name in {name for run in runs for name in run["results"]}:
+        values = [run["results"][name] for run in runs if name in run["results"]]
+        baseline[name] = {
+            key: float(np.median([v[key] for v in values]))
+            for key in ("rps", "p95_ms", "errors")
+        }
+    return baseline
+
+
+def find_regressions(results, baseline, tolerance, min_delta_ms):
+    problems = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        expected = baseline[name]
+        if result["p95_ms"] > expected["p95_ms"] * (1 + tolerance) \
+                and result["p95_ms"] - expected["p95_ms"] > min_delta_ms:
+            problems.append(f"{name}: p95 {result['p95_ms']:.2f} ms vs baseline {expected['p95_ms']:.2f} ms")
+        if result["rps"] < expected["rps"] * (1 - tolerance):
+            problems.append(f"{name}: {result['rps']:.1f} req/s vs baseline {expected['rps']:.1f} req/s")
+        if result["errors"] > expected.get("errors", 0) * (1 + tolerance):
+            problems.append(f"{name}: {result['errors']} failed requests "
+                            f"({result['statuses']}) vs baseline {expected.get('errors', 0):.0f}")
+    return problems
+
+
+def main():
+    scenarios = list(build_scenarios())
+    parser = argparse.ArgumentParser(description="Benchmark the API endpoints")
+    parser.add_argument("--url", help="Benchmark a running server instead of the app in-process")
+    parser.add_argument("--endpoints", nargs="+", choices=scenarios, default=scenarios)
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=10, help="Unmeasured requests per endpoint")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--history", type=int, default=5,
+                        help="Previous runs to compare against when there is no baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown (0.2 = 20%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                        help="Ignore p95 increases smaller than this")
+    parser.add_argument("--update-baseline", action="store_true", help="Save this run as the baseline")
+    parser.add_argument("--no-save", action="store_true", help="Do not store the results")
+    args = parser.parse_args()
+
+    print(f"{'endpoint':>16} {'count':>7} {'errors':>6} {'req/s':>9} "
+          f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    if args.url:
+        results = asyncio.run(run_remote(args.endpoints, args))
+    else:
+        results = asyncio.run(run_in_process(args.endpoints, args))
+
+    run = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": git_commit(),
+        "target": args.url or "in-process",
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "results": results,
+    }
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as f:
+            baseline, source = json.load(f)["results"], args.baseline
+    else:
+        runs = previous_runs(run, args.history)
+        baseline, source = median_baseline(runs), f"median of {len(runs)} previous runs"
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+        with open(path, 'w') as f:
+            json.dump(run, f, indent=4)
+        print(f"\nResults saved to {path}")
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(run, f, indent=4)
+        print(f"Baseline updated: {args.baseline}")
+        return
+
+    if not baseline:
+        print("No baseline yet, nothing to compare against.")
+        return
+    problems = find_regressions(results, baseline, args.tolerance, args.min_delta_ms)
+    if problems:
+        print(f"\nRegressions against {source}:")
+        for problem in problems:
+            print(f"  {problem}")
+        sys.exit(1)
+    print(f"\nNo regressions against {source}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+import os
+import tempfile
+
+# Tests that go through the app use a throwaway database instead of
+# ./sql_app.db, and a throwaway sign-in key. This runs before any test
+# module imports the backend.
+TEST_DIR = tempfile.mkdtemp(prefix="alz-tests-")
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(TEST_DIR, "sql_app.db"))
+os.environ.setdefault("AUTH_SECRET_FILE", os.path.join(TEST_DIR, "auth_secret.key"))
@@ -8,6 +8,7 @@ const Navbar = () => {
 
     const handleLogout = () => {
         localStorage.removeItem('username');
+        localStorage.removeItem('access_token');
         navigate('/');
     };
 
@@ -1,8 +1,19 @@
 import { StrictMode } from 'react'
 import { createRoot } from 'react-dom/client'
+import axios from 'axios'
 import './index.css'
 import App from './App.jsx'
 
+// A 401 means the stored sign-in token was rejected (expired, or signed with
+// an older key); forget it so the user is asked to sign in again
+axios.interceptors.response.use(undefined, (error) => {
+  if (error.response?.status === 401) {
+    localStorage.removeItem('access_token')
+    localStorage.removeItem('username')
+  }
+  return Promise.reject(error)
+})
+
 createRoot(document.getElementById('root')).render(
   <StrictMode>
     <App />
@@ -13,6 +13,7 @@ export const SignIn = () => {
         try {
             const response = await axios.post('http://localhost:8000/auth/signin', { username, password });
             localStorage.setItem('username', response.data.username);
+            localStorage.setItem('access_token', response.data.access_token);
             navigate('/main');
         } catch (err) {
             setError(err.response?.data?.detail || 'Login failed');
@@ -158,7 +158,11 @@ const MainPage = () => {
                 formattedData[key] = isNaN(aggregatedData[key]) ? aggregatedData[key] : Number(aggregatedData[key]);
             }
 
-            const response = await axios.post('http://localhost:8000/predict/', formattedData);
+            // Files the result under the signed-in user's prediction history
+            const token = localStorage.getItem('access_token');
+            const response = await axios.post('http://localhost:8000/predict/', formattedData, {
+                headers: token ? { Authorization: `Bearer ${token}` } : {},
+            });
             setPredictionResult(response.data);
         } catch (error) {
             console.error("Error fetching alzheimer prediction:", error);
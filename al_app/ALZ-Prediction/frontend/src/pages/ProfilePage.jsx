@@ -12,6 +12,7 @@ const ProfilePage = () => {
 
     const handleLogout = () => {
         localStorage.removeItem('username');
+        localStorage.removeItem('access_token');
         navigate('/');
     };
 
@@ -0,0 +1,9 @@
+@echo off
+echo Starting Alzheimer's Prediction App (multi-worker server)...
+echo Backend: http://localhost:8000  Frontend: http://localhost:5173
+echo.
+
+rem Same as run_app.bat, but serves the API from several worker processes
+rem that share one preloaded model instead of the auto-reloading dev server.
+rem Extra arguments are passed to the launcher, e.g. run_server.bat --workers 4
+python -m backend.serve --frontend %*
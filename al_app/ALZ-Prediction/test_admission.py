@@ -0,0 +1,178 @@
+import asyncio
+import time
+import pytest
+
+from backend import admission, metrics
+from backend.admission import AdmissionController, AdmissionMiddleware, Rejected, RouteClass
+
+
+def route_class(name="predict", priority=1, max_in_flight=1, max_queue=8, deadline_ms=1000):
+    return RouteClass(name, ["/" + name], priority, max_in_flight, max_queue, deadline_ms)
+
+
+def later(seconds=10.0):
+    return time.perf_counter() + seconds
+
+
+def test_full_queue_is_turned_away():
+    async def run():
+        predict = route_class(max_queue=1)
+        controller = AdmissionController([predict])
+        await controller.acquire(predict, later())
+        queued = asyncio.create_task(controller.acquire(predict, later()))
+        await asyncio.sleep(0)
+        assert predict.waiting == 1
+
+        with pytest.raises(Rejected) as rejected:
+            await controller.acquire(predict, later())
+        assert rejected.value.reason == "queue_full"
+
+        controller.release(predict)
+        await queued
+        assert predict.in_flight == 1 and predict.waiting == 0
+
+    asyncio.run(run())
+
+
+def test_queued_request_expires_at_its_deadline():
+    async def run():
+        predict = route_class()
+        controller = AdmissionController([predict])
+        await controller.acquire(predict, later())
+
+        started = time.perf_counter()
+        with pytest.raises(Rejected) as rejected:
+            await controller.acquire(predict, started + 0.05)
+        assert rejected.value.reason == "deadline"
+        assert 0.04 <= time.perf_counter() - started < 1.0
+        assert predict.waiting == 0 and predict.in_flight == 1
+
+        # A slot freed later is not handed to the expired request
+        controller.release(predict)
+        assert predict.in_flight == 0 and controller.in_flight == 0
+
+    asyncio.run(run())
+
+
+def test_hopeless_request_is_rejected_without_queueing():
+    async def run():
+        predict = route_class()
+        predict.service_time = 1.0
+        controller = AdmissionController([predict])
+        await controller.acquire(predict, later())
+        with pytest.raises(Rejected) as rejected:
+            await controller.acquire(predict, later(0.5))
+        assert rejected.value.reason == "deadline"
+        assert predict.waiting == 0
+
+    asyncio.run(run())
+
+
+def test_freed_slots_go_to_higher_priority_first():
+    async def run():
+        stats = route_class("stats", priority=0, max_in_flight=4)
+        bulk = route_class("bulk", priority=2, max_in_flight=4)
+        controller = AdmissionController([stats, bulk], capacity=1)
+        await controller.acquire(bulk, later())
+
+        order = []
+
+        async def request(name, cls):
+            await controller.acquire(cls, later())
+            order.append(name)
+
+        # Queued oldest first, but the stats request is admitted first
+        tasks = [asyncio.create_task(request("bulk 1", bulk))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(request("bulk 2", bulk)))
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(request("stats", stats)))
+        await asyncio.sleep(0)
+
+        for finished in (bulk, stats, bulk):
+            controller.release(finished)
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        assert order == ["stats", "bulk 1", "bulk 2"]
+
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_gives_its_place_back():
+    async def run():
+        predict = route_class()
+        controller = AdmissionController([predict])
+        await controller.acquire(predict, later())
+
+        queued = asyncio.create_task(controller.acquire(predict, later()))
+        await asyncio.sleep(0)
+        assert predict.waiting == 1
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        assert predict.waiting == 0
+
+        controller.release(predict)
+        assert predict.in_flight == 0 and controller.in_flight == 0
+
+    asyncio.run(run())
+
+
+def test_cancelled_after_admission_releases_the_slot():
+    async def run():
+        predict = route_class()
+        controller = AdmissionController([predict])
+        await controller.acquire(predict, later())
+
+        # Granted the slot, but cancelled before it got to run
+        queued = asyncio.create_task(controller.acquire(predict, later()))
+        await asyncio.sleep(0)
+        controller.release(predict)
+        assert predict.in_flight == 1
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        assert predict.in_flight == 0 and predict.waiting == 0
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, 1.0),
+    (b"250", 0.25),
+    (b"60000", 1.0),  # capped at the class deadline
+    (b"-5", 0.0),
+    (b"soon", 1.0),
+])
+def test_deadline_header(header, expected):
+    predict = route_class(deadline_ms=1000)
+    headers = [] if header is None else [(admission.DEADLINE_HEADER, header)]
+    deadline = admission.request_deadline({"headers": headers}, predict, 100.0)
+    assert deadline == pytest.approx(100.0 + expected)
+
+
+def test_handler_timings_start_at_admission(monkeypatch):
+    monkeypatch.setattr(admission, "ENABLED", True)
+    predict = route_class()
+    controller = AdmissionController([predict])
+    seen = {}
+
+    async def app(scope, receive, send):
+        seen.update(scope["state"])
+
+    async def run():
+        await controller.acquire(predict, later())
+        scope = {"type": "http", "path": "/predict", "headers": [],
+                 "state": {"request_started": time.perf_counter()}}
+        request = asyncio.create_task(AdmissionMiddleware(app, controller)(scope, None, None))
+        await asyncio.sleep(0.05)
+        controller.release(predict)
+        await request
+
+    asyncio.run(run())
+    assert seen["request_admitted"] - seen["request_started"] >= 0.04
+
+    class Request:
+        scope = {"state": seen}
+
+    assert metrics.request_started(Request) == seen["request_admitted"]
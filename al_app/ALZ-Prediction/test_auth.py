@@ -0,0 +1,157 @@
+import asyncio
+import uuid
+import pytest
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+
+from backend import database, models, tokens
+from backend.hashing import HashingBusy, PasswordHasher
+from backend.main import app
+from backend.routers import auth, prediction, stats
+
+
+def unique_name():
+    return "user-" + uuid.uuid4().hex[:12]
+
+
+def stored_hash(username):
+    with database.SessionLocal() as db:
+        return db.query(models.User).filter(models.User.username == username).one().hashed_password
+
+
+def test_calls_beyond_max_pending_fail_fast():
+    hasher = PasswordHasher(workers=0, max_pending=1, rounds=1000)
+
+    async def run():
+        return await asyncio.gather(hasher.hash("a"), hasher.hash("b"), return_exceptions=True)
+
+    first, second = asyncio.run(run())
+    assert first.startswith("$pbkdf2-sha256$1000$")
+    assert isinstance(second, HashingBusy)
+    assert hasher.rejected == 1 and hasher.pending == 0
+
+
+def test_verify_and_update_rehashes_other_rounds():
+    old = asyncio.run(PasswordHasher(workers=0, rounds=1000).hash("secret"))
+    hasher = PasswordHasher(workers=0, rounds=2000)
+
+    valid, new_hash = asyncio.run(hasher.verify_and_update("secret", old))
+    assert valid and new_hash.startswith("$pbkdf2-sha256$2000$")
+    assert asyncio.run(hasher.verify_and_update("wrong", old)) == (False, None)
+    assert asyncio.run(hasher.verify_and_update("secret", new_hash)) == (True, None)
+
+
+def test_busy_hasher_answers_503(monkeypatch):
+    monkeypatch.setattr(auth, "hasher", PasswordHasher(workers=0, max_pending=0, rounds=1000))
+    with TestClient(app) as client:
+        response = client.post("/auth/signup", json={"username": unique_name(), "password": "secret"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_signin_rehashes_with_the_current_rounds(monkeypatch):
+    username = unique_name()
+    credentials = {"username": username, "password": "secret"}
+    with TestClient(app) as client:
+        monkeypatch.setattr(auth, "hasher", PasswordHasher(workers=0, rounds=1000))
+        assert client.post("/auth/signup", json=credentials).status_code == 201
+        assert stored_hash(username).startswith("$pbkdf2-sha256$1000$")
+
+        monkeypatch.setattr(auth, "hasher", PasswordHasher(workers=0, rounds=2000))
+        assert client.post("/auth/signin", json={**credentials, "password": "wrong"}).status_code == 400
+        assert stored_hash(username).startswith("$pbkdf2-sha256$1000$")
+        assert client.post("/auth/signin", json=credentials).status_code == 200
+        assert stored_hash(username).startswith("$pbkdf2-sha256$2000$")
+
+
+def test_tokens_round_trip():
+    token = tokens.issue("alice", ttl=60, now=1000)
+    assert tokens.verify(token, now=1059) == "alice"
+    assert tokens.verify(token, now=1060) is None  # expired
+    assert tokens.verify(token, key=b"another key", now=1000) is None
+
+
+@pytest.mark.parametrize("token", [
+    "",
+    "not-a-token",
+    "a.b.c.d",
+    tokens.issue("alice").replace(tokens._b64encode(b"alice"), tokens._b64encode(b"bob")),
+    tokens.issue("alice")[:-2],
+])
+def test_forged_tokens_are_rejected(token):
+    assert tokens.verify(token) is None
+
+
+def add_predictions(username, count):
+    with database.SessionLocal() as db:
+        db.add_all([models.Prediction(username=username, stage=0, probability=0.5) for _ in range(count)])
+        db.commit()
+
+
+@pytest.mark.parametrize("headers, detail", [
+    ({}, "Not authenticated"),
+    ({"Authorization": "Bearer " + tokens.issue("alice", ttl=-1)}, "Invalid or expired token"),
+    ({"Authorization": "Bearer forged"}, "Invalid or expired token"),
+    ({"X-Username": "alice"}, "Not authenticated"),
+])
+def test_history_needs_a_valid_token(headers, detail):
+    with TestClient(app) as client:
+        response = client.get("/predict/history", headers=headers)
+    assert response.status_code == 401
+    assert response.json()["detail"] == detail
+    assert response.headers["WWW-Authenticate"] == "Bearer"
+
+
+def test_signin_token_reads_only_that_users_history(monkeypatch):
+    monkeypatch.setattr(auth, "hasher", PasswordHasher(workers=0, rounds=1000))
+    username, other = unique_name(), unique_name()
+    add_predictions(username, 2)
+    add_predictions(other, 3)
+    credentials = {"username": username, "password": "secret"}
+    with TestClient(app) as client:
+        assert client.post("/auth/signup", json=credentials).status_code == 201
+        signed_in = client.post("/auth/signin", json=credentials).json()
+        assert signed_in["token_type"] == "bearer"
+        response = client.get("/predict/history", headers={
+            "Authorization": "Bearer " + signed_in["access_token"], "X-Username": other,
+        })
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == 2
+
+
+def test_stale_token_on_predict_is_anonymous(monkeypatch):
+    # A token signed with an older key must not block predictions
+    monkeypatch.setitem(app.dependency_overrides, prediction.model_ready, lambda: None)
+    stale = tokens.issue("alice", key=b"old key")
+    assert auth.optional_user(auth.HTTPAuthorizationCredentials(scheme="Bearer", credentials=stale)) is None
+    with TestClient(app) as client:
+        response = client.post("/predict/array", content=b"[]", headers={
+            "Content-Type": "application/json", "Authorization": "Bearer " + stale,
+        })
+    # Past authentication to the row check
+    assert response.status_code == 400
+
+
+def test_secret_key_is_kept_between_processes(tmp_path):
+    path = tmp_path / "auth_secret.key"
+    key = tokens.load_secret_key(str(path))
+    assert len(key) == 64
+    assert tokens.load_secret_key(str(path)) == key
+    path.write_bytes(b"")
+    with pytest.raises(RuntimeError, match="is empty"):
+        tokens.load_secret_key(str(path))
+
+
+def dependency_calls(dependant):
+    for dependency in dependant.dependencies:
+        yield dependency.call
+        yield from dependency_calls(dependency)
+
+
+@pytest.mark.parametrize("route", [
+    route for route in [*app.routes, *auth.router.routes, *prediction.router.routes, *stats.router.routes]
+    if isinstance(route, APIRoute) and asyncio.iscoroutinefunction(route.endpoint)
+], ids=lambda route: route.path)
+def test_async_routes_do_not_use_the_blocking_session(route):
+    # A sync Session in an async def handler would block the event loop
+    assert database.get_db not in set(dependency_calls(route.dependant))
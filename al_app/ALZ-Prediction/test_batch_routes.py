@@ -0,0 +1,100 @@
+import json
+import os
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+from backend.main import app
+from backend.model_store import ModelStore
+from backend.routers import prediction
+from backend.routers.prediction import FEATURES
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CSV_PATH = os.path.join(BASE_DIR, 'alzheimers_disease_data.csv')
+
+
+@pytest.fixture(scope="module")
+def artifacts(tmp_path_factory):
+    # A small stage forest on the real features, pickled like train_multiclass.py does
+    root = tmp_path_factory.mktemp("model")
+    df = pd.read_csv(CSV_PATH, nrows=400)
+    scaler = StandardScaler().fit(df[FEATURES].to_numpy(np.float64))
+    model = RandomForestClassifier(n_estimators=10, random_state=0)
+    model.fit(scaler.transform(df[FEATURES].to_numpy(np.float64)), df['Diagnosis'] * 2)
+    joblib.dump(model, root / 'model_multiclass.pkl')
+    joblib.dump(scaler, root / 'scaler_multiclass.pkl')
+    return str(root), df
+
+
+@pytest.fixture
+def client(monkeypatch, artifacts, tmp_path):
+    root, _ = artifacts
+    store = ModelStore("pickle", registry_dir=str(tmp_path / "registry"), root=root)
+    assert store.refresh()
+    monkeypatch.setattr(prediction, "store", store)
+    return TestClient(app)
+
+
+@pytest.fixture
+def rows(artifacts):
+    _, df = artifacts
+    return df.iloc[:20]
+
+
+def records(rows):
+    return rows[FEATURES].to_dict(orient="records")
+
+
+def to_csv(rows, line_ending="\n"):
+    # Extra columns and a different order than FEATURES, like the dataset file
+    columns = ['PatientID'] + FEATURES[::-1] + ['DoctorInCharge']
+    return rows[columns].to_csv(index=False, lineterminator=line_ending).encode()
+
+
+def test_batch_matches_single_predictions(client, rows):
+    singles = [client.post("/predict/", json=record).json() for record in records(rows)]
+    response = client.post("/predict/batch", json=records(rows)).json()
+    assert response["count"] == len(rows)
+    assert response["model_version"] == prediction.store.current.version
+    assert response["results"] == singles
+
+
+@pytest.mark.parametrize("line_ending", ["\n", "\r\n"])
+def test_csv_matches_the_json_batch(client, rows, line_ending):
+    expected = client.post("/predict/batch", json=records(rows)).json()
+    response = client.post("/predict/batch/csv", files={"file": ("rows.csv", to_csv(rows, line_ending))})
+    assert response.status_code == 200
+    assert response.json() == expected
+
+
+def test_csv_with_missing_columns_is_400(client, rows):
+    body = rows.drop(columns=['MMSE', 'ADL']).to_csv(index=False).encode()
+    response = client.post("/predict/batch/csv", files={"file": ("rows.csv", body)})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "CSV is missing columns: MMSE, ADL"
+
+
+@pytest.mark.parametrize("damage", [
+    lambda fields: fields[:1] + ["yes"] + fields[2:],  # Forgetfulness is not a number
+    lambda fields: fields[:10],  # short row
+])
+def test_malformed_csv_is_400(client, rows, damage):
+    lines = to_csv(rows.iloc[:3]).decode().splitlines()
+    lines[2] = ",".join(damage(lines[2].split(",")))
+    response = client.post("/predict/batch/csv", files={"file": ("rows.csv", "\n".join(lines).encode())})
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Invalid CSV")
+
+
+@pytest.mark.parametrize("path, kwargs", [
+    ("/predict/batch", {"json": []}),
+    ("/predict/batch/csv", {"files": {"file": ("rows.csv", ",".join(FEATURES).encode() + b"\r\n")}}),
+    ("/predict/array/batch", {"content": b"[]", "headers": {"Content-Type": "application/json"}}),
+])
+def test_empty_batches_name_the_model(client, path, kwargs):
+    response = client.post(path, **kwargs)
+    assert response.json() == {"count": 0, "model_version": prediction.store.current.version, "results": []}
@@ -0,0 +1,179 @@
+import asyncio
+import time
+
+from backend.batching import MicroBatcher, WriteBehindQueue
+
+
+class Recorder:
+    # predict_fn stand-in: remembers every batch and returns (row * 10, row)
+    def __init__(self, fail_on=None):
+        self.batches = []
+        self.fail_on = fail_on
+
+    def __call__(self, rows):
+        self.batches.append(list(rows))
+        if self.fail_on in rows:
+            raise RuntimeError("model failed")
+        return [row * 10 for row in rows], list(rows)
+
+
+def test_concurrent_rows_share_one_call():
+    predict = Recorder()
+    batcher = MicroBatcher(predict, window_ms=0, max_batch_size=64)
+
+    async def run():
+        return await asyncio.gather(*(batcher.submit(row) for row in range(5)))
+
+    results = asyncio.run(run())
+    assert predict.batches == [[0, 1, 2, 3, 4]]
+    # Each caller gets its own row's share of every output
+    assert results == [(row * 10, row) for row in range(5)]
+
+
+def test_batches_are_capped():
+    predict = Recorder()
+    batcher = MicroBatcher(predict, window_ms=0, max_batch_size=3)
+
+    async def run():
+        return await asyncio.gather(*(batcher.submit(row) for row in range(7)))
+
+    results = asyncio.run(run())
+    assert [len(batch) for batch in predict.batches] == [3, 3, 1]
+    assert [result[1] for result in results] == list(range(7))
+
+
+def test_window_only_applies_under_concurrency():
+    predict = Recorder()
+    batcher = MicroBatcher(predict, window_ms=200, max_batch_size=64)
+
+    async def run():
+        # A lone request on an idle batcher goes out at once
+        started = time.perf_counter()
+        await batcher.submit(0)
+        lone = time.perf_counter() - started
+
+        # After a batch of two, the worker waits for rows arriving shortly after
+        await asyncio.gather(batcher.submit(1), batcher.submit(2))
+
+        async def late(row, delay):
+            await asyncio.sleep(delay)
+            return await batcher.submit(row)
+
+        await asyncio.gather(late(3, 0), late(4, 0.02))
+        return lone
+
+    lone = asyncio.run(run())
+    assert lone < 0.1
+    assert predict.batches == [[0], [1, 2], [3, 4]]
+
+
+def test_errors_reach_every_caller_in_the_batch():
+    predict = Recorder(fail_on=2)
+    batcher = MicroBatcher(predict, window_ms=0, max_batch_size=64)
+
+    async def run():
+        failed = await asyncio.gather(*(batcher.submit(row) for row in range(3)), return_exceptions=True)
+        # The worker keeps serving after a failed batch
+        return failed, await batcher.submit(5)
+
+    failed, after = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in failed)
+    assert after == (50, 5)
+    assert batcher.stats()["batch_size"]["count"] == 2
+
+
+
+class Writer:
+    # write_fn stand-in: remembers every batch, optionally failing one
+    def __init__(self, fail_on=None):
+        self.batches = []
+        self.fail_on = fail_on
+
+    async def __call__(self, rows):
+        self.batches.append(list(rows))
+        if self.fail_on in rows:
+            raise RuntimeError("database down")
+
+
+def test_history_is_written_in_batches():
+    write = Writer()
+    queue = WriteBehindQueue(write, max_batch_size=3, flush_interval_ms=10000)
+
+    async def run():
+        for row in range(7):
+            queue.submit(row)
+        # Two full batches go out without waiting for the interval
+        await asyncio.sleep(0.01)
+        full = list(write.batches)
+        await queue.flush()
+        return full
+
+    full = asyncio.run(run())
+    assert full == [[0, 1, 2], [3, 4, 5]]
+    assert write.batches == [[0, 1, 2], [3, 4, 5], [6]]
+    assert queue.written == 7 and queue.queue_depth == 0
+
+
+def test_partial_batch_is_written_after_the_interval():
+    write = Writer()
+    queue = WriteBehindQueue(write, max_batch_size=64, flush_interval_ms=50)
+
+    async def run():
+        queue.submit(0)
+        queue.submit(1)
+        await asyncio.sleep(0.01)
+        assert write.batches == []
+        await asyncio.sleep(0.1)
+
+    asyncio.run(run())
+    assert write.batches == [[0, 1]]
+
+
+def test_full_queue_drops_new_records():
+    write = Writer()
+    queue = WriteBehindQueue(write, max_batch_size=64, flush_interval_ms=10000, max_queue=3)
+
+    async def run():
+        accepted = [queue.submit(row) for row in range(5)]
+        assert queue.queue_depth == 3
+        await queue.flush()
+        # Room again once the queue is written
+        accepted.append(queue.submit(5))
+        await queue.flush()
+        return accepted
+
+    accepted = asyncio.run(run())
+    assert accepted == [True, True, True, False, False, True]
+    assert write.batches == [[0, 1, 2], [5]]
+    assert (queue.written, queue.dropped) == (4, 2)
+
+
+def test_failed_write_is_counted_and_the_queue_keeps_going():
+    write = Writer(fail_on=1)
+    queue = WriteBehindQueue(write, max_batch_size=2, flush_interval_ms=10000)
+
+    async def run():
+        for row in range(4):
+            queue.submit(row)
+        await queue.flush()
+
+    asyncio.run(run())
+    assert write.batches == [[0, 1], [2, 3]]
+    assert (queue.written, queue.failed, queue.queue_depth) == (2, 2, 0)
+
+
+def test_close_drains_the_queue():
+    write = Writer()
+    queue = WriteBehindQueue(write, max_batch_size=2, flush_interval_ms=10000)
+
+    async def run():
+        for row in range(5):
+            queue.submit(row)
+        await queue.close()
+        assert queue._worker.done()
+        # Closing again is a no-op
+        await queue.close()
+
+    asyncio.run(run())
+    assert write.batches == [[0, 1], [2, 3], [4]]
+    assert queue.written == 5 and queue.queue_depth == 0
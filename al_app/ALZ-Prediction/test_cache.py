@@ -0,0 +1,52 @@
+from backend import cache as cache_module
+from backend.cache import PredictionCache
+
+ROW = [70, 1, 0, 2, 25.5, 0]
+
+
+def test_key_depends_on_values_and_version():
+    key = PredictionCache.make_key(ROW, "v1")
+    # Ints and floats with the same value (and -0.0 and 0.0) share a key
+    assert PredictionCache.make_key([70.0, 1, 0, 2, 25.5, -0.0], "v1") == key
+    assert PredictionCache.make_key(ROW[:-1] + [1], "v1") != key
+    assert PredictionCache.make_key(ROW, "v2") != key
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PredictionCache(maxsize=2, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now the oldest
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.evictions == 1
+    assert cache.stats()["size"] == 2
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = PredictionCache(maxsize=10, ttl=5)
+    cache.put("a", 1)
+
+    now[0] += 4.9
+    assert cache.get("a") == 1
+    now[0] += 0.2
+    assert cache.get("a") is None
+    assert (cache.expirations, cache.hits, cache.misses) == (1, 1, 1)
+    assert cache.stats()["size"] == 0
+
+
+def test_invalidate_and_disabled_cache():
+    cache = PredictionCache(maxsize=10, ttl=60)
+    cache.put("a", 1)
+    cache.invalidate()
+    assert cache.get("a") is None
+    assert cache.invalidations == 1
+
+    disabled = PredictionCache(maxsize=0)
+    assert not disabled.enabled
+    disabled.put("a", 1)
+    assert disabled.get("a") is None
@@ -0,0 +1,64 @@
+import json
+import logging
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+from backend.ml import train_multiclass
+from backend.ml.train_multiclass import categorize_stages, features
+from backend.model_store import ModelStore
+
+
+@pytest.fixture
+def forest(monkeypatch, tmp_path):
+    # A small stage forest exported to tmp_path instead of backend/ml
+    for name, file in [("MODEL_PATH", "model.pkl"), ("SCALER_PATH", "scaler.pkl"),
+                       ("FOREST_PATH", "forest"), ("FUSED_FOREST_PATH", "fused"),
+                       ("COMPACT_FOREST_PATH", "forest_multiclass_compact")]:
+        monkeypatch.setattr(train_multiclass, name, str(tmp_path / file))
+    df = pd.read_csv(train_multiclass.CSV_PATH, nrows=600)
+    X = df[features]
+    y = categorize_stages(df['Diagnosis'], df['MMSE'])
+    scaler = StandardScaler().fit(X)
+    # Leaves of at least 5 rows are impure, so a tolerance can prune them
+    model = RandomForestClassifier(n_estimators=20, min_samples_leaf=5, random_state=0)
+    model.fit(scaler.transform(X), y)
+    return model, scaler, X, scaler.transform(X), y
+
+
+def test_compact_forest_that_changes_predictions_is_refused(forest):
+    # A large tolerance collapses enough splits to change some stages
+    model, scaler, X, X_scaled, y = forest
+    compact = {"bits": 8, "prune_tolerance": 0.3}
+    with pytest.raises(RuntimeError, match="held-out predictions"):
+        train_multiclass.export_stage(model, scaler, X, X_scaled, y, compact)
+    assert not os.path.exists(train_multiclass.COMPACT_FOREST_PATH)
+    # The exact artifacts are still exported
+    assert os.path.isdir(train_multiclass.FUSED_FOREST_PATH)
+
+
+def test_changes_can_be_accepted_and_are_recorded(forest):
+    model, scaler, X, X_scaled, y = forest
+    compact = {"bits": 8, "prune_tolerance": 0.3, "max_changed": len(X)}
+    train_multiclass.export_stage(model, scaler, X, X_scaled, y, compact)
+    with open(os.path.join(train_multiclass.COMPACT_FOREST_PATH, "meta.json")) as f:
+        meta = json.load(f)
+    assert meta["prune_tolerance"] == 0.3 and meta["checked_rows"] == len(X)
+    assert 0 < meta["changed_predictions"] <= len(X)
+
+
+def test_serving_the_compact_forest_warns(forest, tmp_path, caplog):
+    model, scaler, X, X_scaled, y = forest
+    compact = {"bits": 8, "prune_tolerance": 0.3, "max_changed": len(X)}
+    train_multiclass.export_stage(model, scaler, X, X_scaled, y, compact)
+
+    store = ModelStore("compact", registry_dir=str(tmp_path / "registry"), root=str(tmp_path))
+    with caplog.at_level(logging.WARNING, logger="backend.model_store"):
+        assert store.refresh()
+    assert store.current.mode == "compact"
+    warnings = [record.getMessage() for record in caplog.records if record.levelno == logging.WARNING]
+    assert len(warnings) == 1 and "approximate probabilities" in warnings[0]
+    assert f"of {len(X)} held-out predictions differ" in warnings[0]
@@ -0,0 +1,81 @@
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+
+from backend.ml import dataset
+from backend.ml.train_multiclass import categorize_stages, features, label_stage, load_stage
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CSV_PATH = os.path.join(BASE_DIR, 'alzheimers_disease_data.csv')
+
+
+def converted_copy(tmp_path):
+    # The CSV plus an up-to-date columnar copy, outside the repo
+    csv_path = str(tmp_path / "data.csv")
+    shutil.copy2(CSV_PATH, csv_path)
+    dataset.convert(csv_path)
+    return csv_path
+
+
+def test_training_features_match_the_csv():
+    # The model is trained on exactly the float64 values a plain read_csv
+    # gives, the same values the API scores
+    raw = pd.read_csv(CSV_PATH)
+    X, y = label_stage(load_stage(CSV_PATH))
+    assert (X.dtypes == np.float64).all()
+    assert np.array_equal(X.to_numpy(), raw[features].to_numpy(dtype=np.float64))
+    assert np.array_equal(y.to_numpy(), categorize_stages(raw['Diagnosis'], raw['MMSE']))
+
+
+def test_exact_loads_use_the_float64_columns(tmp_path):
+    csv_path = converted_copy(tmp_path)
+    raw = pd.read_csv(csv_path)
+
+    compact = dataset.load_dataset(['BMI', 'Age'], csv_path)
+    assert compact['BMI'].dtype == np.float32
+    exact = dataset.load_dataset(['BMI', 'Age'], csv_path, exact=True)
+    assert exact['BMI'].dtype == np.float64 and exact['Age'].dtype == np.int16
+    assert np.array_equal(exact['BMI'].to_numpy(), raw['BMI'].to_numpy())
+    assert not np.array_equal(compact['BMI'].to_numpy(np.float64), raw['BMI'].to_numpy())
+    assert np.array_equal(compact['BMI'].to_numpy(), raw['BMI'].to_numpy(np.float32))
+
+    chunks = list(dataset.iter_chunks(['BMI', 'MMSE'], 500, csv_path, exact=True))
+    assert all(chunk['BMI'].dtype == np.float64 for chunk in chunks)
+    assert np.array_equal(pd.concat(chunks)['MMSE'].to_numpy(), raw['MMSE'].to_numpy())
+
+
+def test_training_on_the_columnar_copy_matches_the_csv(tmp_path, monkeypatch):
+    csv_path = converted_copy(tmp_path)
+    from_csv = label_stage(load_stage(CSV_PATH))
+    raw = pd.read_csv(csv_path)
+
+    def no_csv(*args, **kwargs):
+        raise AssertionError("parsed the CSV")
+
+    monkeypatch.setattr(pd, "read_csv", no_csv)
+    X, y = label_stage(load_stage(csv_path))
+    assert (X.dtypes == np.float64).all()
+    assert np.array_equal(X.to_numpy(), from_csv[0].to_numpy())
+    assert np.array_equal(y.to_numpy(), from_csv[1].to_numpy())
+
+    chunks = list(dataset.iter_chunks(features + ['Diagnosis'], 500, csv_path, exact=True))
+    assert np.array_equal(pd.concat(chunks)[features].to_numpy(), raw[features].to_numpy(np.float64))
+
+
+def test_old_conversions_fall_back_to_the_csv(tmp_path):
+    # Converted before the float64 columns existed
+    csv_path = converted_copy(tmp_path)
+    schema_path = os.path.join(dataset.columns_dir(csv_path), dataset.SCHEMA_FILE)
+    with open(schema_path) as f:
+        schema = json.load(f)
+    for entry in schema["columns"].values():
+        entry.pop("exact_dtype", None)
+    with open(schema_path, 'w') as f:
+        json.dump(schema, f)
+
+    assert dataset.load_columns(['BMI'], csv_path, exact=True) is None
+    assert dataset.load_columns(['Age'], csv_path, exact=True) is not None
+    exact = dataset.load_dataset(['BMI'], csv_path, exact=True)
+    assert np.array_equal(exact['BMI'].to_numpy(), pd.read_csv(csv_path)['BMI'].to_numpy())
@@ -0,0 +1,158 @@
+import os
+import numpy as np
+import pandas as pd
+import joblib
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+from backend.ml.forest import (
+    CompactForestEngine, ForestEngine, compact_forest, flatten_forest, leaf_distributions,
+)
+from backend.ml.train_multiclass import categorize_stages
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CSV_PATH = os.path.join(BASE_DIR, 'alzheimers_disease_data.csv')
+MODEL_PATH = os.path.join(BASE_DIR, 'backend', 'ml', 'model_multiclass.pkl')
+SCALER_PATH = os.path.join(BASE_DIR, 'backend', 'ml', 'scaler_multiclass.pkl')
+
+FEATURES = [
+    'Age', 'Gender', 'Ethnicity', 'EducationLevel', 'BMI', 'Smoking',
+    'AlcoholConsumption', 'PhysicalActivity', 'DietQuality', 'SleepQuality',
+    'FamilyHistoryAlzheimers', 'CardiovascularDisease', 'Diabetes',
+    'Depression', 'HeadInjury', 'Hypertension', 'SystolicBP', 'DiastolicBP',
+    'CholesterolTotal', 'CholesterolLDL', 'CholesterolHDL',
+    'CholesterolTriglycerides', 'MMSE', 'FunctionalAssessment',
+    'MemoryComplaints', 'BehavioralProblems', 'ADL', 'Confusion',
+    'Disorientation', 'PersonalityChanges', 'DifficultyCompletingTasks',
+    'Forgetfulness'
+]
+
+
+def load_model_and_scaler(X, y):
+    # Use the trained artifacts when they exist, otherwise fit a forest the
+    # same way train_multiclass.py does (without SMOTE, which doesn't matter
+    # for parity).
+    if os.path.exists(MODEL_PATH) and os.path.exists(SCALER_PATH):
+        return joblib.load(MODEL_PATH), joblib.load(SCALER_PATH)
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=100, random_state=42)
+    model.fit(scaler.transform(X), y)
+    return model, scaler
+
+
+def test_fused_matches_unfused():
+    df = pd.read_csv(CSV_PATH)
+    X = df[FEATURES].to_numpy(dtype=np.float64)
+    y = df['Diagnosis'].to_numpy()
+    model, scaler = load_model_and_scaler(X, y)
+
+    expected = model.predict_proba(scaler.transform(X))
+    compiled = ForestEngine.from_model(model).predict_proba(scaler.transform(X))
+    fused = ForestEngine.from_model(model, scaler).predict_proba(X)
+
+    assert np.array_equal(compiled, expected)
+    assert np.array_equal(fused, expected)
+    assert np.array_equal(fused.argmax(axis=1), expected.argmax(axis=1))
+
+
+def test_explanations_add_up():
+    # One traversal gives the same classes and probabilities as sklearn, and
+    # the bias plus the feature contributions rebuild the probabilities
+    df = pd.read_csv(CSV_PATH, nrows=500)
+    X = df[FEATURES].to_numpy(dtype=np.float64)
+    y = df['Diagnosis'].to_numpy()
+    model, scaler = load_model_and_scaler(X, y)
+
+    engine = ForestEngine.from_model(model, scaler)
+    classes, probabilities, contributions = engine.evaluate(X, explain=True)
+    expected = model.predict_proba(scaler.transform(X))
+
+    assert np.array_equal(probabilities, expected)
+    assert np.array_equal(classes, model.classes_[expected.argmax(axis=1)])
+    assert contributions.shape == (len(X), len(FEATURES), len(model.classes_))
+    assert np.allclose(engine.bias + contributions.sum(axis=1), probabilities)
+
+
+def test_compact_forest_stays_close():
+    # Quantized distributions move each probability by less than 1/255, and
+    # float32 thresholds leave the unfused forest's branches unchanged
+    df = pd.read_csv(CSV_PATH, nrows=500)
+    X = df[FEATURES].to_numpy(dtype=np.float64)
+    y = df['Diagnosis'].to_numpy()
+    model, scaler = load_model_and_scaler(X, y)
+    expected = model.predict_proba(scaler.transform(X))
+
+    unfused = CompactForestEngine(*compact_forest(*flatten_forest(model), bits=8))
+    assert np.abs(unfused.predict_proba(scaler.transform(X)) - expected).max() < 1 / 255
+
+    arrays, meta = compact_forest(*flatten_forest(model, scaler), bits=8)
+    assert arrays["threshold"].dtype == np.float32 and arrays["distributions"].dtype == np.uint8
+    assert meta["n_nodes"] < meta["source_nodes"]
+    compact = CompactForestEngine(arrays, meta)
+    classes, probabilities, contributions = compact.evaluate(X, explain=True)
+    assert np.abs(probabilities - expected).max() < 1 / 255
+    assert np.allclose(compact.bias + contributions.sum(axis=1), probabilities)
+
+
+
+def test_pruning_with_a_tolerance():
+    # Collapsing splits whose leaves differ by up to the tolerance gives a
+    # smaller forest; each collapse moves a tree's output by at most the
+    # tolerance, and it can happen once per level. Fully grown trees have
+    # pure leaves that never qualify, so these trees stop at 5 rows a leaf.
+    df = pd.read_csv(CSV_PATH)
+    X = df[FEATURES].to_numpy(dtype=np.float64)
+    y = categorize_stages(df['Diagnosis'], df['MMSE'])
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=20, min_samples_leaf=5, random_state=0)
+    model.fit(scaler.transform(X), y)
+    expected = model.predict_proba(scaler.transform(X))
+
+    _, exact_meta = compact_forest(*flatten_forest(model, scaler), bits=8)
+    arrays, meta = compact_forest(*flatten_forest(model, scaler), bits=8, prune_tolerance=0.1)
+    assert meta["prune_tolerance"] == 0.1
+    assert meta["n_nodes"] < exact_meta["n_nodes"]
+
+    probabilities = CompactForestEngine(arrays, meta).predict_proba(X)
+    assert np.allclose(probabilities.sum(axis=1), 1.0)
+    assert np.abs(probabilities - expected).max() <= meta["max_depth"] * 0.1 + 1 / 255
+    agreement = (probabilities.argmax(axis=1) == expected.argmax(axis=1)).mean()
+    assert agreement > 0.95
+
+def test_impure_leaves_keep_parity():
+    # Depth-limited trees end in impure leaves, whose class fractions must
+    # be used as stored: dividing the four stage fractions by their sum
+    # again moves some of them by an ulp and breaks bit-exact parity
+    df = pd.read_csv(CSV_PATH)
+    X = df[FEATURES].to_numpy(dtype=np.float64)
+    y = categorize_stages(df['Diagnosis'], df['MMSE'])
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=30, max_depth=4, min_samples_leaf=5, random_state=0)
+    model.fit(scaler.transform(X), y)
+
+    expected = model.predict_proba(scaler.transform(X))
+    assert ForestEngine.from_model(model).predict_proba(scaler.transform(X)).tolist() == expected.tolist()
+    assert ForestEngine.from_model(model, scaler).predict_proba(X).tolist() == expected.tolist()
+
+
+def test_leaf_counts_are_normalised():
+    # Older sklearn versions store class counts instead of fractions
+    class Tree:
+        value = np.array([[[3.0, 1.0]], [[0.0, 2.0]], [[0.0, 0.0]]])
+
+    assert leaf_distributions(Tree).tolist() == [[0.75, 0.25], [0.0, 1.0], [0.0, 0.0]]
+
+    class FractionTree:
+        value = np.array([[[0.1, 0.2, 0.7]]])
+
+    assert leaf_distributions(FractionTree).tolist() == [[0.1, 0.2, 0.7]]
+
+
+if __name__ == "__main__":
+    test_fused_matches_unfused()
+    test_explanations_add_up()
+    test_compact_forest_stays_close()
+    test_pruning_with_a_tolerance()
+    test_impure_leaves_keep_parity()
+    test_leaf_counts_are_normalised()
+    print("Fused and unfused predictions match on all rows.")
@@ -0,0 +1,182 @@
+import asyncio
+import itertools
+import json
+from datetime import datetime, timezone
+from types import SimpleNamespace
+import httpx
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import insights
+from backend.main import app
+from backend.routers import prediction
+
+DAY = 86400
+
+
+def ndjson(readings):
+    return "".join(json.dumps(reading) + "\n" for reading in readings).encode()
+
+
+def reading(t, **values):
+    return dict({"timestamp": t, "heart_rate": 70, "steps_count": 1000, "sleep_hours": 1}, **values)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # Small blocks, so bodies are aggregated in several pieces
+    monkeypatch.setattr(prediction, "STREAM_BLOCK_BYTES", 256)
+    return TestClient(app)
+
+
+def stream(client, body):
+    # Sent in 200-byte pieces, as a client uploading a long series would.
+    # TestClient joins the pieces into one message, httpx's ASGI transport
+    # passes them on one by one.
+    async def pieces():
+        for i in range(0, len(body), 200):
+            yield body[i:i + 200]
+
+    async def post():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+            return await http.post("/predict/health-insights/stream", content=pieces(),
+                                   headers={"Content-Type": "application/x-ndjson"})
+
+    return asyncio.run(post())
+
+
+def test_stream_matches_batch(client):
+    readings = [reading(day * DAY + hour * 3600, heart_rate=60 + hour * 3)
+                for day in range(4) for hour in range(0, 24, 2)]
+    response = stream(client, ndjson(readings))
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    days = [json.loads(line) for line in response.text.splitlines()]
+
+    columns = {name: [r[name] for r in readings] for name in ["timestamp", "heart_rate", "steps_count", "sleep_hours"]}
+    batch = client.post("/predict/health-insights/batch", json=columns).json()["days"]
+    assert days == batch
+    assert [day["date"] for day in days] == ["1970-01-01", "1970-01-02", "1970-01-03", "1970-01-04"]
+
+
+@pytest.mark.parametrize("bad_line, message", [
+    (b"{not json}\n", "Invalid NDJSON line"),
+    (b'{"heart_rate": 70}\n', "timestamp"),
+    (b'{"timestamp": "yesterday"}\n', "Invalid timestamp"),
+    (ndjson([reading(0)]), "arrived after"),  # back to a day already reported
+])
+def test_bad_input_anywhere_is_a_400(client, bad_line, message):
+    # Far enough into the body that several days were complete before it
+    good = ndjson([reading(day * DAY + hour * 3600) for day in range(3) for hour in range(0, 24, 4)])
+    assert len(good) > prediction.STREAM_BLOCK_BYTES
+    response = stream(client, good + bad_line)
+    assert response.status_code == 400
+    assert message in response.json()["detail"]
+
+
+def test_empty_stream(client):
+    response = stream(client, b"")
+    assert response.status_code == 200 and response.text == ""
+
+
+def scalar_health_insights(data):
+    # /health-insights as it was written before backend/insights.py
+    score = 100
+    precautions = []
+    if data.heart_rate > 100 or data.heart_rate < 60:
+        score -= 10
+        precautions.append("Abnormal heart rate detected. Consult a doctor.")
+    if data.systolic_bp > 130 or data.diastolic_bp > 85:
+        score -= 15
+        precautions.append("High blood pressure. Reduce salt intake and monitor BP.")
+    if data.steps_count < 5000:
+        score -= 10
+        precautions.append("Low physical activity. Try to walk more.")
+    if data.hydration < 2.0:
+        score -= 5
+        precautions.append("Low hydration. Drink more water.")
+    if data.sleep_hours < 7:
+        score -= 10
+        precautions.append("Insufficient sleep. Aim for 7-8 hours.")
+    return {"health_score": score, "precautions": precautions}
+
+
+def test_single_reading_matches_the_scalar_checks():
+    # Both sides of every threshold
+    for values in itertools.product([59, 60, 100, 101], [130, 131], [85, 86], [4999, 5000], [1.99, 2.0], [6.9, 7]):
+        data = prediction.HealthInsightsInput(**dict(zip(insights.FIELDS, values)))
+        assert prediction.health_insights(data) == scalar_health_insights(data)
+
+
+def scalar_days(readings, rolling_days=insights.ROLLING_DAYS):
+    # Per-day summaries one reading at a time, for readings with every field
+    by_day = {}
+    for reading in readings:
+        day = datetime.fromtimestamp(reading["timestamp"], timezone.utc).date()
+        by_day.setdefault(day, []).append(reading)
+    results, history = [], []
+    for day in sorted(by_day):
+        rows = by_day[day]
+        values = {name: round(sum(row[name] for row in rows) / len(rows), 2) for name in insights.MEAN_FIELDS}
+        values.update({name: round(sum(row[name] for row in rows), 2) for name in insights.SUM_FIELDS})
+        history = [entry for entry in history if (day - entry[0]).days < rolling_days] + [
+            (day, values["steps_count"], values["sleep_hours"])
+        ]
+        results.append(dict(
+            {
+                "date": day.isoformat(),
+                "readings": len(rows),
+                "heart_rate_avg": values["heart_rate"],
+                "abnormal_heart_rate_readings": sum(not 60 <= row["heart_rate"] <= 100 for row in rows),
+                "systolic_bp_avg": values["systolic_bp"],
+                "diastolic_bp_avg": values["diastolic_bp"],
+                "steps": values["steps_count"],
+                "hydration": values["hydration"],
+                "sleep_hours": values["sleep_hours"],
+                f"steps_{rolling_days}d_avg": round(sum(s for _, s, _ in history) / len(history), 1),
+                f"sleep_{rolling_days}d_avg": round(sum(s for _, _, s in history) / len(history), 2),
+            },
+            **scalar_health_insights(SimpleNamespace(**values)),
+        ))
+    return results
+
+
+def random_readings(seed, n=600, days=20):
+    rng = np.random.default_rng(seed)
+    # Whole days without readings too, to exercise the calendar-day window
+    timestamps = np.sort(rng.integers(0, days * DAY, n))
+    timestamps = timestamps[(timestamps // DAY) % 5 != 3]
+    return [
+        {
+            "timestamp": int(t),
+            "heart_rate": int(rng.integers(45, 120)),
+            "systolic_bp": int(rng.integers(100, 150)),
+            "diastolic_bp": int(rng.integers(60, 95)),
+            "steps_count": int(rng.integers(0, 1500)),
+            "hydration": round(float(rng.uniform(0, 0.5)), 1),
+            "sleep_hours": round(float(rng.uniform(0, 1.5)), 1),
+        }
+        for t in timestamps
+    ]
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_daily_aggregates_match_the_scalar_version(seed):
+    readings = random_readings(seed)
+    expected = scalar_days(readings)
+
+    # Fed in uneven chunks that split days
+    rng = np.random.default_rng(seed)
+    cuts = np.sort(rng.choice(np.arange(1, len(readings)), size=7, replace=False)).tolist()
+    aggregator = insights.DailyAggregator()
+    days = []
+    for start, end in zip([0] + cuts, cuts + [len(readings)]):
+        days += aggregator.add(*insights.columns_from_readings(readings[start:end]))
+    days += aggregator.finish()
+    assert days == expected
+
+    # The batch route takes the series out of order
+    shuffled = [readings[i] for i in rng.permutation(len(readings))]
+    columns = {name: [r[name] for r in shuffled] for name in ["timestamp"] + insights.FIELDS}
+    assert prediction.health_insights_batch(prediction.HealthSeriesInput(**columns)) == {"days": expected}
@@ -0,0 +1,58 @@
+import os
+import time
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+from backend import metrics
+from backend.ml.forest import export_forest
+from backend.model_store import LoadedModel
+
+
+def test_observe_since_respects_metrics_enabled(monkeypatch):
+    # Registered on a copy, so it never shows up in /metrics
+    monkeypatch.setattr(metrics, "_metrics", list(metrics._metrics))
+    histogram = metrics.Histogram("test_stage_seconds", "Test histogram", ["stage"])
+    started = time.perf_counter()
+
+    monkeypatch.setattr(metrics, "ENABLED", False)
+    histogram.observe_since(started, "validation")
+    with histogram.time("validation"):
+        pass
+    assert list(histogram.samples()) == []
+
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    histogram.observe_since(None, "validation")  # no start time recorded
+    assert list(histogram.samples()) == []
+    histogram.observe_since(started, "validation")
+    samples = dict(histogram.samples())
+    assert samples['test_stage_seconds_count{stage="validation"}'] == 1
+    assert samples['test_stage_seconds_sum{stage="validation"}'] > 0
+
+
+def write_artifacts(root):
+    # A tiny forest in every serving form
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(80, 5))
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=3, random_state=0).fit(scaler.transform(X), np.arange(80) % 4)
+    joblib.dump(model, os.path.join(root, 'model_multiclass.pkl'))
+    joblib.dump(scaler, os.path.join(root, 'scaler_multiclass.pkl'))
+    export_forest(model, os.path.join(root, 'forest_multiclass'))
+    export_forest(model, os.path.join(root, 'forest_multiclass_fused'), scaler=scaler)
+    return root
+
+
+def test_model_warm_up_is_not_timed(monkeypatch, tmp_path):
+    # Every hot swap warms the new model up; /metrics must not count it
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    monkeypatch.setattr(metrics.PREDICT_STAGE_SECONDS, "_values", {})
+    root = write_artifacts(str(tmp_path))
+    for mode in ("pickle", "compiled", "fused"):
+        loaded = LoadedModel(mode, root)
+        loaded.warm_up()
+        assert list(metrics.PREDICT_STAGE_SECONDS.samples()) == []
+
+    loaded.predict_proba(np.zeros((1, loaded.n_features)))
+    assert dict(metrics.PREDICT_STAGE_SECONDS.samples())['predict_stage_seconds_count{stage="predict_proba"}'] == 1
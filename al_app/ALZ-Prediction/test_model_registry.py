@@ -0,0 +1,121 @@
+import os
+import shutil
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+from backend.ml import registry
+from backend.model_store import ModelStore
+
+
+def write_artifacts(source_dir, seed):
+    # A tiny pickled forest + scaler, as train_multiclass.py would leave them
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(80, 5))
+    y = np.arange(80) % 4
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=3, random_state=seed).fit(scaler.transform(X), y)
+    os.makedirs(source_dir, exist_ok=True)
+    joblib.dump(model, os.path.join(source_dir, 'model_multiclass.pkl'))
+    joblib.dump(scaler, os.path.join(source_dir, 'scaler_multiclass.pkl'))
+    return str(source_dir)
+
+
+def publish(tmp_path, seed, activate=True):
+    source = write_artifacts(tmp_path / f"source-{seed}", seed)
+    return registry.publish(source, str(tmp_path / "registry"), activate=activate)
+
+
+def test_publish_then_verify(tmp_path):
+    registry_dir = str(tmp_path / "registry")
+    version = publish(tmp_path, seed=1)
+
+    assert registry.list_versions(registry_dir) == [version]
+    assert registry.current_version(registry_dir) == version
+    manifest = registry.verify(version, registry_dir)
+    assert manifest["version"] == version
+    assert manifest["artifacts"] == ['model_multiclass.pkl', 'scaler_multiclass.pkl']
+    assert sorted(manifest["files"]) == ['model_multiclass.pkl', 'scaler_multiclass.pkl']
+
+
+def test_publish_without_artifacts_fails(tmp_path):
+    with pytest.raises(registry.RegistryError):
+        registry.publish(str(tmp_path), str(tmp_path / "registry"))
+    assert registry.list_versions(str(tmp_path / "registry")) == []
+
+
+def test_tampered_version_is_rejected(tmp_path):
+    registry_dir = str(tmp_path / "registry")
+    good = publish(tmp_path, seed=1)
+    bad = publish(tmp_path, seed=2, activate=False)
+    with open(os.path.join(registry.version_dir(bad, registry_dir), 'scaler_multiclass.pkl'), 'ab') as f:
+        f.write(b"x")
+
+    with pytest.raises(registry.RegistryError, match="scaler_multiclass.pkl"):
+        registry.verify(bad, registry_dir)
+    with pytest.raises(registry.RegistryError):
+        registry.set_current(bad, registry_dir)
+    assert registry.current_version(registry_dir) == good
+
+
+def test_store_hot_swaps_and_rolls_back(tmp_path):
+    registry_dir = str(tmp_path / "registry")
+    swaps = []
+    store = ModelStore("pickle", on_swap=swaps.append, registry_dir=registry_dir, root=str(tmp_path))
+    first = publish(tmp_path, seed=1)
+    assert store.refresh()
+    assert store.current.version == first and store.ready.is_set()
+    assert not store.refresh()
+
+    # A request holding the old model keeps using it across the swap
+    held = store.current
+    second = publish(tmp_path, seed=2)
+    assert store.refresh()
+    assert store.current.version == second
+    assert held.version == first
+    assert held.predict_proba(np.zeros((2, 5))).shape == (2, 4)
+
+    registry.set_current(first, registry_dir)
+    assert store.refresh()
+    assert store.current.version == first
+    assert [loaded.version for loaded in swaps] == [first, second, first]
+    assert store.status()["source"] == "registry"
+
+
+def test_store_keeps_serving_when_a_version_is_broken(tmp_path):
+    registry_dir = str(tmp_path / "registry")
+    store = ModelStore("pickle", registry_dir=registry_dir, root=str(tmp_path))
+    first = publish(tmp_path, seed=1)
+    assert store.refresh()
+
+    broken = publish(tmp_path, seed=2)
+    with open(os.path.join(registry.version_dir(broken, registry_dir), 'model_multiclass.pkl'), 'ab') as f:
+        f.write(b"x")
+    assert not store.refresh()
+    assert store.current.version == first
+    assert "Checksum mismatch" in store.status()["last_error"]
+    # Not retried until CURRENT changes again
+    assert not store.refresh()
+
+
+def test_changed_files_are_loaded_once_they_settle(tmp_path):
+    # Without a registry, the training scripts' files in root are served
+    root = write_artifacts(tmp_path / "root", seed=1)
+    store = ModelStore("pickle", registry_dir=str(tmp_path / "registry"), root=root)
+    assert store.refresh()
+    first = store.current.version
+
+    # Retraining has written the new model but not yet its scaler
+    new = write_artifacts(tmp_path / "new", seed=2)
+    shutil.copy(os.path.join(new, 'model_multiclass.pkl'), root)
+    assert not store.refresh()
+    shutil.copy(os.path.join(new, 'scaler_multiclass.pkl'), root)
+    assert not store.refresh()
+    assert store.current.version == first
+
+    # Unchanged since the last poll
+    assert store.refresh()
+    assert store.current.version != first
+    assert store.status()["source"] == "files"
@@ -0,0 +1,121 @@
+import json
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import payloads
+from backend.main import app
+from backend.routers import prediction
+from backend.routers.prediction import FEATURE_LOWER, FEATURE_UPPER, FEATURES, INTEGER_FEATURES
+
+N = len(FEATURES)
+
+
+def valid_row():
+    # Midpoint of every range, rounded where the feature is an integer
+    row = (FEATURE_LOWER + FEATURE_UPPER) / 2
+    return np.where(INTEGER_FEATURES, np.floor(row), row)
+
+
+def check(rows):
+    payloads.check_rows(np.asarray(rows, dtype=np.float64), FEATURES, FEATURE_LOWER, FEATURE_UPPER,
+                        INTEGER_FEATURES)
+
+
+def test_bounds_cover_every_feature():
+    assert list(prediction.FEATURE_BOUNDS) == FEATURES
+    assert (FEATURE_LOWER < FEATURE_UPPER).all()
+    assert INTEGER_FEATURES[FEATURES.index("Age")] and not INTEGER_FEATURES[FEATURES.index("BMI")]
+
+
+def test_json_form_is_not_bounded():
+    # The web form's free-form inputs can send anything; only the array
+    # routes check the ranges
+    prediction.SymptomInput(**{**{name: 0 for name in FEATURES}, "Age": 200, "BMI": -1})
+
+
+def test_packed_float32_rows():
+    rows = np.vstack([valid_row(), valid_row()]).astype("<f4")
+    decoded = payloads.decode_rows(rows.tobytes(), payloads.BINARY_TYPE, N)
+    assert decoded.shape == (2, N) and np.array_equal(decoded, rows)
+    check(decoded)
+
+
+def test_packed_body_of_the_wrong_length():
+    body = valid_row().astype("<f4").tobytes()[:-2]
+    with pytest.raises(ValueError, match="not a whole number"):
+        payloads.decode_rows(body, payloads.BINARY_TYPE, N)
+
+
+def test_json_rows():
+    row = valid_row().tolist()
+    single = payloads.decode_rows(json.dumps(row).encode(), "application/json; charset=utf-8", N)
+    assert single.shape == (1, N)
+    assert payloads.decode_rows(json.dumps([row, row]).encode(), payloads.JSON_TYPE, N).shape == (2, N)
+    assert payloads.decode_rows(b"[]", payloads.JSON_TYPE, N).shape == (0, N)
+
+
+@pytest.mark.parametrize("body", [
+    json.dumps([list(range(N)), list(range(N - 1))]),  # ragged
+    json.dumps(list(range(N - 1))),  # too short
+    json.dumps([["a"] * N]),
+    json.dumps(["1.5"] * N),  # numeric strings
+    json.dumps([1.5] * (N - 1) + ["1.5"]),
+    json.dumps([1.5] * (N - 1) + [None]),
+    "[1, 2,",
+])
+def test_malformed_json_bodies(body):
+    with pytest.raises(ValueError):
+        payloads.decode_rows(body.encode(), payloads.JSON_TYPE, N)
+
+
+@pytest.mark.parametrize("value", [np.nan, np.inf, -np.inf])
+def test_non_finite_values(value):
+    row = valid_row()
+    row[FEATURES.index("BMI")] = value
+    with pytest.raises(ValueError, match="BMI"):
+        check([row])
+
+
+@pytest.mark.parametrize("name, value", [("Age", -1), ("MMSE", 30.5), ("SystolicBP", 301)])
+def test_out_of_bounds_values(name, value):
+    row = valid_row()
+    row[FEATURES.index(name)] = value
+    check([valid_row()])
+    with pytest.raises(ValueError, match=f"Row 1: {name} must be"):
+        check([valid_row(), row])
+
+
+def test_fraction_on_an_integer_feature():
+    row = valid_row()
+    row[FEATURES.index("Gender")] = 0.5
+    with pytest.raises(ValueError, match="Gender must be a whole number"):
+        check([row])
+    # The same value is fine on a float feature
+    row = valid_row()
+    row[FEATURES.index("DietQuality")] = 0.5
+    check([row])
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # The content type and body are checked before the model is needed
+    monkeypatch.setitem(app.dependency_overrides, prediction.model_ready, lambda: None)
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("path", ["/predict/array", "/predict/array/batch"])
+def test_unsupported_content_type_is_415(client, path):
+    response = client.post(path, content=b"1,2,3", headers={"Content-Type": "text/csv"})
+    assert response.status_code == 415
+    assert "application/octet-stream" in response.json()["detail"]
+    assert client.post(path, content=b"").status_code == 415  # no content type
+
+
+def test_invalid_rows_are_400(client):
+    row = valid_row()
+    row[FEATURES.index("Age")] = 200
+    response = client.post("/predict/array/batch", content=json.dumps([row.tolist()]),
+                           headers={"Content-Type": "application/json"})
+    assert response.status_code == 400
+    assert "Age must be a whole number between 0 and 130" in response.json()["detail"]
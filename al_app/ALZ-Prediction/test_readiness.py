@@ -0,0 +1,95 @@
+import threading
+import joblib
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+from backend.main import app
+from backend.model_store import ModelStore
+from backend.routers import prediction
+from backend.routers.prediction import FEATURE_LOWER, FEATURE_UPPER, FEATURES
+
+ROW = dict(zip(FEATURES, np.floor((FEATURE_LOWER + FEATURE_UPPER) / 2).tolist()))
+
+
+class BlockedStore(ModelStore):
+    # Loading waits until `release` is set, then loads or fails
+    def __init__(self, root, tmp_path, fail=False):
+        super().__init__("pickle", registry_dir=str(tmp_path / "registry"), root=root)
+        self.release = threading.Event()
+        self.fail = fail
+
+    def _load(self, token):
+        self.release.wait(10)
+        if self.fail:
+            raise ValueError("broken artifact")
+        return super()._load(token)
+
+
+@pytest.fixture
+def root(tmp_path):
+    rng = np.random.default_rng(0)
+    X = rng.uniform(FEATURE_LOWER, FEATURE_UPPER, size=(80, len(FEATURES)))
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=3, random_state=0).fit(scaler.transform(X), np.arange(80) % 4)
+    joblib.dump(model, tmp_path / 'model_multiclass.pkl')
+    joblib.dump(scaler, tmp_path / 'scaler_multiclass.pkl')
+    return str(tmp_path)
+
+
+def loading(monkeypatch, store):
+    # Starts loading in the background, as the app's watcher does
+    monkeypatch.setattr(prediction, "store", store)
+    thread = threading.Thread(target=store.refresh)
+    thread.start()
+    return thread
+
+
+def test_predictions_wait_for_the_model(monkeypatch, root, tmp_path):
+    monkeypatch.setattr(prediction, "READY_TIMEOUT", 0)
+    store = BlockedStore(root, tmp_path)
+    thread = loading(monkeypatch, store)
+    client = TestClient(app)
+
+    ready = client.get("/ready")
+    assert ready.status_code == 503 and ready.json()["ready"] is False
+    response = client.post("/predict/", json=ROW)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+    store.release.set()
+    thread.join()
+    ready = client.get("/ready")
+    assert ready.status_code == 200
+    assert ready.json()["version"] == store.current.version and ready.json()["last_error"] is None
+    assert client.post("/predict/", json=ROW).status_code == 200
+
+
+def test_requests_are_held_up_to_the_ready_timeout(monkeypatch, root, tmp_path):
+    monkeypatch.setattr(prediction, "READY_TIMEOUT", 10)
+    store = BlockedStore(root, tmp_path)
+    thread = loading(monkeypatch, store)
+    threading.Timer(0.2, store.release.set).start()
+
+    response = TestClient(app).post("/predict/", json=ROW)
+    thread.join()
+    assert response.status_code == 200
+    assert response.json()["model_version"] == store.current.version
+
+
+def test_failed_load_is_reported(monkeypatch, root, tmp_path):
+    monkeypatch.setattr(prediction, "READY_TIMEOUT", 0)
+    store = BlockedStore(root, tmp_path, fail=True)
+    thread = loading(monkeypatch, store)
+    store.release.set()
+    thread.join()
+    client = TestClient(app)
+
+    ready = client.get("/ready")
+    assert ready.status_code == 503
+    assert ready.json()["last_error"] == "broken artifact"
+    response = client.post("/predict/", json=ROW)
+    assert response.status_code == 500
+    assert response.json()["detail"] == "Model not loaded"
@@ -0,0 +1,89 @@
+import itertools
+import pytest
+
+from backend.routers.prediction import (
+    GENERAL_SYMPTOMS, GeneralSymptomInput, general_rules, predict_general_disease,
+    predict_general_disease_batch,
+)
+from backend.rules import RuleSet
+
+
+def if_chain(data):
+    # The rule-based /predict/general as it was written before backend/rules.py
+    predictions = []
+    if data.sneeze and data.runny_nose and data.cough:
+        predictions.append({"disease": "Common Cold", "probability": 0.85, "advice": "Rest, hydration, and over-the-counter cold meds."})
+    if data.fever and data.cough and data.muscle_pain and data.fatigue:
+        predictions.append({"disease": "Flu (Influenza)", "probability": 0.90, "advice": "Antiviral drugs, rest, fluids. See a doctor if severe."})
+    if data.headache and data.nausea and not data.fever:
+        predictions.append({"disease": "Migraine", "probability": 0.80, "advice": "Rest in a dark room, pain relievers, hydration."})
+    if data.fever and data.chills and data.headache:
+        predictions.append({"disease": "Malaria", "probability": 0.75, "advice": "Immediate blood test and medical attention required."})
+    if data.fever and data.joint_pain and data.rash and data.headache:
+        predictions.append({"disease": "Dengue", "probability": 0.85, "advice": "Hydration, pain relief (avoid aspirin), monitor platelets."})
+    if data.fever and data.cough and data.fatigue and data.sore_throat:
+        predictions.append({"disease": "COVID-19", "probability": 0.70, "advice": "Isolate, get tested, monitor oxygen levels."})
+
+    if not predictions:
+        return {
+            "prediction": "Uncertain",
+            "details": "Symptoms do not match a specific pattern clearly. Please consult a doctor.",
+            "matches": []
+        }
+    predictions.sort(key=lambda x: x['probability'], reverse=True)
+    return {
+        "prediction": predictions[0]['disease'],
+        "details": predictions[0]['advice'],
+        "matches": predictions
+    }
+
+
+def every_combination():
+    for flags in itertools.product([False, True], repeat=len(GENERAL_SYMPTOMS)):
+        yield GeneralSymptomInput(**dict(zip(GENERAL_SYMPTOMS, flags)))
+
+
+def test_every_combination_matches_the_if_chain():
+    rows = list(every_combination())
+    assert len(rows) == 4096
+    for row in rows:
+        assert predict_general_disease(row) == if_chain(row)
+
+
+def test_batch_matches_the_if_chain():
+    rows = list(every_combination())
+    response = predict_general_disease_batch(rows)
+    assert response["count"] == len(rows)
+    assert response["results"] == [if_chain(row) for row in rows]
+    assert predict_general_disease_batch([]) == {"count": 0, "results": []}
+
+
+def test_ties_keep_file_order():
+    # Common Cold and Dengue are both 0.85; the if-chain lists Cold first
+    row = GeneralSymptomInput(sneeze=True, runny_nose=True, cough=True,
+                              fever=True, joint_pain=True, rash=True, headache=True)
+    diseases = [match["disease"] for match in predict_general_disease(row)["matches"]]
+    assert diseases == ["Common Cold", "Dengue"]
+
+
+def test_memoised_responses_are_reused():
+    masks = general_rules.encode([[True] * len(GENERAL_SYMPTOMS), [False] * len(GENERAL_SYMPTOMS)] * 3)
+    first = general_rules.evaluate(masks)
+    assert general_rules.evaluate(masks) == first
+    assert first[0] is first[2] and first[1] is first[3]
+    assert first[1]["prediction"] == "Uncertain"
+
+
+def test_no_rules_is_uncertain():
+    rules = RuleSet(["fever"], [])
+    assert rules.evaluate(rules.encode([[True], [False]])) == [if_chain(GeneralSymptomInput())] * 2
+
+
+def test_invalid_rules_are_rejected():
+    rule = {"disease": "X", "probability": 0.5, "advice": "-"}
+    with pytest.raises(ValueError, match="Unknown symptom 'itch' in rule 'X'"):
+        RuleSet(["fever"], [dict(rule, requires=["itch"])])
+    with pytest.raises(ValueError, match="requires and forbids"):
+        RuleSet(["fever"], [dict(rule, requires=["fever"], forbids=["fever"])])
+    with pytest.raises(ValueError, match="63 symptoms"):
+        RuleSet([f"s{i}" for i in range(64)], [])
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from backend.ml import search
+from backend.ml.search import choose, halving_fractions, pareto_front
+
+
+def result(macro_f1, single_ms, size_kb):
+    return {"macro_f1": macro_f1, "single_ms": single_ms, "size_kb": size_kb}
+
+
+@pytest.mark.parametrize("eta, min_fraction, expected", [
+    (3, 1 / 9, [1 / 9, 1 / 3, 1.0]),
+    (2, 1 / 4, [1 / 4, 1 / 2, 1.0]),
+    (3, 1 / 5, [1 / 5, 3 / 5, 1.0]),  # the last round is capped at every row
+    (3, 1.0, [1.0]),
+])
+def test_halving_fractions(eta, min_fraction, expected):
+    assert halving_fractions(eta, min_fraction) == pytest.approx(expected)
+
+
+def test_halving_keeps_the_best_third_and_the_small_front(monkeypatch):
+    # Candidate i scores i/10; all have 100 nodes except the weakest, which
+    # has 10 and so stays on the (macro-F1, node count) front every round
+    rounds = []
+
+    def fake_fit_and_score(params, X_fit, y_fit, X_val, y_val, random_state, keep_model=False):
+        rounds.append((len(X_fit), params["i"], keep_model))
+        return {"params": params, "macro_f1": params["i"] / 10, "n_nodes": 10 if params["i"] == 1 else 100}
+
+    monkeypatch.setattr(search, "fit_and_score", fake_fit_and_score)
+    X = np.zeros((90, 2))
+    y = np.arange(90) % 3
+    candidates = [{"i": i} for i in range(1, 10)]
+    final = search.successive_halving(candidates, X, y, X, y, eta=3, min_fraction=1 / 9, n_jobs=1)
+
+    by_round = {}
+    for rows, i, keep_model in rounds:
+        by_round.setdefault(rows, []).append((i, keep_model))
+    assert by_round == {
+        10: [(i, False) for i in range(1, 10)],
+        30: [(i, False) for i in [9, 8, 7, 1]],
+        90: [(i, True) for i in [9, 8, 1]],
+    }
+    assert [r["params"]["i"] for r in final] == [9, 8, 1]
+
+
+def test_pareto_front_drops_dominated_candidates():
+    best = result(0.9, 2.0, 500)
+    fastest = result(0.8, 0.5, 400)
+    smallest = result(0.7, 1.0, 100)
+    dominated = result(0.7, 2.0, 500)  # worse than best on accuracy, no better elsewhere
+    duplicate = result(0.8, 0.5, 400)  # equal is not dominated
+    front = pareto_front([best, fastest, smallest, dominated, duplicate])
+    assert front == [best, fastest, smallest, duplicate]
+
+
+def test_choose_picks_the_most_accurate_within_budget():
+    accurate_but_slow = result(0.95, 5.0, 900)
+    fits = result(0.90, 1.0, 800)
+    fits_smaller = result(0.90, 0.9, 300)
+    weaker = result(0.80, 0.1, 50)
+    results = [accurate_but_slow, fits, fits_smaller, weaker]
+    assert choose(results, 2.0) is fits_smaller
+    assert choose(results, 5.0) is accurate_but_slow
+    assert choose(results, 0.5) is weaker
+    assert choose(results, 0.05) is None
@@ -0,0 +1,56 @@
+import json
+import os
+import threading
+from fastapi.testclient import TestClient
+
+from backend.main import app
+from backend.routers import stats
+
+
+def reset(monkeypatch, path):
+    monkeypatch.setattr(stats, "STATS_PATH", str(path))
+    monkeypatch.setattr(stats, "_snapshot", None)
+    monkeypatch.setattr(stats, "_next_check", 0.0)
+
+
+def test_snapshot_is_reread_off_the_event_loop(monkeypatch, tmp_path):
+    path = tmp_path / "stats.json"
+    path.write_text(json.dumps({"total_patients": 10}))
+    reset(monkeypatch, path)
+    monkeypatch.setattr(stats, "STATS_CHECK_INTERVAL", 0.0)
+
+    threads = []
+    get_snapshot = stats.get_snapshot
+
+    def recording_get_snapshot():
+        threads.append(threading.current_thread())
+        return get_snapshot()
+
+    monkeypatch.setattr(stats, "get_snapshot", recording_get_snapshot)
+    with TestClient(app) as client:
+        first = client.get("/stats/")
+        assert first.json() == {"total_patients": 10}
+        assert client.get("/stats/", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+
+        path.write_text(json.dumps({"total_patients": 11}))
+        os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 10 ** 9))
+        second = client.get("/stats/")
+        assert second.json() == {"total_patients": 11}
+        assert second.headers["ETag"] != first.headers["ETag"]
+
+    assert threads and all(thread is not threading.main_thread() for thread in threads)
+
+
+def test_cached_snapshot_skips_the_threadpool(monkeypatch, tmp_path):
+    path = tmp_path / "stats.json"
+    path.write_text(json.dumps({"total_patients": 10}))
+    reset(monkeypatch, path)
+    monkeypatch.setattr(stats, "STATS_CHECK_INTERVAL", 3600.0)
+
+    calls = []
+    get_snapshot = stats.get_snapshot
+    monkeypatch.setattr(stats, "get_snapshot", lambda: calls.append(1) or get_snapshot())
+    with TestClient(app) as client:
+        for _ in range(3):
+            assert client.get("/stats/").status_code == 200
+    assert len(calls) == 1
@@ -0,0 +1,104 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.ml import stats_aggregate
+from backend.ml.stats_aggregate import StatsAggregate
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CSV_PATH = os.path.join(BASE_DIR, 'alzheimers_disease_data.csv')
+
+
+def pandas_stats(df):
+    # stats.json as train_model.py computed it before backend/ml/stats_aggregate.py
+    return {
+        "total_patients": len(df),
+        "diagnosed_count": int(df['Diagnosis'].sum()),
+        "not_diagnosed_count": int(len(df) - df['Diagnosis'].sum()),
+        "average_age": float(df['Age'].mean()),
+        "age_distribution": df['Age'].value_counts().sort_index().to_dict(),
+        "diagnosis_rate": float(df['Diagnosis'].mean())
+    }
+
+
+def as_json(stats):
+    return json.loads(json.dumps(stats))
+
+
+@pytest.fixture
+def df():
+    return pd.read_csv(CSV_PATH, usecols=stats_aggregate.COLUMNS)
+
+
+def test_add_frame_matches_pandas(df):
+    aggregate = StatsAggregate()
+    aggregate.add_frame(df)
+    assert as_json(aggregate.to_stats()) == as_json(pandas_stats(df))
+
+
+def test_add_matches_pandas(df):
+    aggregate = StatsAggregate()
+    for age, diagnosis in zip(df['Age'], df['Diagnosis']):
+        aggregate.add(age, diagnosis)
+    assert as_json(aggregate.to_stats()) == as_json(pandas_stats(df))
+
+
+def test_merged_parts_match_the_whole(df):
+    merged = StatsAggregate()
+    for part in np.array_split(np.arange(len(df)), 5):
+        aggregate = StatsAggregate()
+        aggregate.add_frame(df.iloc[part])
+        merged.merge(aggregate)
+    assert as_json(merged.to_stats()) == as_json(pandas_stats(df))
+    assert StatsAggregate.from_dict(as_json(merged.to_dict())).to_stats() == merged.to_stats()
+
+
+def test_empty_aggregate():
+    assert StatsAggregate().to_stats()["average_age"] == 0.0
+
+
+@pytest.fixture
+def paths(monkeypatch, tmp_path):
+    # The dataset and batches under tmp_path, and the state written there
+    df = pd.read_csv(CSV_PATH)
+    csv_path, batch_path = tmp_path / "data.csv", tmp_path / "batch.csv"
+    df.iloc[:2000].to_csv(csv_path, index=False)
+    df.iloc[2000:].to_csv(batch_path, index=False)
+    monkeypatch.setattr(stats_aggregate, "CSV_PATH", str(csv_path))
+    monkeypatch.setattr(stats_aggregate, "STATE_PATH", str(tmp_path / "stats_state.json"))
+    monkeypatch.setattr(stats_aggregate, "STATS_PATH", str(tmp_path / "stats.json"))
+    return df, str(csv_path), str(batch_path)
+
+
+def saved_stats():
+    with open(stats_aggregate.STATS_PATH) as f:
+        return json.load(f)
+
+
+def test_ingesting_the_same_batch_twice_counts_it_once(paths):
+    df, csv_path, batch_path = paths
+    stats_aggregate.rebuild(csv_path)
+    assert saved_stats()["total_patients"] == 2000
+
+    stats_aggregate.ingest(batch_path)
+    expected = as_json(pandas_stats(df))
+    assert saved_stats() == expected
+    stats_aggregate.ingest(batch_path)
+    assert saved_stats() == expected
+    assert len(StatsAggregate.load(stats_aggregate.STATE_PATH).batches) == 1
+
+
+def test_rebuild_keeps_ingested_batches_unless_forced(paths):
+    df, csv_path, batch_path = paths
+    stats_aggregate.ingest(batch_path)  # builds the base from the dataset first
+    assert saved_stats()["total_patients"] == len(df)
+
+    assert not stats_aggregate.save_rebuilt(stats_aggregate.aggregate_csv(csv_path))
+    stats_aggregate.rebuild(csv_path)
+    assert saved_stats()["total_patients"] == len(df)
+
+    stats_aggregate.rebuild(csv_path, force=True)
+    assert saved_stats()["total_patients"] == 2000
+    assert StatsAggregate.load(stats_aggregate.STATE_PATH).batches == []
@@ -0,0 +1,42 @@
+import os
+import pytest
+
+from backend.ml import train_multiclass, train_streaming
+from backend.ml.train_streaming import split_trees
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CSV_PATH = os.path.join(BASE_DIR, 'alzheimers_disease_data.csv')
+
+
+@pytest.mark.parametrize("n_estimators, n_chunks, expected", [
+    (12, 4, [3, 3, 3, 3]),
+    (10, 4, [3, 3, 2, 2]),
+    (3, 5, [1, 1, 1, 0, 0]),
+    (1, 1, [1]),
+])
+def test_split_trees_is_exact(n_estimators, n_chunks, expected):
+    assert split_trees(n_estimators, n_chunks) == expected
+
+
+@pytest.mark.parametrize("n_estimators", [3, 10])
+def test_forest_has_exactly_the_requested_trees(monkeypatch, n_estimators):
+    # ~1700 training rows in chunks of 300 is 6 chunks, so neither count
+    # divides evenly and 3 trees leaves chunks without any
+    monkeypatch.setattr(train_streaming, "export_stage", lambda *args, **kwargs: None)
+    model, _ = train_streaming.train_streaming(
+        csv_path=CSV_PATH, chunk_size=300, n_estimators=n_estimators, n_jobs=1,
+    )
+    assert len(model.estimators_) == n_estimators
+
+
+def test_sgd_export_removes_every_compiled_forest(monkeypatch, tmp_path):
+    # Any forest left from an earlier run would be served instead of the pickle
+    paths = {name: tmp_path / name.lower() for name in
+             ["MODEL_PATH", "SCALER_PATH", "FOREST_PATH", "FUSED_FOREST_PATH", "COMPACT_FOREST_PATH"]}
+    for name, path in paths.items():
+        monkeypatch.setattr(train_multiclass, name, str(path))
+        if name.endswith("FOREST_PATH"):
+            path.mkdir()
+    train_streaming.train_streaming(csv_path=CSV_PATH, chunk_size=600, model_type="sgd")
+    assert paths["MODEL_PATH"].exists() and paths["SCALER_PATH"].exists()
+    assert not any(paths[name].exists() for name in ["FOREST_PATH", "FUSED_FOREST_PATH", "COMPACT_FOREST_PATH"])
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.ml.train_multiclass import Pipeline
+
+
+def stage_v1(x):
+    return x + 1
+
+
+def stage_v2(x):
+    return x + 2
+
+
+def test_keys_change_with_stage_code_and_parameters():
+    key = Pipeline.make_key("fit", stage_v1, "parent", {"n_estimators": 100})
+    assert Pipeline.make_key("fit", stage_v1, "parent", {"n_estimators": 100}) == key
+    assert Pipeline.make_key("fit", stage_v2, "parent", {"n_estimators": 100}) != key
+    assert Pipeline.make_key("fit", stage_v1, "parent", {"n_estimators": 50}) != key
+    assert Pipeline.make_key("fit", stage_v1, "other parent", {"n_estimators": 100}) != key
+
+
+def test_edited_stage_is_rerun(tmp_path):
+    calls = []
+
+    def run(pipeline, stage):
+        key = Pipeline.make_key("add", stage, 1)
+        return pipeline.run("add", lambda: calls.append(stage) or stage(1), key)
+
+    pipeline = Pipeline(cache_dir=str(tmp_path))
+    assert run(pipeline, stage_v1) == 2
+    assert run(pipeline, stage_v1) == 2  # served from the cache
+    assert run(pipeline, stage_v2) == 3  # new code, new key
+    assert calls == [stage_v1, stage_v2]
+    assert [cached for _, _, cached in pipeline.timings] == [False, True, False]
+
+
+def test_search_without_a_fitting_model_raises(monkeypatch, tmp_path):
+    # Library callers get an exception; only main() turns it into an exit
+    from backend.ml import search, train_multiclass
+
+    results = [{"params": {"n_estimators": 10}, "macro_f1": 0.9, "single_ms": 2.5, "size_kb": 40, "model": None}]
+    monkeypatch.setattr(train_multiclass, "SEARCH_REPORT_PATH", str(tmp_path / "report.json"))
+    monkeypatch.setattr(train_multiclass, "resample_stage", lambda X, y, random_state: (X, y))
+    monkeypatch.setattr(search, "sample_candidates", lambda n, random_state: [{}] * n)
+    monkeypatch.setattr(search, "successive_halving", lambda *args, **kwargs: results)
+    monkeypatch.setattr(search, "measure_serving", lambda model, scaler, X: {})
+    monkeypatch.setattr(search, "print_report", lambda *args: None)
+
+    split = {
+        "X_train_scaled": np.zeros((8, 2)), "y_train": np.array([0, 1] * 4),
+        "X_test": pd.DataFrame(np.zeros((2, 2))), "scaler": None,
+    }
+    with pytest.raises(train_multiclass.NothingWithinBudget, match="1 ms budget"):
+        train_multiclass.search_stage(split, 1, 1.0, n_jobs=1, random_state=0)
+    assert (tmp_path / "report.json").exists()